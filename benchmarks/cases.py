@@ -0,0 +1,176 @@
+"""ゲームとエージェントの処理速度を測るベンチマーク
+
+各ベンチマークは準備処理を行い、計測対象の処理を1回実行する関数を返す。
+ランナーはその関数を繰り返し実行して1回あたりの時間を求める。
+"""
+import random
+from typing import Callable, Dict, List, Tuple
+import numpy as np
+from color_link.game.color_link import ColorLinkGame
+from color_link.agents.rule_based_agent import RuleBasedAgent
+from color_link.agents.rl_agent import RLAgent
+from color_link.agents.hybrid_agent import HybridAgent
+from color_link.decision_cache import DecisionCache
+
+# 名前 -> (準備処理, 1回の実行で処理する単位数, 重いベンチマークか)
+BENCHMARKS: Dict[str, Tuple[Callable[[], Callable[[], None]], int, bool]] = {}
+
+def benchmark(name: str, ops: int = 1, heavy: bool = False):
+    """ベンチマークを登録するデコレータ（opsは1回の実行で処理する単位数、heavyは1ラウンドに1回だけ実行する重い処理）"""
+    def decorator(setup):
+        BENCHMARKS[name] = (setup, ops, heavy)
+        return setup
+    return decorator
+
+def _seed(seed: int = 0) -> None:
+    random.seed(seed)
+    np.random.seed(seed)
+
+def _game_with_history(sequence_length: int, moves: int) -> ColorLinkGame:
+    """ルールベースAIで数手進めたゲーム（候補が絞られた途中の局面）"""
+    _seed()
+    game = ColorLinkGame()
+    game.new_game(sequence_length)
+    agent = RuleBasedAgent()
+    for _ in range(moves):
+        action = agent.decide_next_move(game.get_state())
+        game.make_move(action['color'], action['column'])
+        if game.game_over:
+            break
+    return game
+
+@benchmark('game.make_move', ops=100)
+def _make_move():
+    _seed()
+    game = ColorLinkGame()
+    game.max_turns = 10 ** 9  # 終了させずに手を打ち続ける
+    game.new_game(3)
+    game.target_sequence = ['none'] * 3  # 勝利で終了しないように一致しない目標にする
+    moves = [(random.choice(game.colors), random.randint(0, 4)) for _ in range(100)]
+
+    def run():
+        game.history.clear()
+        game._undo_stack.clear()
+        for color, column in moves:
+            game.make_move(color, column)
+    return run
+
+@benchmark('game.make_unmake_move', ops=100)
+def _make_unmake_move():
+    # 探索で仮の手を打って戻す操作（盤面はコピーしない）
+    _seed()
+    game = ColorLinkGame()
+    game.new_game(3)
+    game.target_sequence = ['none'] * 3
+    moves = [(random.choice(game.colors), random.randint(0, 4)) for _ in range(100)]
+
+    def run():
+        for color, column in moves:
+            game.make_move(color, column)
+            game.unmake_move()
+    return run
+
+@benchmark('game.check_sequence', ops=5)
+def _check_sequence():
+    _seed()
+    game = ColorLinkGame()
+    game.new_game(3)
+
+    def run():
+        for column in range(5):
+            game.check_sequence(column)
+    return run
+
+for _length in (3, 4, 5):
+    def _register(sequence_length):
+        @benchmark(f'rule.filter_sequences[L={sequence_length}]')
+        def _filter_sequences():
+            agent = RuleBasedAgent()
+            sequences = agent._generate_all_sequences(sequence_length)
+            column_state = ['red', 'blue', 'green', 'yellow', 'purple'][:sequence_length]
+
+            def run():
+                agent._filter_sequences(sequences, column_state, 1, 1)
+            return run
+
+        @benchmark(f'rule.choose_best_action[L={sequence_length}]', heavy=sequence_length >= 5)
+        def _choose_best_action():
+            # 絞り込み前の全候補で評価する（候補数が最大の、最も重い局面）
+            game = _game_with_history(sequence_length, 1)
+            agent = RuleBasedAgent()
+            sequences = agent._generate_all_sequences(sequence_length)
+            state = game.get_state()
+
+            def run():
+                agent._choose_best_action(state, sequences)
+            return run
+
+        @benchmark(f'rule.choose_best_action_cached[L={sequence_length}]')
+        def _choose_best_action_cached():
+            # 同じ局面を行動スコアのキャッシュ（メモリ上）から引く
+            game = _game_with_history(sequence_length, 1)
+            agent = RuleBasedAgent(decision_cache=DecisionCache())
+            sequences = agent._generate_all_sequences(sequence_length)
+            state = game.get_state()
+
+            def run():
+                agent.last_column = -1
+                agent._choose_best_action(state, sequences)
+            return run
+    _register(_length)
+
+@benchmark('rl.get_state_key')
+def _get_state_key():
+    game = _game_with_history(3, 3)
+    agent = RLAgent()
+    state = game.get_state()
+
+    def run():
+        agent._turn_cache = None  # ターン内のキャッシュを使わずに毎回計算する
+        agent._get_state_key(state)
+    return run
+
+@benchmark('rl.learn')
+def _learn():
+    game = _game_with_history(3, 3)
+    agent = RLAgent()
+    agent.learning_mode = True
+    prev_state = game.get_state()
+    action = {'color': 'red', 'column': 0}
+    game.make_move('red', 0)
+    new_state = game.get_state()
+
+    def run():
+        agent._turn_cache = None
+        agent.learn(prev_state, action, 1.0, new_state)
+    return run
+
+def _create_agent(agent_type: str, rng: random.Random):
+    if agent_type == 'rule':
+        return RuleBasedAgent(rng=rng)
+    if agent_type == 'rl':
+        return RLAgent(rng=rng)
+    return HybridAgent(rng=rng)
+
+for _agent_type in ('rule', 'rl', 'hybrid'):
+    for _length in (3, 4, 5):
+        def _register(agent_type, sequence_length):
+            @benchmark(f'game.full[{agent_type},L={sequence_length}]', heavy=True)
+            def _full_game():
+                # 実行のたびに次のシードで新しいゲームをプレイする（学習は行わない）
+                seeds = iter(range(10 ** 9))
+
+                def run():
+                    rng = random.Random(next(seeds))
+                    agent = _create_agent(agent_type, rng)
+                    game = ColorLinkGame(rng=rng)
+                    game.new_game(sequence_length)
+                    while not game.game_over:
+                        action = agent.decide_next_move(game.get_state())
+                        game.make_move(action['color'], action['column'])
+                return run
+        _register(_agent_type, _length)
+
+def select(patterns: List[str]) -> List[str]:
+    """名前に指定した文字列を含むベンチマーク（指定がなければすべて）"""
+    return [name for name in BENCHMARKS if not patterns or any(p in name for p in patterns)]
@@ -0,0 +1,136 @@
+"""すべての目標シーケンスに対するエージェントの強さと計算コストのベンチマーク
+
+シードから作った固定の盤面で、5^L通りの目標シーケンスをすべてエージェントにプレイさせ、
+勝利までのターン数（平均・p95・最大）、最大ターン内の勝率、1手あたりのCPU時間を集計する。
+ゲームはワーカープロセスに分けて並列に実行する。
+
+使い方:
+    python -m benchmarks.exhaustive --agents rule hybrid --length 3
+    python -m benchmarks.exhaustive --length 4 --boards 3 --workers 8 -o exhaustive.json
+"""
+import os
+import sys
+import json
+import random
+import argparse
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import numpy as np
+from color_link.evaluation import AGENT_TYPES, _init_worker, play_evaluation_game
+from color_link.rng import derive_seed
+
+COLORS = ['red', 'blue', 'yellow', 'green', 'purple']
+# ワーカーに1回で渡すゲーム数（プロセス間通信の回数を減らす）
+CHUNK_SIZE = 25
+
+def all_targets(sequence_length: int) -> List[List[str]]:
+    """5^L通りの目標シーケンス（辞書順）"""
+    return [list(target) for target in itertools.product(COLORS, repeat=sequence_length)]
+
+def seeded_boards(count: int, seed: int) -> List[List[List[str]]]:
+    """シードから固定の盤面を作る"""
+    rng = random.Random(seed)
+    return [[[rng.choice(COLORS) for _ in range(5)] for _ in range(5)] for _ in range(count)]
+
+def play_chunk(agent_type: str, sequence_length: int, games: List[Dict[str, Any]],
+               q_table_path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """ワーカーで複数ゲームをプレイし、ゲームごとの勝敗・ターン数・CPU時間の合計を返す"""
+    results = []
+    for game in games:
+        result = play_evaluation_game(agent_type, sequence_length, game['seed'], q_table_path,
+                                      board_colors=game['board'], target_sequence=game['target'])
+        results.append({
+            'won': result['won'],
+            'turns': result['turns'],
+            'cpuMs': sum(result['cpuMs'])
+        })
+    return results
+
+def summarize(results: List[Dict[str, Any]], max_turns: int) -> Dict[str, Any]:
+    """ゲームごとの結果を集計する（ターン数は勝利したゲームのみ）"""
+    win_turns = np.asarray([r['turns'] for r in results if r['won']])
+    moves = sum(r['turns'] for r in results)
+    cpu_ms = sum(r['cpuMs'] for r in results)
+    summary = {
+        'games': len(results),
+        'wins': int(win_turns.size),
+        'winRate': win_turns.size / len(results) * 100 if results else 0,
+        'maxTurns': max_turns,
+        'cpuMsPerMove': cpu_ms / moves if moves else None,
+        'cpuSecondsTotal': cpu_ms / 1000
+    }
+    if win_turns.size:
+        summary.update({
+            'meanTurns': float(win_turns.mean()),
+            'p95Turns': float(np.percentile(win_turns, 95)),
+            'maxTurnsToWin': int(win_turns.max())
+        })
+    return summary
+
+def run_exhaustive(agent_types: List[str], sequence_length: int, boards: int = 1, seed: int = 0,
+                   workers: Optional[int] = None, q_table_path: Optional[str] = None,
+                   stream=None) -> Dict[str, Any]:
+    """各エージェントに 盤面数 × 5^L ゲームをプレイさせて集計する"""
+    from color_link.game.color_link import ColorLinkGame
+
+    targets = all_targets(sequence_length)
+    games = [
+        {'seed': derive_seed(seed, board_index, target_index), 'board': board, 'target': target}
+        for board_index, board in enumerate(seeded_boards(boards, seed))
+        for target_index, target in enumerate(targets)
+    ]
+    chunks = [games[i:i + CHUNK_SIZE] for i in range(0, len(games), CHUNK_SIZE)]
+    max_turns = ColorLinkGame().max_turns
+
+    summaries = {}
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, mp_context=context,
+                             initializer=_init_worker) as executor:
+        for agent_type in agent_types:
+            futures = [executor.submit(play_chunk, agent_type, sequence_length, chunk, q_table_path)
+                       for chunk in chunks]
+            # 提出した順に結果を受け取り、ゲームの順序を固定する
+            results = [result for future in futures for result in future.result()]
+            summaries[agent_type] = summarize(results, max_turns)
+            if stream is not None:
+                s = summaries[agent_type]
+                stream.write(f"{agent_type:<8} 勝率={s['winRate']:6.2f}%  平均={s.get('meanTurns', 0):6.2f}  "
+                             f"p95={s.get('p95Turns', 0):5.1f}  最大={s.get('maxTurnsToWin', 0):3d}  "
+                             f"CPU={s['cpuMsPerMove']:.3f}ms/手\n")
+                stream.flush()
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'sequenceLength': sequence_length,
+            'boards': boards,
+            'seed': seed,
+            'gamesPerAgent': len(games)
+        },
+        'results': summaries
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='すべての目標シーケンスに対するエージェントのベンチマーク')
+    parser.add_argument('--agents', nargs='+', default=list(AGENT_TYPES), choices=AGENT_TYPES, help='対象のエージェント')
+    parser.add_argument('--length', type=int, default=3, help='シーケンス長（5^L通りの目標をプレイ）')
+    parser.add_argument('--boards', type=int, default=1, help='固定の盤面の数')
+    parser.add_argument('--seed', type=int, default=0, help='盤面とエージェントの乱数のシード')
+    parser.add_argument('--workers', type=int, default=None, help='ワーカープロセス数（省略時はCPU数）')
+    parser.add_argument('--q-table', default=None, help='RL・ハイブリッドが使うQ値テーブル（省略時は既定の保存先）')
+    parser.add_argument('-o', '--output', help='結果を保存するJSONファイル')
+    args = parser.parse_args(argv)
+
+    report = run_exhaustive(args.agents, args.length, args.boards, args.seed, args.workers,
+                            args.q_table, stream=sys.stdout)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"結果を保存しました: {args.output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""Flask APIの負荷試験
+
+各スレッドが1人のプレイヤーとして、新しいゲームの開始・プレイヤーの手・AIの手を
+ゲームが終わるまで繰り返す（AIタイプはスレッドごとに rule / rl / hybrid を順に割り当てる）。
+ルートごとのスループット・レイテンシのパーセンタイル・エラー率を表示する。
+
+使い方:
+    python -m benchmarks.loadtest --concurrency 8 --duration 30                      # プロセス内のテストクライアント
+    python -m benchmarks.loadtest --url http://127.0.0.1:5000 --concurrency 16 -o load.json  # 起動済みのサーバー
+"""
+import sys
+import json
+import time
+import uuid
+import random
+import logging
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+AI_TYPES = ('rule', 'rl', 'hybrid')
+COLORS = ['red', 'blue', 'yellow', 'green', 'purple']
+
+class InProcessTransport:
+    """プロセス内のFlaskテストクライアントでリクエストする"""
+
+    def __init__(self):
+        from color_link.app import app
+        self.app = app
+
+    def session(self):
+        client = self.app.test_client()
+
+        def request(method: str, path: str, body: Optional[dict], headers: Dict[str, str]) -> Tuple[int, Any]:
+            response = client.open(path, method=method, json=body, headers=headers)
+            return response.status_code, response.get_json(silent=True)
+        return request
+
+class HttpTransport:
+    """ローカルで起動したサーバーにHTTPでリクエストする（プロキシは使わない）"""
+
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self._opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+
+    def session(self):
+        def request(method: str, path: str, body: Optional[dict], headers: Dict[str, str]) -> Tuple[int, Any]:
+            data = json.dumps(body).encode() if body is not None else None
+            req = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                         headers=dict(headers, **({'Content-Type': 'application/json'} if data else {})))
+            try:
+                with self._opener.open(req, timeout=self.timeout) as response:
+                    return response.status, json.loads(response.read() or b'null')
+            except urllib.error.HTTPError as e:
+                return e.code, None
+        return request
+
+class RouteStats:
+    """ルートごとのレイテンシとエラー数（スレッドから記録する）"""
+
+    def __init__(self):
+        self._latencies: Dict[str, List[float]] = {}
+        self._errors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, route: str, seconds: float, error: bool) -> None:
+        with self._lock:
+            self._latencies.setdefault(route, []).append(seconds)
+            if error:
+                self._errors[route] = self._errors.get(route, 0) + 1
+
+    def summary(self, duration: float) -> Dict[str, Any]:
+        with self._lock:
+            routes = {}
+            for route, latencies in sorted(self._latencies.items()):
+                values = np.asarray(latencies) * 1000
+                p50, p95, p99 = np.percentile(values, [50, 95, 99])
+                errors = self._errors.get(route, 0)
+                routes[route] = {
+                    'requests': int(values.size),
+                    'throughput': values.size / duration,
+                    'errors': errors,
+                    'errorRate': errors / values.size,
+                    'latencyMs': {
+                        'p50': float(p50), 'p95': float(p95), 'p99': float(p99),
+                        'max': float(values.max()), 'mean': float(values.mean())
+                    }
+                }
+            total = sum(r['requests'] for r in routes.values())
+            errors = sum(r['errors'] for r in routes.values())
+        return {
+            'requests': total,
+            'throughput': total / duration,
+            'errors': errors,
+            'errorRate': errors / total if total else 0,
+            'routes': routes
+        }
+
+def _player(request, ai_type: str, stats: RouteStats, deadline: float, rng: random.Random,
+            sequence_length: int) -> None:
+    """期限までゲームを繰り返すプレイヤー（プレイヤーの手とAIの手を交互に指す）"""
+    headers = {'X-Session-Id': uuid.uuid4().hex}
+
+    def call(route: str, method: str, path: str, body: Optional[dict] = None):
+        start = time.perf_counter()
+        try:
+            status, data = request(method, path, body, headers)
+        except Exception:
+            status, data = None, None
+        stats.record(route, time.perf_counter() - start, status is None or status >= 400)
+        return data if status is not None and status < 400 else None
+
+    while time.monotonic() < deadline:
+        data = call('POST /api/new_game', 'POST', '/api/new_game',
+                    {'aiType': ai_type, 'sequenceLength': sequence_length})
+        if data is None:
+            continue
+        game_over = False
+        while not game_over and time.monotonic() < deadline:
+            move = {'color': rng.choice(COLORS), 'column': rng.randrange(5)}
+            data = call('POST /api/make_move', 'POST', '/api/make_move', move)
+            if data is None or data['game_state']['gameOver']:
+                break
+            data = call(f'GET /api/ai_move [{ai_type}]', 'GET', '/api/ai_move')
+            game_over = data is None or data['game_state']['gameOver']
+
+def run_load(transport, concurrency: int, duration: float, sequence_length: int = 3,
+             seed: int = 0) -> Dict[str, Any]:
+    """concurrency人のプレイヤーをduration秒間動かして集計する"""
+    stats = RouteStats()
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(target=_player, args=(transport.session(), AI_TYPES[i % len(AI_TYPES)], stats,
+                                               deadline, random.Random(seed + i), sequence_length),
+                         daemon=True)
+        for i in range(concurrency)
+    ]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    report = stats.summary(elapsed)
+    report['meta'] = {
+        'timestamp': datetime.now().isoformat(),
+        'concurrency': concurrency,
+        'duration': elapsed,
+        'sequenceLength': sequence_length
+    }
+    return report
+
+def _format_report(report: Dict[str, Any]) -> List[str]:
+    lines = [f"{'ルート':<32} {'件数':>7} {'件/秒':>8} {'エラー率':>8} {'p50':>8} {'p95':>8} {'p99':>8} (ms)"]
+    for route, r in report['routes'].items():
+        latency = r['latencyMs']
+        lines.append(f"{route:<32} {r['requests']:>7} {r['throughput']:>8.1f} {r['errorRate']:>8.2%} "
+                     f"{latency['p50']:>8.2f} {latency['p95']:>8.2f} {latency['p99']:>8.2f}")
+    lines.append(f"合計: {report['requests']}件, {report['throughput']:.1f}件/秒, エラー率 {report['errorRate']:.2%}")
+    return lines
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Flask APIの負荷試験')
+    parser.add_argument('--url', help='起動済みサーバーのURL（省略時はプロセス内のテストクライアント）')
+    parser.add_argument('--concurrency', type=int, default=4, help='同時に動かすプレイヤー数')
+    parser.add_argument('--duration', type=float, default=10.0, help='実行時間（秒）')
+    parser.add_argument('--length', type=int, default=3, help='シーケンス長')
+    parser.add_argument('--seed', type=int, default=0, help='プレイヤーの手の乱数のシード')
+    parser.add_argument('--log', action='store_true', help='テストクライアントでもアプリのログを出力する')
+    parser.add_argument('-o', '--output', help='結果を保存するJSONファイル')
+    args = parser.parse_args(argv)
+
+    if args.url:
+        transport = HttpTransport(args.url)
+    else:
+        transport = InProcessTransport()
+        if not args.log:
+            logging.disable(logging.INFO)  # リクエストごとのINFOログで端末が埋まらないようにする
+
+    report = run_load(transport, args.concurrency, args.duration, args.length, args.seed)
+    print('\n'.join(_format_report(report)))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"結果を保存しました: {args.output}")
+    return 1 if report['errors'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
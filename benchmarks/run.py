@@ -0,0 +1,135 @@
+"""ベンチマークの実行と基準値との比較
+
+使い方:
+    python -m benchmarks.run                          # すべて実行して結果を表示
+    python -m benchmarks.run -o baseline.json         # 結果を基準値として保存
+    python -m benchmarks.run --compare baseline.json  # 基準値より遅くなったものがあれば終了コード1
+    python -m benchmarks.run --quick rule.            # 名前に "rule." を含むものを少ない回数で実行
+"""
+import sys
+import json
+import time
+import logging
+import platform
+import argparse
+import statistics
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from benchmarks.cases import BENCHMARKS, select
+
+def measure(setup, ops: int, heavy: bool, quick: bool) -> Dict[str, Any]:
+    """1回あたりの時間を測る（1ラウンドが一定時間以上になるよう実行回数を調整し、中央値を取る）"""
+    run = setup()
+    run()  # ウォームアップ（キャッシュの生成などを計測から除く）
+
+    min_round_time = 0.02 if quick else 0.1
+    rounds = (1 if quick else 3) if heavy else (3 if quick else 7)
+
+    # 1ラウンドの実行回数を決める
+    calls = 1
+    if not heavy:
+        while True:
+            start = time.perf_counter()
+            for _ in range(calls):
+                run()
+            if time.perf_counter() - start >= min_round_time:
+                break
+            calls *= 2
+
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(calls):
+            run()
+        samples.append((time.perf_counter() - start) / (calls * ops))
+
+    median = statistics.median(samples)
+    return {
+        'secondsPerOp': median,
+        'minSecondsPerOp': min(samples),
+        'opsPerSecond': 1 / median if median > 0 else None,
+        'rounds': rounds,
+        'callsPerRound': calls,
+        'opsPerCall': ops
+    }
+
+def run_benchmarks(names: List[str], quick: bool = False, stream=None) -> Dict[str, Any]:
+    results = {}
+    for name in names:
+        setup, ops, heavy = BENCHMARKS[name]
+        results[name] = measure(setup, ops, heavy, quick)
+        if stream is not None:
+            result = results[name]
+            stream.write(f"{name:<40} {result['secondsPerOp'] * 1e6:>14.2f} us/op  {result['opsPerSecond']:>12.1f} ops/s\n")
+            stream.flush()
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'quick': quick
+        },
+        'results': results
+    }
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """両方にあるベンチマークの時間の比（現在/基準）を求める（thresholdを超えて遅くなったものはregression）"""
+    rows = []
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        ratio = result['secondsPerOp'] / base['secondsPerOp'] if base['secondsPerOp'] > 0 else float('inf')
+        rows.append({
+            'name': name,
+            'baseline': base['secondsPerOp'],
+            'current': result['secondsPerOp'],
+            'ratio': ratio,
+            'regression': ratio > 1 + threshold
+        })
+    return rows
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='カラーリンクのベンチマーク')
+    parser.add_argument('patterns', nargs='*', help='実行するベンチマーク名に含まれる文字列（省略時はすべて）')
+    parser.add_argument('-o', '--output', help='結果を保存するJSONファイル')
+    parser.add_argument('--compare', help='比較する基準値のJSONファイル')
+    parser.add_argument('--threshold', type=float, default=0.2, help='遅くなったとみなす割合（既定: 0.2 = 20%%）')
+    parser.add_argument('--quick', action='store_true', help='回数を減らして実行（確認用）')
+    parser.add_argument('--list', action='store_true', help='ベンチマークの一覧を表示')
+    args = parser.parse_args(argv)
+
+    names = select(args.patterns)
+    if args.list:
+        print('\n'.join(names))
+        return 0
+    if not names:
+        print(f"該当するベンチマークがありません: {args.patterns}", file=sys.stderr)
+        return 2
+
+    # ログ出力の時間を計測に含めない
+    logging.disable(logging.CRITICAL)
+    current = run_benchmarks(names, quick=args.quick, stream=sys.stdout)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+        print(f"結果を保存しました: {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        rows = compare(baseline, current, args.threshold)
+        print(f"\n基準値との比較（{args.compare}, しきい値={args.threshold:.0%}）")
+        for row in rows:
+            mark = 'REGRESSION' if row['regression'] else ''
+            print(f"{row['name']:<40} {row['ratio']:>7.2f}x  {mark}")
+        regressions = [row['name'] for row in rows if row['regression']]
+        if regressions:
+            print(f"\n{len(regressions)}件のベンチマークが遅くなりました: {', '.join(regressions)}")
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
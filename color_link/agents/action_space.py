@@ -0,0 +1,50 @@
+import random
+import numpy as np
+from typing import Dict, Any, List
+
+# 行動空間：色×列の25通り。インデックスは color_index * NUM_COLUMNS + column
+COLORS = ['red', 'blue', 'yellow', 'green', 'purple']
+NUM_COLUMNS = 5
+NUM_ACTIONS = len(COLORS) * NUM_COLUMNS
+
+def action_index(color: str, column: int) -> int:
+    """色と列から行動インデックスを求める"""
+    return COLORS.index(color) * NUM_COLUMNS + int(column)
+
+def index_to_action(index: int) -> Dict[str, Any]:
+    """行動インデックスを行動（色と列）に変換する"""
+    color_index, column = divmod(int(index), NUM_COLUMNS)
+    return {'color': COLORS[color_index], 'column': column}
+
+def action_key(index: int) -> str:
+    """行動インデックスを "color:column" 形式のキーに変換する"""
+    color_index, column = divmod(int(index), NUM_COLUMNS)
+    return f"{COLORS[color_index]}:{column}"
+
+def best_action_indices(scores: np.ndarray, tolerance: float = 1e-6) -> List[int]:
+    """最大スコアを持つ行動インデックスの一覧（-infは選択対象外）"""
+    if not np.isfinite(scores).any():
+        return []
+    max_score = np.max(scores[np.isfinite(scores)])
+    return np.flatnonzero(np.abs(scores - max_score) < tolerance).tolist()
+
+def select_best_action(scores: np.ndarray, rng=random) -> Dict[str, Any]:
+    """最大スコアの行動を選択する（同点の場合はrngでランダムに選ぶ、候補がなければNone）"""
+    best = best_action_indices(scores)
+    if not best:
+        return None
+    return index_to_action(rng.choice(best))
+
+def normalize_scores(scores: np.ndarray) -> np.ndarray:
+    """スコアベクトルを0〜1に正規化する（-infなどの非有限値は0とする）"""
+    finite = np.isfinite(scores)
+    normalized = np.zeros(NUM_ACTIONS)
+    if not finite.any():
+        return normalized
+    low = scores[finite].min()
+    span = scores[finite].max() - low
+    if span > 0:
+        normalized[finite] = (scores[finite] - low) / span
+    else:
+        normalized[finite] = 1.0
+    return normalized
@@ -1,16 +1,22 @@
-import random
 import json
 import os
 import logging
 import numpy as np
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 from color_link.agents.rule_based_agent import RuleBasedAgent
 from color_link.agents.rl_agent import RLAgent
+from color_link.agents.action_space import NUM_ACTIONS, normalize_scores, select_best_action
+from color_link import metrics
+from color_link.profiling import profiled
+from color_link.events import EVENTS
+from color_link.game.feedback import column_top
+from color_link.rng import RandomLike, resolve_rng
 
 logger = logging.getLogger(__name__)
 
 class HybridAgent:
-    def __init__(self, rule_weight: float = 0.7, learning_rate: float = 0.1, discount_factor: float = 0.9):
+    def __init__(self, rule_weight: float = 0.7, learning_rate: float = 0.1, discount_factor: float = 0.9,
+                 rng: RandomLike = None):
         """
         ルールベースと強化学習を組み合わせたハイブリッドエージェント
         
@@ -18,12 +24,14 @@ class HybridAgent:
             rule_weight: ルールベースの意見の重み（0〜1）
             learning_rate: 学習率
             discount_factor: 割引率
+            rng: 乱数生成器またはシード（省略時はグローバルなrandomモジュール。内部の両エージェントと共有する）
         """
         self.colors = ['red', 'blue', 'yellow', 'green', 'purple']
+        self.rng = resolve_rng(rng)
         
         # 両方のエージェントをサブコンポーネントとして初期化
-        self.rule_agent = RuleBasedAgent()
-        self.rl_agent = RLAgent(learning_rate=learning_rate, discount_factor=discount_factor)
+        self.rule_agent = RuleBasedAgent(rng=self.rng)
+        self.rl_agent = RLAgent(learning_rate=learning_rate, discount_factor=discount_factor, rng=self.rng)
         
         # ハイブリッド設定
         self.rule_weight = rule_weight  # ルールベースの意見の重み（0〜1）
@@ -42,6 +50,7 @@ class HybridAgent:
         # 状態記憶
         self.prev_state = None
         self.prev_action = None
+        self.last_search_complete = True  # 直前の行動決定で探索を打ち切らずに済んだか
         
         logger.info(f"ハイブリッドエージェントが初期化されました（ルール重み={rule_weight:.2f}）")
     
@@ -56,8 +65,10 @@ class HybridAgent:
         self.rl_agent.learning_mode = value
         logger.info(f"ハイブリッドエージェントの学習モードを {value} に設定しました")
     
-    def decide_next_move(self, game_state: Dict[str, Any]) -> Dict[str, Any]:
-        """ハイブリッド戦略に基づいて次の行動を決定"""
+    @profiled('decide_next_move')
+    def decide_next_move(self, game_state: Dict[str, Any], deadline: Optional[float] = None) -> Dict[str, Any]:
+        """ハイブリッド戦略に基づいて次の行動を決定（deadlineはtime.monotonic()基準の期限）"""
+        self.last_search_complete = True
         try:
             history = game_state['history']
             sequence_length = game_state.get('sequenceLength', 3)
@@ -69,47 +80,36 @@ class HybridAgent:
             # ゲーム状態に応じた重み調整
             self._adjust_weights(game_state)
             
-            # ルールベースエージェントの意見を取得
-            try:
-                rule_action = self.rule_agent.decide_next_move(game_state)
-            except Exception as e:
-                logger.error(f"ルールベース行動決定エラー: {str(e)}")
-                # エラー時はランダムな行動
-                rule_action = {
-                    'color': random.choice(self.colors),
-                    'column': random.randint(0, 4)
-                }
-            
-            # 強化学習エージェントの意見を取得
-            try:
-                rl_action = self.rl_agent.decide_next_move(game_state)
-            except Exception as e:
-                logger.error(f"強化学習行動決定エラー: {str(e)}")
-                # エラー時はランダムな行動
-                rl_action = {
-                    'color': random.choice(self.colors),
-                    'column': random.randint(0, 4)
-                }
-            
-            # 行動の決定方法
+            # 先に戦略を決定し、必要なサブエージェントだけを評価する
             action_method = self._decide_action_method(game_state)
             final_action = None
             
             if action_method == 'rule':
                 # ルールベースの意見を採用
-                final_action = rule_action
-                logger.info(f"ルールベース戦略を採用: 色={final_action['color']}, 列={final_action['column']}")
+                final_action = self._get_rule_action(game_state, deadline)
+                self.last_search_complete = self.rule_agent.last_search_complete
+                logger.debug("ルールベース戦略を採用: 色=%s, 列=%d", final_action['color'], final_action['column'])
             
             elif action_method == 'rl':
                 # 強化学習の意見を採用
-                final_action = rl_action
-                logger.info(f"強化学習戦略を採用: 色={final_action['color']}, 列={final_action['column']}")
+                final_action = self._get_rl_action(game_state, deadline)
+                self.last_search_complete = self.rl_agent.last_search_complete
+                logger.debug("強化学習戦略を採用: 色=%s, 列=%d", final_action['color'], final_action['column'])
             
             elif action_method == 'weighted':
-                # 両方の意見を重み付けで統合
-                final_action = self._combine_actions(rule_action, rl_action, game_state)
-                logger.info(f"統合戦略を採用: 色={final_action['color']}, 列={final_action['column']} " +
-                          f"(ルール重み={self.rule_weight:.2f}, RL重み={self.rl_weight:.2f})")
+                # 両方のスコアベクトルを重み付けで統合
+                final_action = select_best_action(self.score_actions(game_state, deadline), self.rng)
+                self.last_search_complete = self.rule_agent.last_search_complete
+                # 実際に選んだ列を各エージェントに記憶させる
+                self.rule_agent.last_column = final_action['column']
+                self.rl_agent.last_column = final_action['column']
+                self.rl_agent.last_color = final_action['color']
+                logger.debug("統合戦略を採用: 色=%s, 列=%d (ルール重み=%.2f, RL重み=%.2f)",
+                             final_action['color'], final_action['column'], self.rule_weight, self.rl_weight)
+            
+            if EVENTS:
+                EVENTS.emit('agent.action', agent='hybrid', color=final_action['color'],
+                            column=final_action['column'], strategy=action_method)
             
             # 行動を記憶（学習用）
             self.prev_state = game_state
@@ -120,12 +120,50 @@ class HybridAgent:
         except Exception as e:
             # 最終的なフォールバック：何かエラーが起きたら安全にランダムな行動をとる
             logger.error(f"行動決定中に重大なエラー: {str(e)}")
+            self.last_search_complete = False
             fallback_action = {
-                'color': random.choice(self.colors),
-                'column': random.randint(0, 4)
+                'color': self.rng.choice(self.colors),
+                'column': self.rng.randint(0, 4)
             }
             return fallback_action
     
+    def observe(self, game_state: Dict[str, Any]) -> None:
+        """直前の行動結果を反映してシーケンス候補を更新する（行動は選ばない）"""
+        self._update_possible_sequences(game_state)
+    
+    def reset_episode(self) -> None:
+        """前のゲームのシーケンス候補と記憶した状態を捨てる（内部のRLエージェントも同様）"""
+        self.possible_sequences = []
+        self.prev_state = None
+        self.prev_action = None
+        self.rl_agent.reset_episode()
+    
+    def _get_rule_action(self, game_state: Dict[str, Any], deadline: Optional[float] = None) -> Dict[str, Any]:
+        """ルールベースエージェントの意見を取得（絞り込み済みの候補を共有して再計算を省く）"""
+        try:
+            if len(game_state['history']) == 0:
+                return self.rule_agent.decide_next_move(game_state, deadline)
+            return self.rule_agent.decide_from_candidates(game_state, self.possible_sequences, deadline)
+        except Exception as e:
+            logger.error(f"ルールベース行動決定エラー: {str(e)}")
+            # エラー時はランダムな行動
+            return {
+                'color': self.rng.choice(self.colors),
+                'column': self.rng.randint(0, 4)
+            }
+    
+    def _get_rl_action(self, game_state: Dict[str, Any], deadline: Optional[float] = None) -> Dict[str, Any]:
+        """強化学習エージェントの意見を取得"""
+        try:
+            return self.rl_agent.decide_next_move(game_state, deadline)
+        except Exception as e:
+            logger.error(f"強化学習行動決定エラー: {str(e)}")
+            # エラー時はランダムな行動
+            return {
+                'color': self.rng.choice(self.colors),
+                'column': self.rng.randint(0, 4)
+            }
+    
     def _update_possible_sequences(self, game_state: Dict[str, Any]) -> None:
         """可能性のあるシーケンスを更新（RLエージェントとの共有も行う）"""
         try:
@@ -137,8 +175,8 @@ class HybridAgent:
             if len(history) == 0:
                 self.possible_sequences = self.rule_agent._generate_all_sequences(sequence_length)
                 # RLエージェントとも共有
-                self.rl_agent.possible_sequences = self.possible_sequences.copy()
-                logger.info(f"初期シーケンス生成: {len(self.possible_sequences)}個のシーケンス")
+                self.rl_agent.set_possible_sequences(self.possible_sequences.copy(), len(history))
+                logger.debug("初期シーケンス生成: %d個のシーケンス", len(self.possible_sequences))
                 return
             
             # 直前の行動結果からシーケンスを絞り込む
@@ -154,15 +192,19 @@ class HybridAgent:
                     return
                 
                 # 現在の列の状態
-                column_state = [board[i][column]['color'] for i in range(sequence_length)]
+                column_state = column_top(board, column, sequence_length)
                 
                 # シーケンスを絞り込む
                 prev_count = len(self.possible_sequences)
                 self.possible_sequences = self.rule_agent._filter_sequences(self.possible_sequences, column_state, hits, blows)
-                # RLエージェントとも共有
-                self.rl_agent.possible_sequences = self.possible_sequences.copy()
+                metrics.observe_candidates(len(history), len(self.possible_sequences))
+                if EVENTS:
+                    EVENTS.emit('agent.candidates', agent='hybrid', turn=len(history),
+                                before=prev_count, after=len(self.possible_sequences))
+                # RLエージェントとも共有（同じターンでの再絞り込みを省く）
+                self.rl_agent.set_possible_sequences(self.possible_sequences.copy(), len(history))
                 
-                logger.info(f"ハイブリッド: シーケンス絞り込み: {prev_count} -> {len(self.possible_sequences)}個")
+                logger.debug("ハイブリッド: シーケンス絞り込み: %d -> %d個", prev_count, len(self.possible_sequences))
         except Exception as e:
             logger.error(f"シーケンス更新中にエラー: {str(e)}")
             # エラーが発生した場合、安全のためシーケンスをリセットせず現状維持
@@ -196,7 +238,7 @@ class HybridAgent:
             return 'weighted'
         else:
             # 学習モードではRLの探索をより活かす
-            if self.learning_mode and random.random() < 0.3:
+            if self.learning_mode and self.rng.random() < 0.3:
                 return 'rl'
             return 'weighted'  # より協調的にする
     
@@ -234,47 +276,39 @@ class HybridAgent:
         self.rule_weight = min(0.9, max(0.1, adjusted_rule_weight))
         self.rl_weight = 1.0 - self.rule_weight
         
-        logger.debug(f"重み調整: 進行度={game_progress:.2f}, " +
-                   f"シーケンス候補数={sequence_count}, " +
-                   f"ルール重み={self.rule_weight:.2f}")
+        logger.debug("重み調整: 進行度=%.2f, シーケンス候補数=%d, ルール重み=%.2f",
+                     game_progress, sequence_count, self.rule_weight)
     
-    def _combine_actions(self, rule_action: Dict[str, Any], rl_action: Dict[str, Any], 
-                        game_state: Dict[str, Any]) -> Dict[str, Any]:
-        """両方のエージェントの意見を統合"""
-        # 各色と列の組み合わせに対するスコアを計算
-        action_scores = {}
-        
-        # すべての行動の組み合わせのスコアを初期化
-        for color in self.colors:
-            for column in range(5):
-                action_key = f"{color}:{column}"
-                action_scores[action_key] = 0.0
-        
-        # ルールベースの意見を反映
-        rule_key = f"{rule_action['color']}:{rule_action['column']}"
-        action_scores[rule_key] += self.rule_weight
-        
-        # 強化学習の意見を反映
-        rl_key = f"{rl_action['color']}:{rl_action['column']}"
-        action_scores[rl_key] += self.rl_weight
-        
-        # 最高スコアの行動を選択（同点の場合はランダム）
-        max_score = max(action_scores.values())
-        best_actions = [
-            action.split(':')
-            for action, score in action_scores.items()
-            if abs(score - max_score) < 1e-6  # 浮動小数点の比較を考慮
-        ]
-        
-        # 最良行動をランダムに選択
-        color, column_str = random.choice(best_actions)
-        column = int(column_str)
-        
-        return {
-            'color': color,
-            'column': column
-        }
+    def score_actions(self, game_state: Dict[str, Any], deadline: Optional[float] = None) -> np.ndarray:
+        """両エージェントのスコアベクトルを正規化し、現在の重みで統合する
+
+        学習していない状態のQ値は初期化時の乱数にすぎず、正規化すると差が0〜1に引き伸ばされるため統合しない。
+        """
+        scores = self.rule_weight * normalize_scores(self._get_rule_scores(game_state, deadline))
+        rl_scores = self._get_rl_scores(game_state)
+        if rl_scores is not None:
+            scores += self.rl_weight * normalize_scores(rl_scores)
+        return scores
+    
+    def _get_rule_scores(self, game_state: Dict[str, Any], deadline: Optional[float] = None) -> np.ndarray:
+        """ルールベースエージェントのスコアベクトルを取得"""
+        try:
+            self.rule_agent.possible_sequences = self.possible_sequences
+            return self.rule_agent.score_actions(game_state, deadline=deadline)
+        except Exception as e:
+            logger.error(f"ルールベーススコア計算エラー: {str(e)}")
+            return np.zeros(NUM_ACTIONS)
+    
+    def _get_rl_scores(self, game_state: Dict[str, Any]) -> Optional[np.ndarray]:
+        """強化学習エージェントのスコアベクトル（Q値）を取得（学習していない状態やエラーのときはNone）"""
+        try:
+            scores = self.rl_agent.score_actions(game_state)
+        except Exception as e:
+            logger.error(f"強化学習スコア計算エラー: {str(e)}")
+            return None
+        return scores if self.rl_agent.last_state_visits > 0 else None
     
+    @profiled('learn')
     def learn(self, prev_state: Dict[str, Any], action: Dict[str, Any], 
               reward: float, new_state: Dict[str, Any]) -> None:
         """学習（強化学習エージェントのみ学習する）"""
@@ -288,10 +322,28 @@ class HybridAgent:
         """報酬を計算（強化学習エージェントの報酬計算を利用）"""
         return self.rl_agent.calculate_reward(game_state)
     
-    def save_q_table(self) -> None:
+    def get_checkpoint_state(self) -> Dict[str, Any]:
+        """トレーニングを途中から再開するための学習状態（内部の両エージェントを含む）"""
+        return {
+            'rule_weight': self.rule_weight,
+            'rl_weight': self.rl_weight,
+            'possible_sequences': self.possible_sequences,
+            'rule_agent': self.rule_agent.get_checkpoint_state(),
+            'rl_agent': self.rl_agent.get_checkpoint_state()
+        }
+    
+    def restore_checkpoint_state(self, state: Dict[str, Any]) -> None:
+        """get_checkpoint_stateで保存した学習状態を復元する"""
+        self.rule_weight = state['rule_weight']
+        self.rl_weight = state['rl_weight']
+        self.possible_sequences = state['possible_sequences']
+        self.rule_agent.restore_checkpoint_state(state['rule_agent'])
+        self.rl_agent.restore_checkpoint_state(state['rl_agent'])
+    
+    def save_q_table(self, file_path: Optional[str] = None) -> None:
         """Q値テーブルを保存（強化学習エージェントの機能を利用）"""
-        self.rl_agent.save_q_table()
+        self.rl_agent.save_q_table(file_path)
     
-    def load_q_table(self) -> None:
+    def load_q_table(self, file_path: Optional[str] = None) -> None:
         """Q値テーブルを読み込み（強化学習エージェントの機能を利用）"""
-        self.rl_agent.load_q_table() 
\ No newline at end of file
+        self.rl_agent.load_q_table(file_path) 
\ No newline at end of file
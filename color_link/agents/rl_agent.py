@@ -1,17 +1,27 @@
-import random
 import json
 import os
 import logging
+import threading
 import numpy as np
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 from color_link.agents.rule_based_agent import RuleBasedAgent
+from color_link.agents.action_space import NUM_ACTIONS, action_index, index_to_action, best_action_indices
+from color_link import metrics
+from color_link.profiling import profiled
+from color_link.events import EVENTS
+from color_link.game.feedback import column_top
+from color_link.rng import RandomLike, resolve_rng
 
 logger = logging.getLogger(__name__)
 
 class RLAgent:
-    def __init__(self, learning_rate: float = 0.1, discount_factor: float = 0.9, exploration_rate: float = 0.5):
+    def __init__(self, learning_rate: float = 0.1, discount_factor: float = 0.9, exploration_rate: float = 0.5,
+                 rng: RandomLike = None):
         self.colors = ['red', 'blue', 'yellow', 'green', 'purple']
+        self.rng = resolve_rng(rng)  # 乱数生成器（省略時はグローバルなrandomモジュール）
         self.q_table = {}  # Q値テーブル
+        self.visit_counts = {}  # 状態ごとの学習回数（Q値テーブルの統計用）
+        self.table_lock = threading.RLock()  # Q値テーブルと学習回数を読み書きするときのロック（テーブルを共有するエージェント同士で共有する）
         self.learning_rate = learning_rate
         self.discount_factor = discount_factor
         self.exploration_rate = exploration_rate  # 探索率
@@ -19,10 +29,14 @@ class RLAgent:
         self.last_column = -1  # 前回の列を記憶して偏りを防ぐ
         self.last_color = None  # 前回の色を記憶して偏りを防ぐ
         self.exploration_count = 0  # 探索回数のカウント
+        self.last_search_complete = True  # 直前の行動決定で探索を打ち切らずに済んだか
+        self.last_state_visits = 0  # 直前にscore_actionsで評価した状態の学習回数
         
         # 論理的推論のためにルールベースエージェントの機能を利用
-        self.rule_agent = RuleBasedAgent()
+        self.rule_agent = RuleBasedAgent(rng=self.rng)
         self.possible_sequences = []  # 可能性のある色の組み合わせ
+        self._sequences_turn = -1  # possible_sequencesを最後に更新したターン
+        self._turn_cache = None  # 同一ターン内の特徴量・状態キーのキャッシュ
         
         # Q値テーブルの初期化
         self._initialize_q_table()
@@ -41,34 +55,51 @@ class RLAgent:
                 for column in range(5):
                     action_key = f"{color}:{column}"
                     # 初期値に微小な乱数を加えて偏りを軽減
-                    self.q_table[default_state][action_key] = 0.1 + random.random() * 0.01
+                    self.q_table[default_state][action_key] = 0.1 + self.rng.random() * 0.01
     
-    def _extract_features(self, game_state: Dict[str, Any]) -> Dict[str, Any]:
-        """ゲーム状態から特徴量を抽出"""
+    def share_table(self, other: 'RLAgent') -> None:
+        """otherのQ値テーブル・学習回数とそのロックを共有する（複数のスレッドから使うエージェント用）"""
+        self.q_table = other.q_table
+        self.visit_counts = other.visit_counts
+        self.table_lock = other.table_lock
+    
+    def snapshot_table(self) -> Tuple[Dict[str, Dict[str, float]], Dict[str, int]]:
+        """Q値テーブルと学習回数のコピー（ほかのスレッドが学習中でも一貫した内容で集計・保存できる）"""
+        with self.table_lock:
+            return {key: dict(q_values) for key, q_values in self.q_table.items()}, dict(self.visit_counts)
+    
+    def set_possible_sequences(self, possible_sequences: List[List[str]], turn: int) -> None:
+        """外部で絞り込み済みのシーケンス候補を共有する（同じターンでの再絞り込みを省く）"""
+        self.possible_sequences = possible_sequences
+        self._sequences_turn = turn
+    
+    def observe(self, game_state: Dict[str, Any]) -> None:
+        """直前の行動結果を反映してシーケンス候補を更新する（行動は選ばない）"""
+        self._update_possible_sequences(game_state)
+    
+    def reset_episode(self) -> None:
+        """シーケンス候補と報酬計算用の前回の候補数を捨てて、新しいゲームを最初から観測できるようにする"""
+        self.possible_sequences = []
+        self._sequences_turn = -1
+        self._turn_cache = None
+        if hasattr(self, 'prev_possibilities_count'):
+            del self.prev_possibilities_count
+    
+    def _update_possible_sequences(self, game_state: Dict[str, Any]) -> None:
+        """履歴に基づいてシーケンス候補を更新（同じターンでは一度だけ行う）"""
         board = game_state['board']
         history = game_state['history']
         sequence_length = game_state.get('sequenceLength', 3)
+        turn = len(history)
         
-        # ボードの状態を数値特徴量に変換
-        board_features = []
-        color_values = {'red': 0, 'blue': 0.25, 'yellow': 0.5, 'green': 0.75, 'purple': 1}
-        
-        for row in board:
-            for cell in row:
-                board_features.append(color_values[cell['color']])
-        
-        # 履歴から特徴量を抽出（直近の操作結果）
-        history_features = []
-        for h in history[-3:] if len(history) >= 3 else history:
-            history_features.extend([h['hits'] / 5, h['blows'] / 5])
-        
-        # 可能性のある色の組み合わせから特徴量を抽出
-        possibility_features = []
+        if self._sequences_turn == turn:
+            # このターンの候補は絞り込み済み
+            return
         
         # ゲーム開始時は可能なシーケンスを全て列挙
         if len(self.possible_sequences) == 0 and len(history) == 0:
             self.possible_sequences = self.rule_agent._generate_all_sequences(sequence_length)
-            logger.info(f"初期シーケンス生成: {len(self.possible_sequences)}個のシーケンス")
+            logger.debug("初期シーケンス生成: %d個のシーケンス", len(self.possible_sequences))
         # 直前の行動結果からシーケンスを絞り込む
         elif len(history) > 0:
             last_move = history[-1]
@@ -77,12 +108,51 @@ class RLAgent:
             blows = last_move['blows']
             
             # 現在の列の状態
-            column_state = [board[i][column]['color'] for i in range(sequence_length)]
+            column_state = column_top(board, column, sequence_length)
             
             # シーケンスを絞り込む
             prev_count = len(self.possible_sequences)
             self.possible_sequences = self.rule_agent._filter_sequences(self.possible_sequences, column_state, hits, blows)
-            logger.info(f"RL: シーケンス絞り込み: {prev_count} -> {len(self.possible_sequences)}個")
+            metrics.observe_candidates(turn, len(self.possible_sequences))
+            if EVENTS:
+                EVENTS.emit('agent.candidates', agent='rl', turn=turn,
+                            before=prev_count, after=len(self.possible_sequences))
+            logger.debug("RL: シーケンス絞り込み: %d -> %d個", prev_count, len(self.possible_sequences))
+        
+        self._sequences_turn = turn
+    
+    def _extract_features(self, game_state: Dict[str, Any]) -> Dict[str, Any]:
+        """ゲーム状態から特徴量を抽出"""
+        board = game_state['board']
+        history = game_state['history']
+        
+        self._update_possible_sequences(game_state)
+        
+        # 同じターン・同じ盤面・同じ候補集合なら前回の特徴量を再利用
+        signature = (
+            len(history),
+            tuple(cell['color'] for row in board for cell in row),
+            tuple((h['hits'], h['blows']) for h in history[-3:])
+        )
+        cache = self._turn_cache
+        if cache is not None and cache['signature'] == signature and cache['candidates'] is self.possible_sequences:
+            return cache['features']
+        
+        # ボードの状態を数値特徴量に変換
+        board_features = []
+        color_values = {'red': 0, 'blue': 0.25, 'yellow': 0.5, 'green': 0.75, 'purple': 1}
+        
+        for row in board:
+            for cell in row:
+                board_features.append(color_values[cell['color']])
+        
+        # 履歴から特徴量を抽出（直近の操作結果）
+        history_features = []
+        for h in history[-3:] if len(history) >= 3 else history:
+            history_features.extend([h['hits'] / 5, h['blows'] / 5])
+        
+        # 可能性のある色の組み合わせから特徴量を抽出
+        possibility_features = []
         
         # 可能性のある組み合わせの数を特徴量に変換
         num_possibilities = len(self.possible_sequences)
@@ -102,27 +172,41 @@ class RLAgent:
             # 可能性がない場合はゼロで埋める
             possibility_features = [0.0] * (1 + len(self.colors))
         
-        return {
+        features = {
             'board_features': board_features,
             'history_features': history_features,
             'possibility_features': possibility_features
         }
+        self._turn_cache = {
+            'signature': signature,
+            'candidates': self.possible_sequences,
+            'features': features,
+            'state_key': None
+        }
+        return features
     
     def _get_state_key(self, game_state: Dict[str, Any]) -> str:
         """状態をハッシュ化してキーに変換"""
         features = self._extract_features(game_state)
         
+        # 同じ特徴量に対する状態キーはターン内で使い回す
+        cache = self._turn_cache
+        if cache['features'] is features and cache['state_key'] is not None:
+            return cache['state_key']
+        
         # 特徴量の精度を下げて状態空間を削減
         simplified_board_features = [round(f * 4) / 4 for f in features['board_features']]
         
         # 可能性のある組み合わせの特徴量を追加
         possibility_info = features['possibility_features']
         
-        return json.dumps({
+        state_key = json.dumps({
             'board': simplified_board_features,
             'history': features['history_features'],
             'possibilities': possibility_info
         })
+        cache['state_key'] = state_key
+        return state_key
     
     def _get_action_key(self, action: Dict[str, Any]) -> str:
         """行動をキーに変換"""
@@ -139,11 +223,11 @@ class RLAgent:
         available_colors = self.colors.copy()
         if self.last_color:
             # 80%の確率で前回と異なる色を選ぶ
-            if random.random() < 0.8 and self.last_color in available_colors:
+            if self.rng.random() < 0.8 and self.last_color in available_colors:
                 available_colors.remove(self.last_color)
         
         # 可能性のある組み合わせに基づく探索（20%の確率で利用）
-        if random.random() < 0.2 and len(self.possible_sequences) > 0:
+        if self.rng.random() < 0.2 and len(self.possible_sequences) > 0:
             try:
                 # 可能性のある組み合わせから色の出現頻度を計算
                 color_freq = {color: 0 for color in self.colors}
@@ -159,46 +243,39 @@ class RLAgent:
                     
                     # 重みの合計が0より大きいことを確認
                     if sum(weights) > 0:
-                        color = random.choices(available_colors, weights=weights, k=1)[0]
+                        color = self.rng.choices(available_colors, weights=weights, k=1)[0]
                     else:
-                        color = random.choice(available_colors)
+                        color = self.rng.choice(available_colors)
                 else:
-                    color = random.choice(available_colors)
+                    color = self.rng.choice(available_colors)
             except Exception as e:
                 logger.warning(f"色の選択中にエラー: {str(e)}")
-                color = random.choice(available_colors)
+                color = self.rng.choice(available_colors)
         else:
-            color = random.choice(available_colors)
+            color = self.rng.choice(available_colors)
         
-        column = random.choice(available_columns)
+        column = self.rng.choice(available_columns)
         
         # 記憶を更新
         self.last_column = column
         self.last_color = color
         
         self.exploration_count += 1
-        logger.debug(f"多様な探索行動: 色={color}, 列={column}, 探索回数={self.exploration_count}")
+        logger.debug("多様な探索行動: 色=%s, 列=%d, 探索回数=%d", color, column, self.exploration_count)
         
         return {
             'color': color,
             'column': column
         }
     
-    def _logical_exploration_action(self) -> Dict[str, Any]:
-        """論理的な推論に基づく探索行動"""
+    def _logical_exploration_action(self, game_state: Dict[str, Any], deadline: Optional[float] = None) -> Dict[str, Any]:
+        """論理的な推論に基づく探索行動（実際の盤面で各行動の情報量を評価する）"""
         # 可能性のある組み合わせが十分にある場合は論理的な推論を利用
         if len(self.possible_sequences) > 5:
             try:
-                # 正しい構造のダミーボードを作成
-                sequence_length = 3  # デフォルト値
-                dummy_board = [[{'color': 'red'} for _ in range(5)] for _ in range(sequence_length)]
-                game_state = {
-                    'board': dummy_board, 
-                    'history': [], 
-                    'sequenceLength': sequence_length
-                }
-                action = self.rule_agent._choose_best_action(game_state, self.possible_sequences)
-                logger.info(f"論理的探索行動: 色={action['color']}, 列={action['column']}")
+                action = self.rule_agent._choose_best_action(game_state, self.possible_sequences, deadline)
+                self.last_search_complete = self.rule_agent.last_search_complete
+                logger.debug("論理的探索行動: 色=%s, 列=%d", action['color'], action['column'])
                 
                 # 記憶を更新
                 self.last_column = action['column']
@@ -213,8 +290,11 @@ class RLAgent:
             # 可能性のある組み合わせが少ない場合は多様な探索
             return self._get_diverse_exploration_action()
     
-    def decide_next_move(self, game_state: Dict[str, Any]) -> Dict[str, Any]:
-        """強化学習に基づいて次の行動を決定"""
+    @profiled('decide_next_move')
+    def decide_next_move(self, game_state: Dict[str, Any], deadline: Optional[float] = None) -> Dict[str, Any]:
+        """強化学習に基づいて次の行動を決定（deadlineはtime.monotonic()基準の期限）"""
+        self.last_search_complete = True
+        
         # ゲーム状態から特徴量を抽出し、状態キーを取得
         state_key = self._get_state_key(game_state)
         history_length = len(game_state['history'])
@@ -235,77 +315,113 @@ class RLAgent:
             # 学習モードでなくても、たまには探索する（10%）
             effective_exploration_rate = 0.1
         
-        logger.info(f"行動決定開始: 履歴数={history_length}, 有効探索率={effective_exploration_rate:.2f}")
+        logger.debug("行動決定開始: 履歴数=%d, 有効探索率=%.2f", history_length, effective_exploration_rate)
         
         # 探索 vs 活用（ε-greedy戦略）
-        if random.random() < effective_exploration_rate:
+        if self.rng.random() < effective_exploration_rate:
             # 50%の確率で論理的探索を使用、それ以外は多様な探索
-            if random.random() < 0.5:
-                action = self._logical_exploration_action()
+            if self.rng.random() < 0.5:
+                action = self._logical_exploration_action(game_state, deadline)
             else:
                 action = self._get_diverse_exploration_action()
-            logger.info(f"探索行動: 色={action['color']}, 列={action['column']}")
+            if EVENTS:
+                EVENTS.emit('agent.action', agent='rl', color=action['color'], column=action['column'],
+                            strategy='explore')
+            logger.debug("探索行動: 色=%s, 列=%d", action['color'], action['column'])
             return action
         else:
             # Q値に基づく最適な行動（活用）
-            q_values = self.q_table.get(state_key, {})
-            
-            # この状態のQ値がない場合は初期化
-            if not q_values:
-                q_values = {}
-                for color in self.colors:
-                    for column in range(5):
-                        action_key = f"{color}:{column}"
-                        # 微小なランダム値を加えて初期値に多様性を持たせる
-                        q_values[action_key] = 0.1 + random.random() * 0.01
-                
-                self.q_table[state_key] = q_values
-                logger.info(f"新しい状態のQ値を初期化: キー={state_key[:20]}...")
+            scores = self._q_scores(state_key)
             
             # 最大Q値を持つ行動を選択
             # ただし、同じQ値を持つ行動が複数ある場合はランダムに選択
-            max_q_value = max(q_values.values())
-            best_actions = [
-                (color, int(column))
-                for action_key, value in q_values.items()
-                if abs(value - max_q_value) < 1e-6  # 浮動小数点の比較を考慮
-                for color, column in [action_key.split(':')]
-            ]
+            best_indices = best_action_indices(scores)
             
             # 複数の最適行動からランダムに選択
-            if best_actions:
-                color, column = random.choice(best_actions)
-                action = {'color': color, 'column': column}
+            if best_indices:
+                action = index_to_action(self.rng.choice(best_indices))
                 # 選ばれた行動を記憶
-                self.last_column = column
-                self.last_color = color
-                logger.info(f"最適行動: 色={color}, 列={column}, Q値={max_q_value:.4f}, 候補数={len(best_actions)}")
+                self.last_column = action['column']
+                self.last_color = action['color']
+                if EVENTS:
+                    EVENTS.emit('agent.action', agent='rl', color=action['color'], column=action['column'],
+                                strategy='exploit', q_value=float(scores[best_indices[0]]))
+                logger.debug("最適行動: 色=%s, 列=%d, Q値=%.4f, 候補数=%d",
+                             action['color'], action['column'], scores[best_indices[0]], len(best_indices))
                 return action
             
             # フォールバック（通常は発生しない）
             logger.warning("最適行動が見つからず、フォールバックを使用")
             return self._get_diverse_exploration_action()
     
+    def _get_q_values(self, state_key: str) -> Dict[str, float]:
+        """状態のQ値を取得（未知の状態は初期化して登録する）"""
+        q_values = self.q_table.get(state_key, {})
+        
+        # この状態のQ値がない場合は初期化
+        if not q_values:
+            q_values = {}
+            for color in self.colors:
+                for column in range(5):
+                    action_key = f"{color}:{column}"
+                    # 微小なランダム値を加えて初期値に多様性を持たせる
+                    q_values[action_key] = 0.1 + self.rng.random() * 0.01
+            
+            self.q_table[state_key] = q_values
+            logger.debug("新しい状態のQ値を初期化: キー=%s...", state_key[:20])
+        
+        return q_values
+    
+    def _q_scores(self, state_key: str) -> np.ndarray:
+        """状態のQ値ベクトル（未知の状態は初期化して登録する）"""
+        with self.table_lock:
+            return self._q_vector(self._get_q_values(state_key))
+    
+    def _q_vector(self, q_values: Dict[str, float]) -> np.ndarray:
+        """Q値の辞書を25要素のベクトルに変換（未登録の行動は-inf）"""
+        scores = np.full(NUM_ACTIONS, -np.inf)
+        for key, value in q_values.items():
+            color, column = key.split(':')
+            scores[action_index(color, int(column))] = value
+        return scores
+    
+    def score_actions(self, game_state: Dict[str, Any]) -> np.ndarray:
+        """現在の状態における全25行動のQ値ベクトルを返す（状態の学習回数はlast_state_visitsに残す）"""
+        state_key = self._get_state_key(game_state)
+        with self.table_lock:
+            self.last_state_visits = self.visit_counts.get(state_key, 0)
+            return self._q_scores(state_key)
+    
+    @profiled('learn')
     def learn(self, prev_state: Dict[str, Any], action: Dict[str, Any], 
               reward: float, new_state: Dict[str, Any]) -> None:
         """Q値を更新して学習"""
         if not self.learning_mode:
             return
         
+        # 状態キーの計算（候補の絞り込み）はテーブルのロックの外で行う
         prev_state_key = self._get_state_key(prev_state)
         action_key = self._get_action_key(action)
+        next_state_key = self._get_state_key(new_state)
+        
+        with self.table_lock:
+            self._update_q_value(prev_state_key, action_key, next_state_key, reward, new_state)
+    
+    def _update_q_value(self, prev_state_key: str, action_key: str, next_state_key: str,
+                        reward: float, new_state: Dict[str, Any]) -> None:
+        """1回分のQ値の更新（table_lockを取得して呼ぶ）"""
+        self.visit_counts[prev_state_key] = self.visit_counts.get(prev_state_key, 0) + 1
         
         # 現在の状態・行動に対するQ値を取得
         if prev_state_key not in self.q_table:
             self.q_table[prev_state_key] = {}
         
         if action_key not in self.q_table[prev_state_key]:
-            self.q_table[prev_state_key][action_key] = 0.1 + random.random() * 0.01
+            self.q_table[prev_state_key][action_key] = 0.1 + self.rng.random() * 0.01
         
         current_q = self.q_table[prev_state_key][action_key]
         
         # 次の状態における最大Q値を見つける
-        next_state_key = self._get_state_key(new_state)
         next_q_values = self.q_table.get(next_state_key, {})
         
         max_next_q = 0
@@ -327,7 +443,7 @@ class RLAgent:
         # Q値を保存
         self.q_table[prev_state_key][action_key] = new_q
         
-        logger.debug(f"Q値更新: {action_key}, {current_q:.4f} -> {new_q:.4f}, 報酬={reward:.4f}")
+        logger.debug("Q値更新: %s, %.4f -> %.4f, 報酬=%.4f", action_key, current_q, new_q, reward)
     
     def calculate_reward(self, game_state: Dict[str, Any]) -> float:
         """行動に対する報酬を計算"""
@@ -345,11 +461,11 @@ class RLAgent:
         if game_state.get('gameOver'):
             if game_state.get('winner'):
                 reward = 50  # 勝利で大きな報酬
-                logger.info(f"勝利報酬: +{reward}")
+                logger.debug("勝利報酬: +%d", reward)
                 return reward
             else:
                 reward = -20  # 敗北でペナルティ
-                logger.info(f"敗北報酬: {reward}")
+                logger.debug("敗北報酬: %d", reward)
                 return reward
         
         # 可能性のある組み合わせの削減に対する報酬
@@ -361,7 +477,7 @@ class RLAgent:
             # 可能性が減少するほど報酬を大きくする
             reduction_ratio = 1 - (curr_possibilities_count / prev_possibilities_count)
             possibility_reward = max(0, reduction_ratio * 10)  # 最大10の報酬
-            logger.info(f"可能性削減報酬: {possibility_reward:.2f} (削減率={reduction_ratio:.2f})")
+            logger.debug("可能性削減報酬: %.2f (削減率=%.2f)", possibility_reward, reduction_ratio)
         
         # 次回の報酬計算のために現在の可能性数を保存
         self.prev_possibilities_count = curr_possibilities_count
@@ -400,21 +516,74 @@ class RLAgent:
         
         total_reward = hit_reward + blow_reward + additional_reward + repeat_penalty + possibility_reward + possibility_count_reward
         
-        logger.debug(f"報酬計算: HIT={hit_reward}, BLOW={blow_reward}, 追加={additional_reward}, " +
-                    f"ペナルティ={repeat_penalty}, 可能性削減={possibility_reward}, " +
-                    f"可能性数={possibility_count_reward}, 合計={total_reward}")
+        logger.debug("報酬計算: HIT=%s, BLOW=%s, 追加=%s, ペナルティ=%s, 可能性削減=%s, 可能性数=%s, 合計=%s",
+                     hit_reward, blow_reward, additional_reward, repeat_penalty, possibility_reward,
+                     possibility_count_reward, total_reward)
         
         return total_reward
     
-    def save_q_table(self) -> None:
-        """Q値テーブルをJSONファイルに保存"""
+    def get_checkpoint_state(self) -> Dict[str, Any]:
+        """トレーニングを途中から再開するための学習状態（Q値テーブル・カウンター・候補）"""
+        q_table, visit_counts = self.snapshot_table()
+        return {
+            'q_table': q_table,
+            'visit_counts': visit_counts,
+            'learning_rate': self.learning_rate,
+            'discount_factor': self.discount_factor,
+            'exploration_rate': self.exploration_rate,
+            'exploration_count': self.exploration_count,
+            'prev_possibilities_count': getattr(self, 'prev_possibilities_count', None),
+            'last_column': self.last_column,
+            'last_color': self.last_color,
+            'possible_sequences': self.possible_sequences,
+            'sequences_turn': self._sequences_turn,
+            'rule_agent': self.rule_agent.get_checkpoint_state()
+        }
+    
+    def restore_checkpoint_state(self, state: Dict[str, Any]) -> None:
+        """get_checkpoint_stateで保存した学習状態を復元する"""
+        # 他のエージェントと共有しているテーブルを差し替えずに内容を更新する
+        with self.table_lock:
+            self.q_table.clear()
+            self.q_table.update(state['q_table'])
+            self.visit_counts.clear()
+            self.visit_counts.update(state.get('visit_counts', {}))
+        self.learning_rate = state['learning_rate']
+        self.discount_factor = state['discount_factor']
+        self.exploration_rate = state['exploration_rate']
+        self.exploration_count = state['exploration_count']
+        if state['prev_possibilities_count'] is not None:
+            self.prev_possibilities_count = state['prev_possibilities_count']
+        elif hasattr(self, 'prev_possibilities_count'):
+            del self.prev_possibilities_count
+        self.last_column = state['last_column']
+        self.last_color = state['last_color']
+        self.possible_sequences = state['possible_sequences']
+        self._sequences_turn = state['sequences_turn']
+        self._turn_cache = None
+        self.rule_agent.restore_checkpoint_state(state['rule_agent'])
+    
+    @staticmethod
+    def default_q_table_path() -> str:
+        """Q値テーブルの既定の保存先"""
+        return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'models', 'q_table.json')
+    
+    @staticmethod
+    def visit_counts_path(file_path: str) -> str:
+        """Q値テーブルに対応する学習回数ファイルのパス"""
+        root, ext = os.path.splitext(file_path)
+        return f"{root}_visits{ext}"
+    
+    def save_q_table(self, file_path: Optional[str] = None) -> None:
+        """Q値テーブルをJSONファイルに保存（file_pathを省略した場合は既定の保存先）"""
         try:
-            directory = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'models')
+            file_path = file_path or self.default_q_table_path()
+            directory = os.path.dirname(file_path)
             os.makedirs(directory, exist_ok=True)
             
-            file_path = os.path.join(directory, 'q_table.json')
             # バックアップを作成
-            backup_path = os.path.join(directory, 'q_table_backup.json')
+            root, ext = os.path.splitext(file_path)
+            backup_path = f"{root}_backup{ext}"
             if os.path.exists(file_path):
                 try:
                     import shutil
@@ -423,32 +592,49 @@ class RLAgent:
                 except Exception as e:
                     logger.warning(f"バックアップ作成に失敗: {e}")
             
-            # テーブルサイズを確認（大きすぎる場合は警告）
-            table_size = len(self.q_table)
-            if table_size > 1000:
-                logger.warning(f"Q値テーブルが大きい: {table_size}状態")
-            
-            with open(file_path, 'w') as f:
-                json.dump(self.q_table, f)
+            # 書き込み中にほかのスレッドが学習・読み込み・保存しないようロックする
+            with self.table_lock:
+                # テーブルサイズを確認（大きすぎる場合は警告）
+                table_size = len(self.q_table)
+                if table_size > 1000:
+                    logger.warning(f"Q値テーブルが大きい: {table_size}状態")
+                
+                with open(file_path, 'w') as f:
+                    json.dump(self.q_table, f)
+                # 学習回数はQ値テーブルの形式を変えないよう別ファイルに保存する
+                with open(self.visit_counts_path(file_path), 'w') as f:
+                    json.dump(self.visit_counts, f)
             
             logger.info(f"Q値テーブルを保存しました: {file_path} ({table_size}状態)")
         except Exception as e:
             logger.error(f"Q値テーブルの保存に失敗しました: {e}")
-            print(f"Q値テーブルの保存に失敗しました: {e}")
     
-    def load_q_table(self) -> None:
-        """Q値テーブルをJSONファイルから読み込み"""
+    def load_q_table(self, file_path: Optional[str] = None) -> None:
+        """Q値テーブルをJSONファイルから読み込み（file_pathを省略した場合は既定の保存先）"""
         try:
-            file_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'models', 'q_table.json')
+            file_path = file_path or self.default_q_table_path()
             if not os.path.exists(file_path):
                 logger.info("Q値テーブルファイルが見つかりません。新しいテーブルを初期化します。")
                 return
             
             with open(file_path, 'r') as f:
-                self.q_table = json.load(f)
+                loaded_table = json.load(f)
+            
+            # 学習回数のファイルがなければ（以前に保存したテーブル）回数不明として空にする
+            visits_path = self.visit_counts_path(file_path)
+            loaded_visits = {}
+            if os.path.exists(visits_path):
+                with open(visits_path, 'r') as f:
+                    loaded_visits = json.load(f)
+            
+            # 他のエージェントと共有しているテーブルを差し替えずに内容を更新する
+            with self.table_lock:
+                self.q_table.clear()
+                self.q_table.update(loaded_table)
+                self.visit_counts.clear()
+                self.visit_counts.update(loaded_visits)
             
             table_size = len(self.q_table)
             logger.info(f"Q値テーブルを読み込みました: {file_path} ({table_size}状態)")
         except Exception as e:
             logger.error(f"Q値テーブルの読み込みに失敗しました: {e}")
-            print(f"Q値テーブルの読み込みに失敗しました: {e}") 
\ No newline at end of file
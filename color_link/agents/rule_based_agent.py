@@ -1,79 +1,156 @@
-import random
-from typing import Dict, Any, List, Tuple
+import time
+from typing import Dict, Any, List, Optional, Tuple
 import numpy as np
 import logging
+from color_link.agents.action_space import (
+    NUM_ACTIONS, NUM_COLUMNS, action_index, index_to_action, best_action_indices
+)
+from color_link import metrics
+from color_link.profiling import profiled
+from color_link.events import EVENTS
+from color_link.game.feedback import column_top, encode, feedback_matrix, hits_blows
+from color_link.game.zobrist import candidates_hash, combine, top_rows_hash
+from color_link.decision_cache import DECISION_CACHE, DecisionCache
+from color_link.rng import RandomLike, resolve_rng
 
 logger = logging.getLogger(__name__)
 
+# 候補がこの数以上なら、HIT/BLOWをnumpyでまとめて判定して絞り込む（少ないときは1つずつの方が速い）
+VECTORIZED_FILTER_MIN_SEQUENCES = 256
+
 class RuleBasedAgent:
-    def __init__(self):
+    # シーケンス長ごとの全シーケンス一覧（全インスタンスで共有する読み取り専用テーブル）
+    _all_sequences_cache: Dict[int, List[List[str]]] = {}
+    
+    def __init__(self, rng: RandomLike = None, decision_cache: Optional[DecisionCache] = None):
+        """
+        Args:
+            rng: 乱数生成器またはシード（省略時はグローバルなrandomモジュール）
+            decision_cache: 行動スコアのキャッシュ（省略時はCOLOR_LINK_DECISION_CACHEで設定したもの。未設定なら使わない）
+        """
         self.colors = ['red', 'blue', 'yellow', 'green', 'purple']
+        self.rng = resolve_rng(rng)
+        self.decision_cache = decision_cache if decision_cache is not None else DECISION_CACHE
         self.possible_sequences = []
         self.last_column = -1
+        self.last_search_complete = True  # 直前の行動決定で全行動を評価し終えたか
+        self._sequences_turn = -1  # possible_sequencesに反映済みのターン
         logger.info("ルールベースエージェントが初期化されました")
     
-    def decide_next_move(self, game_state: Dict[str, Any]) -> Dict[str, Any]:
-        """ルールベースでの次の行動を決定する"""
-        board = game_state['board']
+    @profiled('decide_next_move')
+    def decide_next_move(self, game_state: Dict[str, Any], deadline: Optional[float] = None) -> Dict[str, Any]:
+        """ルールベースでの次の行動を決定する（deadlineはtime.monotonic()基準の期限）"""
         history = game_state['history']
-        sequence_length = game_state.get('sequenceLength', 3)
         
-        logger.info(f"行動決定開始: 履歴数={len(history)}, 可能シーケンス数={len(self.possible_sequences)}")
+        logger.debug("行動決定開始: 履歴数=%d, 可能シーケンス数=%d", len(history), len(self.possible_sequences))
+        
+        self.observe(game_state)
         
-        # ゲーム開始時は可能なシーケンスを全て列挙
         if len(history) == 0:
-            self.possible_sequences = self._generate_all_sequences(sequence_length)
-            logger.info(f"初期シーケンス生成: {len(self.possible_sequences)}個のシーケンス")
+            self.last_search_complete = True
             # ランダムな列と色で開始
             action = {
-                'color': random.choice(self.colors),
-                'column': random.randint(0, 4)
+                'color': self.rng.choice(self.colors),
+                'column': self.rng.randint(0, 4)
             }
-            logger.info(f"初期行動: 色={action['color']}, 列={action['column']}")
+            logger.debug("初期行動: 色=%s, 列=%d", action['color'], action['column'])
             return action
         
+        return self.decide_from_candidates(game_state, self.possible_sequences, deadline)
+    
+    def observe(self, game_state: Dict[str, Any]) -> None:
+        """直前の行動結果を反映してシーケンス候補を更新する（行動は選ばない）"""
+        board = game_state['board']
+        history = game_state['history']
+        sequence_length = game_state.get('sequenceLength', 3)
+        
+        # ゲーム開始時は可能なシーケンスを全て列挙
+        if len(history) == 0:
+            self.possible_sequences = self._generate_all_sequences(sequence_length)
+            self._sequences_turn = 0
+            logger.debug("初期シーケンス生成: %d個のシーケンス", len(self.possible_sequences))
+            return
+        
+        # このターンの結果は反映済み
+        if self._sequences_turn == len(history):
+            return
+        
         # 直前の行動結果からシーケンスを絞り込む
-        if len(history) > 0:
-            last_move = history[-1]
-            column = last_move['column']
-            hits = last_move['hits']
-            blows = last_move['blows']
-            
-            logger.info(f"前回の結果: 列={column}, HIT={hits}, BLOW={blows}")
-            
-            # 現在の列の状態
-            column_state = [board[i][column]['color'] for i in range(sequence_length)]
-            logger.info(f"列の状態: {column_state}")
-            
-            # シーケンスを絞り込む
-            prev_count = len(self.possible_sequences)
-            self.possible_sequences = self._filter_sequences(self.possible_sequences, column_state, hits, blows)
-            logger.info(f"シーケンス絞り込み: {prev_count} -> {len(self.possible_sequences)}個")
+        last_move = history[-1]
+        column = last_move['column']
+        hits = last_move['hits']
+        blows = last_move['blows']
+        
+        logger.debug("前回の結果: 列=%d, HIT=%d, BLOW=%d", column, hits, blows)
+        
+        # 現在の列の状態
+        column_state = column_top(board, column, sequence_length)
+        logger.debug("列の状態: %s", column_state)
+        
+        # シーケンスを絞り込む
+        prev_count = len(self.possible_sequences)
+        self.possible_sequences = self._filter_sequences(self.possible_sequences, column_state, hits, blows)
+        self._sequences_turn = len(history)
+        metrics.observe_candidates(len(history), len(self.possible_sequences))
+        if EVENTS:
+            EVENTS.emit('agent.candidates', agent='rule', turn=len(history),
+                        before=prev_count, after=len(self.possible_sequences))
+        logger.debug("シーケンス絞り込み: %d -> %d個", prev_count, len(self.possible_sequences))
+    
+    def decide_from_candidates(self, game_state: Dict[str, Any],
+                               possible_sequences: List[List[str]],
+                               deadline: Optional[float] = None) -> Dict[str, Any]:
+        """絞り込み済みのシーケンス候補から次の行動を決定する（候補の再計算は行わない）"""
+        self.possible_sequences = possible_sequences
+        self._sequences_turn = len(game_state['history'])
+        self.last_search_complete = True
         
         # 絞り込んだ候補がなければランダム選択
         if len(self.possible_sequences) == 0:
-            logger.info("候補がないため、ランダム選択します")
+            logger.debug("候補がないため、ランダム選択します")
             action = {
-                'color': random.choice(self.colors),
-                'column': random.randint(0, 4)
+                'color': self.rng.choice(self.colors),
+                'column': self.rng.randint(0, 4)
             }
-            logger.info(f"ランダム行動: 色={action['color']}, 列={action['column']}")
+            logger.debug("ランダム行動: 色=%s, 列=%d", action['color'], action['column'])
             return action
         
         # 最も情報が得られる行動を選択
-        action = self._choose_best_action(game_state, self.possible_sequences)
-        logger.info(f"選択された行動: 色={action['color']}, 列={action['column']}, 候補数={len(self.possible_sequences)}")
+        action = self._choose_best_action(game_state, self.possible_sequences, deadline)
+        if EVENTS:
+            EVENTS.emit('agent.action', agent='rule', color=action['color'], column=action['column'],
+                        candidates=len(self.possible_sequences))
+        logger.debug("選択された行動: 色=%s, 列=%d, 候補数=%d", action['color'], action['column'], len(self.possible_sequences))
         
         # 可能性のあるターゲットシーケンスを表示（最大5つ）
-        if len(self.possible_sequences) <= 5:
-            logger.info(f"可能性のあるターゲット: {self.possible_sequences}")
-        else:
-            logger.info(f"可能性のあるターゲット（一部）: {self.possible_sequences[:5]}... 他{len(self.possible_sequences)-5}個")
+        if logger.isEnabledFor(logging.DEBUG):
+            if len(self.possible_sequences) <= 5:
+                logger.debug("可能性のあるターゲット: %s", self.possible_sequences)
+            else:
+                logger.debug("可能性のあるターゲット（一部）: %s... 他%d個", self.possible_sequences[:5], len(self.possible_sequences) - 5)
         
         return action
     
+    def get_checkpoint_state(self) -> Dict[str, Any]:
+        """トレーニングを途中から再開するための内部状態（JSONで保存できる形）"""
+        return {
+            'last_column': self.last_column,
+            'possible_sequences': self.possible_sequences,
+            'sequences_turn': self._sequences_turn
+        }
+    
+    def restore_checkpoint_state(self, state: Dict[str, Any]) -> None:
+        """get_checkpoint_stateで保存した内部状態を復元する"""
+        self.last_column = state['last_column']
+        self.possible_sequences = state['possible_sequences']
+        self._sequences_turn = state['sequences_turn']
+    
     def _generate_all_sequences(self, sequence_length: int) -> List[List[str]]:
-        """可能なすべてのシーケンスを生成"""
+        """可能なすべてのシーケンスを生成（一度生成した長さは共有テーブルから返す）"""
+        cached = RuleBasedAgent._all_sequences_cache.get(sequence_length)
+        if cached is not None:
+            return list(cached)
+        
         all_sequences = []
         
         def backtrack(current_sequence):
@@ -87,91 +164,155 @@ class RuleBasedAgent:
                 current_sequence.pop()
         
         backtrack([])
-        return all_sequences
+        RuleBasedAgent._all_sequences_cache[sequence_length] = all_sequences
+        return list(all_sequences)
     
+    @profiled('_filter_sequences')
     def _filter_sequences(self, sequences: List[List[str]], column_state: List[str], 
                           hits: int, blows: int) -> List[List[str]]:
         """HITとBLOWの結果に基づいてシーケンス候補を絞り込む"""
-        filtered = []
+        start = time.perf_counter()
         
-        for sequence in sequences:
+        if len(sequences) >= VECTORIZED_FILTER_MIN_SEQUENCES:
+            # 全候補とこの列のHIT/BLOWを一度に求める
+            h, b = feedback_matrix(encode(sequences), encode([column_state]))
+            keep = (h[:, 0] == hits) & (b[:, 0] == blows)
+            filtered = [sequence for sequence, matched in zip(sequences, keep) if matched]
+        else:
             # このシーケンスがカラムの状態と同じHIT/BLOWになるか検証
-            h, b = self._calculate_hits_blows(sequence, column_state)
-            if h == hits and b == blows:
-                filtered.append(sequence)
+            filtered = [sequence for sequence in sequences if hits_blows(sequence, column_state) == (hits, blows)]
         
+        metrics.FILTER_SEQUENCES_DURATION.observe(time.perf_counter() - start)
         return filtered
     
     def _calculate_hits_blows(self, sequence: List[str], column_state: List[str]) -> Tuple[int, int]:
-        """シーケンスとカラム状態からHITとBLOWを計算"""
-        hits = 0
-        blows = 0
-        
-        # コピーを作成
-        seq_copy = sequence.copy()
-        col_copy = column_state.copy()
-        
-        # HITをチェック
-        for i in range(len(sequence)):
-            if seq_copy[i] == col_copy[i]:
-                hits += 1
-                seq_copy[i] = None
-                col_copy[i] = None
-        
-        # BLOWをチェック
-        for i in range(len(sequence)):
-            if seq_copy[i] is not None:
-                for j in range(len(column_state)):
-                    if col_copy[j] is not None and seq_copy[i] == col_copy[j]:
-                        blows += 1
-                        col_copy[j] = None
-                        break
-        
-        return hits, blows
+        """シーケンスとカラム状態からHITとBLOWを計算（ゲームの判定と同じ計算）"""
+        return hits_blows(sequence, column_state)
     
-    def _choose_best_action(self, game_state: Dict[str, Any], 
-                           possible_sequences: List[List[str]]) -> Dict[str, Any]:
-        """最も情報量の多い行動を選択"""
-        board = game_state['board']
-        sequence_length = game_state.get('sequenceLength', 3)
+    def score_actions(self, game_state: Dict[str, Any],
+                      possible_sequences: Optional[List[List[str]]] = None,
+                      deadline: Optional[float] = None) -> np.ndarray:
+        """全25行動の情報量スコアを1回の走査で計算する（前回と同じ列は-infで除外）
+        
+        deadlineを指定した場合は有望な行動から順に評価し、期限を過ぎた時点で打ち切る。
+        未評価の行動は-infのまま残り、打ち切りの有無はlast_search_completeに記録される。
+        """
+        if possible_sequences is None:
+            possible_sequences = self.possible_sequences
         
         # 前回と同じ列は避ける
-        available_columns = [i for i in range(5) if i != self.last_column]
+        available_columns = [i for i in range(NUM_COLUMNS) if i != self.last_column]
         if len(available_columns) == 0:
-            available_columns = list(range(5))
+            available_columns = list(range(NUM_COLUMNS))
         
-        logger.info(f"利用可能な列: {available_columns}")
+        logger.debug("利用可能な列: %s", available_columns)
         
-        best_action = None
-        best_score = -1
+        colors = self.colors
+        if deadline is not None:
+            # 候補シーケンスに多く含まれる色ほど有望とみなして先に評価する
+            color_counts = {color: 0 for color in self.colors}
+            for sequence in possible_sequences:
+                for color in sequence:
+                    color_counts[color] += 1
+            colors = sorted(self.colors, key=lambda c: color_counts[c], reverse=True)
         
-        action_scores = []
+        if self.decision_cache is not None:
+            scores = self._score_actions_cached(game_state, possible_sequences, colors, available_columns, deadline)
+            if scores is not None:
+                return scores
         
-        for column in available_columns:
-            for color in self.colors:
+        scores = np.full(NUM_ACTIONS, -np.inf)
+        self.last_search_complete = True
+        for color in colors:
+            for column in available_columns:
                 # この行動のスコアを計算
-                score = self._evaluate_action(game_state, column, color, possible_sequences)
-                action_scores.append((color, column, score))
+                scores[action_index(color, column)] = self._evaluate_action(game_state, column, color, possible_sequences)
                 
-                if score > best_score:
-                    best_score = score
-                    best_action = {'color': color, 'column': column}
+                # 期限切れなら、それまでに評価した行動だけで判断する
+                if deadline is not None and time.monotonic() >= deadline:
+                    self.last_search_complete = False
+                    logger.info("時間切れのため評価を打ち切り: %d/%d行動を評価", np.isfinite(scores).sum(), NUM_ACTIONS)
+                    return scores
+        
+        return scores
+    
+    def _score_actions_cached(self, game_state: Dict[str, Any], possible_sequences: List[List[str]],
+                              colors: List[str], available_columns: List[int],
+                              deadline: Optional[float]) -> Optional[np.ndarray]:
+        """キャッシュした情報量スコアに乱数を加えて行動スコアを作る（盤面が不正ならNone）
+        
+        キャッシュにない行動（前回と同じ列だったため除外していた行動を含む）は今回選べる列の分だけ評価し、
+        評価した分をキャッシュに書き足す（未評価の行動は-infのまま保存する）。
+        """
+        try:
+            key = combine(top_rows_hash(game_state['board'], game_state.get('sequenceLength', 3)),
+                          candidates_hash(possible_sequences))
+            cached = self.decision_cache.get(key)
+            base = np.full(NUM_ACTIONS, -np.inf) if cached is None else cached.copy()
+            complete = True
+            scored = 0
+            for color in colors:
+                for column in available_columns:
+                    index = action_index(color, column)
+                    if np.isfinite(base[index]):
+                        continue
+                    base[index] = self._information_score(game_state, column, color, possible_sequences)
+                    scored += 1
+                    if deadline is not None and time.monotonic() >= deadline:
+                        complete = False
+                        break
+                if not complete:
+                    logger.info("時間切れのため評価を打ち切り: %d/%d行動を評価", np.isfinite(base).sum(), NUM_ACTIONS)
+                    break
+            if scored:
+                self.decision_cache.put(key, base)
+        except (IndexError, KeyError, ValueError) as e:
+            logger.warning(f"キャッシュを使った行動評価中にエラー: {str(e)}")
+            return None
         
-        # 上位5つのスコアをログに出力
-        sorted_scores = sorted(action_scores, key=lambda x: x[2], reverse=True)
-        logger.info(f"トップスコア: {sorted_scores[:5]}")
+        scores = np.full(NUM_ACTIONS, -np.inf)
+        for color in colors:
+            for column in available_columns:
+                index = action_index(color, column)
+                if np.isfinite(base[index]):
+                    scores[index] = base[index] + self._noise()
+        self.last_search_complete = complete
+        return scores
+    
+    def _choose_best_action(self, game_state: Dict[str, Any], 
+                           possible_sequences: List[List[str]],
+                           deadline: Optional[float] = None) -> Dict[str, Any]:
+        """最も情報量の多い行動を選択"""
+        start = time.perf_counter()
+        scores = self.score_actions(game_state, possible_sequences, deadline)
         
-        # 最適な行動がなければランダム選択
-        if best_action is None:
+        # 上位5つのスコアをログに出力（並べ替えはログを出すときだけ行う）
+        if logger.isEnabledFor(logging.DEBUG):
+            top_scores = []
+            for i in np.argsort(-scores)[:5]:
+                if np.isfinite(scores[i]):
+                    action = index_to_action(i)
+                    top_scores.append((action['color'], action['column'], float(scores[i])))
+            logger.debug("トップスコア: %s", top_scores)
+        
+        best_indices = best_action_indices(scores)
+        if best_indices:
+            # 同点なら従来どおり列→色の順で最初に評価される行動を選ぶ
+            best_action = index_to_action(min(best_indices, key=lambda i: (i % NUM_COLUMNS, i // NUM_COLUMNS)))
+        else:
+            # 最適な行動がなければランダム選択
+            available_columns = [i for i in range(NUM_COLUMNS) if i != self.last_column] or list(range(NUM_COLUMNS))
             best_action = {
-                'color': random.choice(self.colors),
-                'column': random.choice(available_columns)
+                'color': self.rng.choice(self.colors),
+                'column': self.rng.choice(available_columns)
             }
-            logger.info("最適な行動が見つからなかったため、ランダム選択します")
+            logger.debug("最適な行動が見つからなかったため、ランダム選択します")
         
         self.last_column = best_action['column']
+        metrics.CHOOSE_BEST_ACTION_DURATION.observe(time.perf_counter() - start)
         return best_action
     
+    @profiled('_evaluate_action')
     def _evaluate_action(self, game_state: Dict[str, Any], column: int, color: str, 
                          possible_sequences: List[List[str]]) -> float:
         """行動の情報量を評価"""
@@ -181,52 +322,66 @@ class RuleBasedAgent:
         # ボードの構造をチェック
         if not board or len(board) < sequence_length or len(board[0]) <= column:
             logger.warning(f"不正なボード構造またはカラム: board={board}, column={column}")
-            return random.random()  # ランダムなスコアを返す
+            return self.rng.random()  # ランダムなスコアを返す
         
-        # この行動後の列の状態をシミュレート
-        # 注意: 正確なシミュレーションのため、現在の列の配置をシフトさせて新しい色を先頭に追加
         try:
-            current_column = [board[i][column]['color'] for i in range(sequence_length)]
-            new_column_state = [color] + current_column[:-1] if sequence_length > 1 else [color]
-            
-            logger.debug(f"シミュレーション - 列{column}に色{color}を挿入: {current_column} -> {new_column_state}")
-            
-            # 各HIT/BLOWの組み合わせに対する可能性を計算
-            possibilities = {}
-            
-            for sequence in possible_sequences:
-                hits, blows = self._calculate_hits_blows(sequence, new_column_state)
-                key = f"{hits}:{blows}"
-                
-                if key not in possibilities:
-                    possibilities[key] = 0
-                possibilities[key] += 1
-            
-            # 情報量を計算（エントロピー）
-            # 可能な状態が多いほど情報量が大きい
-            total = len(possible_sequences)
-            if total == 0:
-                return 0
-            
-            entropy = 0
-            
-            for count in possibilities.values():
-                prob = count / total
-                entropy -= prob * np.log2(prob) if prob > 0 else 0
-            
+            entropy = self._information_score(game_state, column, color, possible_sequences)
             # 赤色だけを選び続けないようにランダム要素を追加
-            if random.random() < 0.1:  # 10%の確率で少しランダム性を加える
-                entropy += random.random() * 0.5
-            
-            # HIT数が多そうな行動を優先（特に候補が少ないとき）
-            if len(possible_sequences) < 10:
-                max_hit_key = max(possibilities.keys(), key=lambda k: int(k.split(':')[0]) if k.split(':')[0].isdigit() else 0, default="0:0")
-                max_hit = int(max_hit_key.split(':')[0]) if max_hit_key.split(':')[0].isdigit() else 0
-                entropy += max_hit * 0.2  # HITが多いほど少しボーナス
-            
-            logger.debug(f"行動の評価 - 列{column}に色{color}を挿入: エントロピー={entropy:.4f}")
+            entropy += self._noise()
+            logger.debug("行動の評価 - 列%dに色%sを挿入: エントロピー=%.4f", column, color, entropy)
             return entropy
             
         except (IndexError, KeyError, ValueError) as e:
             logger.warning(f"行動評価中にエラー: {str(e)}, board={board}, column={column}")
-            return random.random()  # エラーが発生した場合はランダムなスコアを返す 
\ No newline at end of file
+            return self.rng.random()  # エラーが発生した場合はランダムなスコアを返す
+    
+    def _noise(self) -> float:
+        """行動のスコアに加えるランダム要素（10%の確率で少しランダム性を加える）"""
+        if self.rng.random() < 0.1:
+            return self.rng.random() * 0.5
+        return 0.0
+    
+    @profiled('_information_score')
+    def _information_score(self, game_state: Dict[str, Any], column: int, color: str,
+                           possible_sequences: List[List[str]]) -> float:
+        """行動後の列で得られるHIT/BLOWのエントロピー（乱数を含まない部分。キャッシュの対象）"""
+        board = game_state['board']
+        sequence_length = game_state.get('sequenceLength', 3)
+        
+        # この行動後の列の状態をシミュレート
+        # 注意: 正確なシミュレーションのため、現在の列の配置をシフトさせて新しい色を先頭に追加
+        current_column = column_top(board, column, sequence_length)
+        new_column_state = [color] + current_column[:-1] if sequence_length > 1 else [color]
+        
+        logger.debug("シミュレーション - 列%dに色%sを挿入: %s -> %s", column, color, current_column, new_column_state)
+        
+        # 各HIT/BLOWの組み合わせに対する可能性を計算
+        possibilities = {}
+        
+        for sequence in possible_sequences:
+            hits, blows = hits_blows(sequence, new_column_state)
+            key = f"{hits}:{blows}"
+            
+            if key not in possibilities:
+                possibilities[key] = 0
+            possibilities[key] += 1
+        
+        # 情報量を計算（エントロピー）
+        # 可能な状態が多いほど情報量が大きい
+        total = len(possible_sequences)
+        if total == 0:
+            return 0
+        
+        entropy = 0
+        
+        for count in possibilities.values():
+            prob = count / total
+            entropy -= prob * np.log2(prob) if prob > 0 else 0
+        
+        # HIT数が多そうな行動を優先（特に候補が少ないとき）
+        if len(possible_sequences) < 10:
+            max_hit_key = max(possibilities.keys(), key=lambda k: int(k.split(':')[0]) if k.split(':')[0].isdigit() else 0, default="0:0")
+            max_hit = int(max_hit_key.split(':')[0]) if max_hit_key.split(':')[0].isdigit() else 0
+            entropy += max_hit * 0.2  # HITが多いほど少しボーナス
+        
+        return entropy
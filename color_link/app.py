@@ -1,13 +1,27 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, g, render_template, jsonify, request, session, send_from_directory
 from color_link.game.color_link import ColorLinkGame
 from color_link.agents.rule_based_agent import RuleBasedAgent
 from color_link.agents.rl_agent import RLAgent
 from color_link.agents.hybrid_agent import HybridAgent
+from color_link.sessions import SessionManager, GameSession
+from color_link.game.state_token import StateTokenCodec, StateTokenError
+from color_link.evaluation import EvaluationManager
+from color_link.broadcast import EventBroadcaster
+from color_link.training import train_agent, load_checkpoint, restore_checkpoint
+from color_link.jobs import JobManager
+from color_link import metrics
+from color_link.model_stats import GrowthTracker, q_table_stats
+from color_link.profiling import PROFILER
+from color_link.game.game_log import GAME_LOG, encode_record, record_from_game
+from collections import OrderedDict
+from contextlib import contextmanager
 import argparse
+import json
 import os
 import logging
 import threading
 import time
+import uuid
 from datetime import datetime
 
 # ロギングの設定
@@ -15,17 +29,186 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(level
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
-game = ColorLinkGame()
-rule_agent = RuleBasedAgent()
+# セッションIDをCookieに保存するための署名鍵（複数プロセスで共有する場合は環境変数で指定）
+app.secret_key = os.environ.get('COLOR_LINK_SECRET_KEY') or os.urandom(24)
+
+# トレーニング用のエージェント（Q値テーブルとそのロックは各セッションのエージェントと共有する）
 rl_agent = RLAgent()
 hybrid_agent = HybridAgent()
 
-# 現在使用中のAIエージェント
-current_agent = None
+def create_agent(ai_type: str):
+    """セッション用のエージェントを生成（Q値テーブルはプロセス内で共有し、読み書きは共有のロックで保護する）"""
+    if ai_type == 'rule':
+        return RuleBasedAgent()
+    if ai_type == 'rl':
+        agent = RLAgent()
+        agent.share_table(rl_agent)
+        return agent
+    if ai_type == 'hybrid':
+        agent = HybridAgent()
+        agent.rl_agent.share_table(hybrid_agent.rl_agent)
+        return agent
+    raise ValueError(f"未知のAIタイプ: {ai_type}")
+
+# 保存済みのQ値テーブルを読み込んだ共有エージェントのAIタイプ
+_loaded_q_tables = set()
+_loaded_q_tables_lock = threading.Lock()
+
+def load_shared_q_table(ai_type: str) -> None:
+    """共有のQ値テーブルを保存先から一度だけ読み込む
+
+    ゲームごとに読み込み直すと、ほかのセッションが学習中の内容まで保存時点に戻ってしまう。
+    """
+    with _loaded_q_tables_lock:
+        if ai_type in _loaded_q_tables:
+            return
+        (rl_agent if ai_type == 'rl' else hybrid_agent).load_q_table()
+        _loaded_q_tables.add(ai_type)
+
+# セッションごとのゲームとエージェント
+session_manager = SessionManager(
+    create_agent,
+    ttl_seconds=float(os.environ.get('COLOR_LINK_SESSION_TTL', 1800)),
+    max_sessions=int(os.environ.get('COLOR_LINK_MAX_SESSIONS', 1000))
+)
+
+# ステートレスモード：ゲームの状態を署名付きトークンでクライアントに持たせる
+# （複数プロセスで動かす場合はCOLOR_LINK_SECRET_KEYを全プロセスで共通にする）
+app.config['STATELESS_MODE'] = os.environ.get('COLOR_LINK_STATELESS', '0') == '1'
+app.config['STATE_TOKEN_ENCRYPT'] = os.environ.get('COLOR_LINK_STATE_TOKEN_ENCRYPT', '1') == '1'
+
+def get_state_codec() -> StateTokenCodec:
+    """現在の設定に対応するトークンのコーデックを取得"""
+    return StateTokenCodec(app.secret_key, encrypt=app.config['STATE_TOKEN_ENCRYPT'])
+
+class GameContext:
+    """1リクエストで扱うゲームとAIエージェント"""
+    def __init__(self, game: ColorLinkGame, agent, ai_type, session_id=None):
+        self.game = game
+        self.agent = agent
+        self.ai_type = ai_type
+        self.session_id = session_id  # ステートレスモードではNone
+
+@contextmanager
+def game_context():
+    """リクエストに対応するゲームを取得する
+
+    通常はセッションのゲームをロックして返す。ステートレスモードでは
+    リクエストのstateTokenからゲームを復元し、エージェントも手順から再構築する。
+    """
+    if app.config['STATELESS_MODE']:
+        data = request.get_json(silent=True) or {}
+        token = request.args.get('stateToken') or data.get('stateToken')
+        codec = get_state_codec()
+        ai_type = codec.read_agent_type(token)
+        agent = create_agent(ai_type) if ai_type else None
+        # 開始時の盤面から手順をリプレイし、エージェントの候補も同時に再構築
+        game, _ = codec.decode(token, observers=[agent] if agent is not None else [])
+        yield GameContext(game, agent, ai_type)
+        return
+    
+    game_session = get_game_session()
+    with game_session.lock:
+        yield GameContext(game_session.game, game_session.current_agent, game_session.current_agent_type,
+                          game_session.session_id)
+
+@contextmanager
+def new_game_context(ai_type):
+    """新しいゲーム用のゲームとエージェントを用意する（ステートレスモードではその場で生成）"""
+    if ai_type not in ('rule', 'rl', 'hybrid'):
+        ai_type = None
+    
+    if app.config['STATELESS_MODE']:
+        yield GameContext(ColorLinkGame(), create_agent(ai_type) if ai_type else None, ai_type)
+        return
+    
+    game_session = get_game_session()
+    with game_session.lock:
+        agent = game_session.select_agent(ai_type)
+        yield GameContext(game_session.game, agent, ai_type, game_session.session_id)
+
+def with_state_token(payload: dict, ctx: GameContext) -> dict:
+    """ステートレスモードではレスポンスに最新の状態トークンを付ける"""
+    if app.config['STATELESS_MODE']:
+        payload['stateToken'] = get_state_codec().encode(ctx.game, ctx.ai_type)
+    return payload
+
+def state_payload(game: ColorLinkGame, hide_sequence: bool, delta_requested: bool, client_version) -> dict:
+    """レスポンスのゲーム状態部分を作る
+
+    差分モードでクライアントの版が1つ前なら、変わった列と追加された履歴だけを'delta'で返す。
+    版が一致しない場合は'game_state'で全体を返し、クライアントはそれで再同期する。
+    """
+    if delta_requested and client_version is not None:
+        delta = game.get_state_delta(client_version, hide_sequence=hide_sequence)
+        if delta is not None:
+            return {'delta': delta}
+    return {'game_state': game.get_state(hide_sequence=hide_sequence)}
+
+@app.errorhandler(StateTokenError)
+def handle_state_token_error(e):
+    logger.warning(f"不正な状態トークン: {str(e)}")
+    return jsonify({'error': f'不正な状態トークン: {str(e)}'}), 400
+
+def get_session_id() -> str:
+    """リクエストのセッションIDを取得（X-Session-IdヘッダーまたはCookie、なければ発行）"""
+    session_id = request.headers.get('X-Session-Id') or session.get('session_id')
+    if not session_id:
+        session_id = uuid.uuid4().hex
+        session['session_id'] = session_id
+    return session_id
+
+def get_game_session() -> GameSession:
+    """リクエストに対応するセッションを取得"""
+    return session_manager.get(get_session_id())
+
+# 一括評価（ワーカープロセスのプールでゲームを並列実行）
+evaluation_manager = EvaluationManager(
+    max_workers=int(os.environ.get('COLOR_LINK_EVAL_WORKERS', 0)) or None,
+    max_games=int(os.environ.get('COLOR_LINK_EVAL_MAX_GAMES', 10000))
+)
+
+# トレーニング・評価ジョブ（サブプロセスで実行し、同時実行数を制限する）
+job_manager = JobManager(
+    artifact_root=os.environ.get('COLOR_LINK_JOB_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'models', 'jobs'),
+    max_concurrent=int(os.environ.get('COLOR_LINK_MAX_JOBS', 0)) or None,
+    nice=int(os.environ.get('COLOR_LINK_JOB_NICE', 10))
+)
+
+# サーバー送信イベント（SSE）の配信（更新は合流ウィンドウの間まとめて送る）
+event_broadcaster = EventBroadcaster(
+    coalesce_window=float(os.environ.get('COLOR_LINK_SSE_COALESCE_MS', 250)) / 1000,
+    max_subscribers=int(os.environ.get('COLOR_LINK_SSE_MAX_SUBSCRIBERS', 100))
+)
+
+def publish_ai_move(ctx: GameContext, step: dict) -> None:
+    """AIの手をセッションの購読者に配信する"""
+    if ctx.session_id is None:
+        return
+    topic = f"moves:{ctx.session_id}"
+    if not event_broadcaster.has_subscribers(topic):
+        return
+    result = step['result']
+    event_broadcaster.publish(topic, 'move', {
+        'color': step['action']['color'],
+        'column': step['action']['column'],
+        'hits': result['hits'],
+        'blows': result['blows'],
+        'turn': result['current_turn'],
+        'gameOver': result['game_over'],
+        'winner': result['winner']
+    })
 
 # トレーニング関連のグローバル変数
 training_thread = None
 training_active = False
+training_started_at = None  # time.monotonic()基準の開始時刻
+training_rate_origin = None  # 今回の実行の開始時刻と開始時点の完了ゲーム数（ゲーム/秒の計算用）
+# トレーニングのチェックポイント（サーバーが再起動しても resume で続きから再開できる）
+TRAINING_CHECKPOINT_PATH = os.environ.get('COLOR_LINK_TRAINING_CHECKPOINT') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'static', 'models', 'training_checkpoint.json')
+_published_training_stats = {}  # 最後に配信したトレーニング統計（差分の計算用）
+training_growth = {}  # エージェントタイプごとの直近のトレーニングでの状態数の推移
 training_stats = {
     'games_played': 0,
     'games_won': 0,
@@ -35,6 +218,56 @@ training_stats = {
     'elapsed_time': 0
 }
 
+def current_training_stats() -> dict:
+    """経過時間を更新したトレーニング統計を返す"""
+    if training_active and training_started_at is not None:
+        training_stats['elapsed_time'] = time.monotonic() - training_started_at
+    return training_stats
+
+def publish_training_stats() -> None:
+    """トレーニング統計のうち前回の配信から変わった項目だけを配信する"""
+    global _published_training_stats
+    if not event_broadcaster.has_subscribers('training'):
+        return
+    snapshot = dict(current_training_stats(), active=training_active)
+    delta = {key: value for key, value in snapshot.items() if _published_training_stats.get(key) != value}
+    _published_training_stats = snapshot
+    if delta:
+        event_broadcaster.publish('training', 'training', delta, coalesce_key='training')
+
+def training_games_per_second() -> float:
+    """実行中のトレーニングの1秒あたりのゲーム数（再開前のゲームは含めない）"""
+    if not training_active or training_rate_origin is None:
+        return 0.0
+    started_at, games_at_start = training_rate_origin
+    elapsed = time.monotonic() - started_at
+    return (training_stats['games_played'] - games_at_start) / elapsed if elapsed > 0 else 0.0
+
+# 取得時に計算するメトリクス（Q値テーブルはセッションのエージェントとも共有している）
+metrics.Q_TABLE_STATES.labels('rl').set_function(lambda: len(rl_agent.q_table))
+metrics.Q_TABLE_STATES.labels('hybrid').set_function(lambda: len(hybrid_agent.rl_agent.q_table))
+metrics.TRAINING_GAMES_PER_SECOND.set_function(training_games_per_second)
+
+@app.before_request
+def start_request_timer():
+    g.request_started_at = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """ルートごとの処理時間とステータス別の件数を記録する（ストリーミングは応答開始までの時間）"""
+    started_at = g.pop('request_started_at', None)
+    if started_at is not None:
+        # パスではなくルートのパターンで集計し、未定義のパスは1つにまとめる
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics.HTTP_REQUEST_DURATION.labels(route, request.method).observe(time.perf_counter() - started_at)
+        metrics.HTTP_REQUESTS.labels(route, request.method, response.status_code).inc()
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheusのテキスト形式でメトリクスを返す"""
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -48,35 +281,32 @@ def new_game():
     
     logger.info(f"新しいゲームを開始: シーケンス長={sequence_length}, AIタイプ={ai_type}, デバッグモード={debug_mode}")
     
-    # AIタイプに基づいてエージェントを選択
-    global current_agent
-    if ai_type == 'rule':
-        current_agent = rule_agent
-    elif ai_type == 'rl':
-        current_agent = rl_agent
-        # 学習モード設定
-        rl_agent.learning_mode = data.get('learningMode', False)
-        if data.get('learningMode', False):
-            rl_agent.load_q_table()
-    elif ai_type == 'hybrid':
-        current_agent = hybrid_agent
-        # 学習モード設定
-        hybrid_agent.learning_mode = data.get('learningMode', False)
-        if data.get('learningMode', False):
-            hybrid_agent.load_q_table()
-    else:
-        current_agent = None
-    
-    # 新しいゲームを開始
-    game.new_game(sequence_length)
-    
-    state = game.get_state(hide_sequence=not debug_mode)
-    logger.info(f"ゲーム状態: ターン={state['currentTurn']}/{state['maxTurns']}, 終了={state['gameOver']}")
-    
-    return jsonify({
-        'game_state': state,
-        'message': '新しいゲームを開始しました'
-    })
+    with new_game_context(ai_type) as ctx:
+        # AIタイプに基づいてエージェントを選択
+        current_agent = ctx.agent
+        if ctx.ai_type in ('rl', 'hybrid') and not app.config['STATELESS_MODE']:
+            # 学習モード設定（ステートレスモードでは学習しない）
+            current_agent.learning_mode = data.get('learningMode', False)
+            if data.get('learningMode', False):
+                load_shared_q_table(ctx.ai_type)
+        
+        # 新しいゲームを開始
+        game = ctx.game
+        game.new_game(sequence_length)
+        
+        # 前のゲームのシーケンス候補を持ち越さないようにリセット
+        if isinstance(current_agent, (RLAgent, HybridAgent)):
+            current_agent.reset_episode()
+        if current_agent is not None:
+            current_agent.observe(game.get_state())
+        
+        state = game.get_state(hide_sequence=not debug_mode)
+        logger.info(f"ゲーム状態: ターン={state['currentTurn']}/{state['maxTurns']}, 終了={state['gameOver']}")
+        
+        return jsonify(with_state_token({
+            'game_state': state,
+            'message': '新しいゲームを開始しました'
+        }, ctx))
 
 @app.route('/api/make_move', methods=['POST'])
 def make_move():
@@ -86,92 +316,223 @@ def make_move():
     
     logger.info(f"プレイヤー移動: 色={color}, 列={column}")
     
+    with game_context() as ctx:
+        game = ctx.game
+        current_agent = ctx.agent
+        
+        # 移動前の状態を保存（強化学習用）
+        prev_state = game.get_state()
+        
+        # 移動の実行
+        result = game.make_move(color, column)
+        
+        logger.info(f"移動結果: HIT={result.get('hits')}, BLOW={result.get('blows')}, ターン={len(game.history)}/{game.max_turns}, 終了={game.game_over}, 勝利={game.winner}")
+        
+        # 強化学習の場合、学習データを更新
+        if isinstance(current_agent, RLAgent) and current_agent.learning_mode:
+            current_state = game.get_state()
+            reward = current_agent.calculate_reward(current_state)
+            current_agent.learn(prev_state, {'color': color, 'column': column}, reward, current_state)
+            
+            # ゲーム終了時にQ値テーブルを保存
+            if current_state['gameOver']:
+                current_agent.save_q_table()
+        
+        if result['valid']:
+            record_finished_game(ctx, None)  # プレイヤーが指して終わったゲーム
+        
+        # 現在の状態（差分モードなら直前の1手分の差分）
+        hide_sequence = not game.game_over and not data.get('debugMode', False)
+        payload = state_payload(game, hide_sequence, data.get('delta', False), data.get('version'))
+        payload['result'] = result
+        return jsonify(with_state_token(payload, ctx))
+
+# ステートレスモードで記録したゲーム（同じ状態トークンを送り直して同じゲームを終えても重ねて記録しない）
+MAX_RECORDED_GAMES = 10000
+_recorded_games = OrderedDict()  # 記録したゲームのレコード -> None（古い順）
+_recorded_games_lock = threading.Lock()
+
+def record_finished_game(ctx: GameContext, agent_type) -> None:
+    """ゲームが終わっていればゲーム記録に追記する（COLOR_LINK_GAME_LOGを指定した場合のみ）
+
+    agent_typeはゲームを終わらせた手を指した側（プレイヤーならNone）。
+    """
+    if GAME_LOG is None or not ctx.game.game_over:
+        return
+    record = record_from_game(ctx.game, agent_type)
+    if app.config['STATELESS_MODE']:
+        key = encode_record(record)
+        with _recorded_games_lock:
+            if key in _recorded_games:
+                logger.info("記録済みのゲームのため、ゲーム記録に追記しません")
+                return
+            _recorded_games[key] = None
+            if len(_recorded_games) > MAX_RECORDED_GAMES:
+                _recorded_games.popitem(last=False)
+    GAME_LOG.write(record)
+    GAME_LOG.flush()
+
+def parse_deadline(budget_ms):
+    """思考時間の上限（ミリ秒）から期限を求める（指定がなければNone）"""
+    if budget_ms is None or budget_ms <= 0:
+        return None
+    return time.monotonic() + budget_ms / 1000
+
+def play_ai_step(game: ColorLinkGame, agent, budget_ms=None) -> dict:
+    """AIに1手指させる（学習モードの強化学習エージェントなら学習も行う）"""
     # 移動前の状態を保存（強化学習用）
     prev_state = game.get_state()
     
-    # 移動の実行
-    result = game.make_move(color, column)
+    # AIによる次の行動の決定
+    decision_start = time.monotonic()
+    action = agent.decide_next_move(game.get_state(), deadline=parse_deadline(budget_ms))
+    decision_ms = (time.monotonic() - decision_start) * 1000
+    metrics.DECISION_DURATION.labels(type(agent).__name__).observe(decision_ms / 1000)
+    search_complete = agent.last_search_complete
+    logger.info(f"AI行動: 色={action['color']}, 列={action['column']}, 思考時間={decision_ms:.1f}ms, 探索完了={search_complete}")
     
-    # 現在の状態を取得
-    current_state = game.get_state(hide_sequence=not game.game_over and not data.get('debugMode', False))
-    
-    logger.info(f"移動結果: HIT={result['hits']}, BLOW={result['blows']}, ターン={current_state['currentTurn']}/{current_state['maxTurns']}, 終了={current_state['gameOver']}, 勝利={current_state['winner']}")
+    # 実際に移動を行う
+    result = game.make_move(action['color'], action['column'])
     
     # 強化学習の場合、学習データを更新
-    if current_agent == rl_agent and rl_agent.learning_mode:
-        reward = rl_agent.calculate_reward(current_state)
-        rl_agent.learn(prev_state, {'color': color, 'column': column}, reward, current_state)
+    if isinstance(agent, RLAgent) and agent.learning_mode:
+        current_state = game.get_state()
+        reward = agent.calculate_reward(current_state)
+        agent.learn(prev_state, action, reward, current_state)
         
         # ゲーム終了時にQ値テーブルを保存
         if current_state['gameOver']:
-            rl_agent.save_q_table()
+            agent.save_q_table()
     
-    return jsonify({
-        'game_state': current_state,
-        'result': result
-    })
+    return {
+        'action': action,
+        'result': result,
+        'searchComplete': search_complete,
+        'decisionMs': decision_ms
+    }
 
 @app.route('/api/ai_move', methods=['GET'])
 def ai_move():
-    logger.info(f"AI行動のリクエストを受信: current_agent={current_agent}")
-    
-    if current_agent is None:
-        logger.warning("AIが選択されていません")
-        return jsonify({'error': 'AIが選択されていません'}), 400
-    
-    try:
-        # 移動前の状態を保存（強化学習用）
-        prev_state = game.get_state()
+    with game_context() as ctx:
+        game = ctx.game
+        current_agent = ctx.agent
+        logger.info(f"AI行動のリクエストを受信: current_agent={current_agent}")
         
-        # AIによる次の行動の決定
-        action = current_agent.decide_next_move(game.get_state())
-        logger.info(f"AI行動: 色={action['color']}, 列={action['column']}")
+        if current_agent is None:
+            logger.warning("AIが選択されていません")
+            return jsonify({'error': 'AIが選択されていません'}), 400
         
-        # 実際に移動を行う
-        result = game.make_move(action['color'], action['column'])
+        try:
+            step = play_ai_step(game, current_agent, request.args.get('budgetMs', type=float))
+            if step['result']['valid']:
+                record_finished_game(ctx, ctx.ai_type)
+            publish_ai_move(ctx, step)
+            result = step['result']
+            
+            logger.info(f"AI移動結果: HIT={result['hits']}, BLOW={result['blows']}, ターン={len(game.history)}/{game.max_turns}, 終了={game.game_over}, 勝利={game.winner}")
+            
+            # 現在の状態（差分モードなら直前の1手分の差分）
+            debug_mode = request.args.get('debugMode', 'false').lower() == 'true'
+            delta_requested = request.args.get('delta', 'false').lower() == 'true'
+            payload = state_payload(game, not game.game_over and not debug_mode,
+                                    delta_requested, request.args.get('version', type=int))
+            payload.update({
+                'action': step['action'],
+                'result': result,
+                'searchComplete': step['searchComplete'],
+                'decisionMs': step['decisionMs']
+            })
+            return jsonify(with_state_token(payload, ctx))
+        except Exception as e:
+            logger.error(f"AI行動処理中にエラーが発生: {str(e)}", exc_info=True)
+            return jsonify({'error': f'AI行動処理中にエラーが発生: {str(e)}'}), 500
+
+@app.route('/api/ai_autoplay', methods=['POST'])
+def ai_autoplay():
+    """現在のAIにゲーム終了まで（またはmaxMoves手まで）サーバー側で連続して指させる"""
+    data = request.get_json(silent=True) or {}
+    try:
+        max_moves = data.get('maxMoves')
+        if max_moves is not None:
+            max_moves = int(max_moves)
+            if max_moves < 1:
+                raise ValueError
+        budget_ms = data.get('budgetMs')
+        if budget_ms is not None:
+            budget_ms = float(budget_ms)
+            if not budget_ms >= 0:  # NaNも拒否する
+                raise ValueError
+    except (TypeError, ValueError):
+        return jsonify({'error': 'maxMovesは1以上の整数、budgetMsは0以上の数値で指定してください'}), 400
+    debug_mode = data.get('debugMode', False)
+    
+    with game_context() as ctx:
+        game = ctx.game
+        current_agent = ctx.agent
         
-        # 現在の状態を取得
-        debug_mode = request.args.get('debugMode', 'false').lower() == 'true'
-        current_state = game.get_state(hide_sequence=not game.game_over and not debug_mode)
-        logger.info(f"AI移動結果: HIT={result['hits']}, BLOW={result['blows']}, ターン={current_state['currentTurn']}/{current_state['maxTurns']}, 終了={current_state['gameOver']}, 勝利={current_state['winner']}")
+        if current_agent is None:
+            logger.warning("AIが選択されていません")
+            return jsonify({'error': 'AIが選択されていません'}), 400
         
-        # 強化学習の場合、学習データを更新
-        if current_agent == rl_agent and rl_agent.learning_mode:
-            reward = rl_agent.calculate_reward(current_state)
-            rl_agent.learn(prev_state, action, reward, current_state)
+        try:
+            # 各手は [色, 列, HIT, BLOW] の配列で返し、盤面はクライアント側で再現する
+            moves = []
+            total_decision_ms = 0.0
+            while not game.game_over and (max_moves is None or len(moves) < max_moves):
+                step = play_ai_step(game, current_agent, budget_ms)
+                publish_ai_move(ctx, step)
+                result = step['result']
+                moves.append([step['action']['color'], step['action']['column'], result['hits'], result['blows']])
+                total_decision_ms += step['decisionMs']
             
-            # ゲーム終了時にQ値テーブルを保存
-            if current_state['gameOver']:
-                rl_agent.save_q_table()
-        
-        return jsonify({
-            'action': action,
-            'game_state': current_state,
-            'result': result
-        })
-    except Exception as e:
-        logger.error(f"AI行動処理中にエラーが発生: {str(e)}", exc_info=True)
-        return jsonify({'error': f'AI行動処理中にエラーが発生: {str(e)}'}), 500
+            # この呼び出しで指した手があるときだけ記録する（終了済みのゲームを重ねて記録しない）
+            if moves:
+                record_finished_game(ctx, ctx.ai_type)
+            
+            current_state = game.get_state(hide_sequence=not game.game_over and not debug_mode)
+            logger.info(f"AI自動プレイ: {len(moves)}手, ターン={current_state['currentTurn']}/{current_state['maxTurns']}, "
+                        f"終了={current_state['gameOver']}, 勝利={current_state['winner']}, 思考時間合計={total_decision_ms:.1f}ms")
+            
+            return jsonify(with_state_token({
+                'moves': moves,
+                'game_state': current_state,
+                'decisionMs': total_decision_ms
+            }, ctx))
+        except Exception as e:
+            logger.error(f"AI自動プレイ中にエラーが発生: {str(e)}", exc_info=True)
+            return jsonify({'error': f'AI自動プレイ中にエラーが発生: {str(e)}'}), 500
 
 @app.route('/api/save_model', methods=['POST'])
 def save_model():
-    if rl_agent.learning_mode:
-        rl_agent.save_q_table()
-        return jsonify({'success': True, 'message': 'モデルを保存しました'})
+    game_session = get_game_session()
+    with game_session.lock:
+        # セッションのエージェント、次にトレーニング用エージェントの順に学習モードのものを保存
+        for agent in (game_session.current_agent, rl_agent, hybrid_agent):
+            if isinstance(agent, (RLAgent, HybridAgent)) and agent.learning_mode:
+                agent.save_q_table()
+                return jsonify({'success': True, 'message': 'モデルを保存しました'})
     return jsonify({'success': False, 'message': '学習モードが有効ではありません'})
 
 @app.route('/api/start_training', methods=['POST'])
 def start_training():
-    global training_thread, training_active, training_stats
+    global training_thread, training_active, training_stats, training_started_at, training_rate_origin, _published_training_stats
     
     if training_active:
         return jsonify({'success': False, 'message': 'トレーニングは既に実行中です'})
     
-    # トレーニングパラメータの取得
+    # トレーニングパラメータの取得（resumeの場合は省略したものをチェックポイントから引き継ぐ）
     data = request.json
-    num_games = data.get('numGames', 1000)
-    sequence_length = data.get('sequenceLength', 3)
-    agent_type = data.get('agentType', 'rl')  # 'rl' または 'hybrid'
+    checkpoint = None
+    params = {}
+    if data.get('resume', False):
+        checkpoint = load_checkpoint(TRAINING_CHECKPOINT_PATH)
+        if checkpoint is None:
+            return jsonify({'success': False, 'message': '再開できるチェックポイントがありません'})
+        params = checkpoint['params']
+    num_games = data.get('numGames', params.get('numGames', 1000))
+    sequence_length = data.get('sequenceLength', params.get('sequenceLength', 3))
+    agent_type = data.get('agentType', params.get('agentType', 'rl'))  # 'rl' または 'hybrid'
+    checkpoint_params = {'numGames': num_games, 'sequenceLength': sequence_length, 'agentType': agent_type}
     
     # トレーニング統計情報の初期化
     training_stats = {
@@ -182,77 +543,53 @@ def start_training():
         'start_time': datetime.now().isoformat(),
         'elapsed_time': 0
     }
+    if checkpoint is not None:
+        training_stats.update(checkpoint['stats'])
+    training_started_at = time.monotonic() - training_stats['elapsed_time']
+    training_rate_origin = (time.monotonic(), training_stats['games_played'])
+    _published_training_stats = {}
     
     # トレーニングを開始
     training_active = True
+    publish_training_stats()
     
     def training_process():
         global training_active, training_stats
         logger.info(f"トレーニングを開始: {num_games}ゲーム, シーケンス長={sequence_length}, エージェント={agent_type}")
         
-        total_turns = 0
-        
         # エージェントを選択
         agent = rl_agent if agent_type == 'rl' else hybrid_agent
         
         # エージェントを学習モードに設定
         agent.learning_mode = True
-        agent.load_q_table()  # 既存のQテーブルをロード
+        if checkpoint is not None:
+            # Q値テーブル・学習状態・乱数の状態を停止した時点に戻す
+            restore_checkpoint(checkpoint, agent)
+            logger.info(f"チェックポイントから再開: {training_stats['games_played']}ゲーム完了済み")
+        else:
+            agent.load_q_table()  # 既存のQテーブルをロード
+        with _loaded_q_tables_lock:
+            _loaded_q_tables.add(agent_type)  # 以降のゲーム開始で学習中のテーブルを読み込み直さない
+        
+        # 状態数の推移を記録（テーブルは読み込み・復元でも同じ辞書が更新される）
+        q_table = agent.q_table if agent_type == 'rl' else agent.rl_agent.q_table
+        growth = GrowthTracker()
+        training_growth[agent_type] = growth
+        
+        def on_game_end():
+            current_training_stats()  # チェックポイントに経過時間を残す
+            growth.record(training_stats['games_played'], len(q_table))
+            publish_training_stats()
         
         try:
-            for i in range(num_games):
-                if not training_active:  # 停止リクエストがあれば中断
-                    break
-                
-                # 新しいゲームを開始（トレーニング用のゲームインスタンス）
-                training_game = ColorLinkGame()
-                training_game.new_game(sequence_length)
-                
-                # このゲームでの総ターン数
-                game_turns = 0
-                
-                # ゲームが終了するまでプレイ
-                while not training_game.game_over:
-                    if not training_active:  # 停止リクエストがあれば中断
-                        break
-                    
-                    # 現在の状態を取得
-                    state = training_game.get_state()
-                    
-                    # エージェントに次の行動を決定させる
-                    action = agent.decide_next_move(state)
-                    
-                    # 行動を実行
-                    result = training_game.make_move(action['color'], action['column'])
-                    
-                    # 新しい状態を取得
-                    new_state = training_game.get_state()
-                    
-                    # 報酬を計算し、学習させる
-                    reward = agent.calculate_reward(new_state)
-                    agent.learn(state, action, reward, new_state)
-                    
-                    game_turns += 1
-                
-                # ゲーム終了後の統計情報更新
-                training_stats['games_played'] += 1
-                if training_game.winner:
-                    training_stats['games_won'] += 1
-                total_turns += game_turns
-                
-                # 進捗率と統計を更新
-                training_stats['win_rate'] = (training_stats['games_won'] / training_stats['games_played']) * 100
-                training_stats['avg_turns'] = total_turns / training_stats['games_played']
-                
-                # 100ゲームごとにログ出力とモデル保存
-                if i % 100 == 0:
-                    logger.info(f"トレーニング進捗: {i}/{num_games} ゲーム完了, "
-                                f"勝率: {training_stats['win_rate']:.2f}%, "
-                                f"平均ターン: {training_stats['avg_turns']:.2f}")
-                    agent.save_q_table()
+            train_agent(agent, num_games, sequence_length, stats=training_stats,
+                        should_stop=lambda: not training_active,
+                        on_progress=on_game_end,
+                        checkpoint_path=TRAINING_CHECKPOINT_PATH,
+                        checkpoint_interval=int(os.environ.get('COLOR_LINK_CHECKPOINT_INTERVAL', 25)),
+                        checkpoint_params=checkpoint_params,
+                        game_log=GAME_LOG)
             
-            # トレーニング完了後の最終保存
-            agent.save_q_table()
             logger.info(f"トレーニング完了: {training_stats['games_played']}ゲーム, "
                         f"勝率: {training_stats['win_rate']:.2f}%, "
                         f"平均ターン: {training_stats['avg_turns']:.2f}")
@@ -263,6 +600,7 @@ def start_training():
         finally:
             # トレーニング終了
             training_active = False
+            publish_training_stats()
     
     # トレーニングをバックグラウンドスレッドで実行
     training_thread = threading.Thread(target=training_process)
@@ -276,17 +614,9 @@ def start_training():
 
 @app.route('/api/training_status', methods=['GET'])
 def training_status():
-    global training_active, training_stats
-    
-    # 経過時間を更新
-    if training_active and training_stats['start_time']:
-        start_time = datetime.fromisoformat(training_stats['start_time'])
-        elapsed = (datetime.now() - start_time).total_seconds()
-        training_stats['elapsed_time'] = elapsed
-    
     return jsonify({
         'active': training_active,
-        'stats': training_stats
+        'stats': current_training_stats()
     })
 
 @app.route('/api/stop_training', methods=['POST'])
@@ -305,6 +635,181 @@ def stop_training():
         'message': 'トレーニングを停止しました'
     })
 
+@app.route('/api/model_stats', methods=['GET'])
+def model_stats():
+    """Q値テーブルの大きさ・メモリ使用量・学習回数の分布と、直近のトレーニングでの増加率を返す"""
+    agent_type = request.args.get('agentType', 'rl')
+    if agent_type not in ('rl', 'hybrid'):
+        return jsonify({'error': f'未知のAIタイプ: {agent_type}'}), 400
+    
+    agent = rl_agent if agent_type == 'rl' else hybrid_agent.rl_agent
+    # トレーニング中もテーブルは更新されるため、集計はロックを取って作ったコピーに対して行う
+    q_table, visit_counts = agent.snapshot_table()
+    stats = q_table_stats(q_table, visit_counts)
+    growth = training_growth.get(agent_type)
+    stats['growth'] = growth.summary() if growth is not None else None
+    stats['agentType'] = agent_type
+    return jsonify(stats)
+
+@app.route('/api/profiling', methods=['GET'])
+def profiling_status():
+    return jsonify(PROFILER.status())
+
+@app.route('/api/profiling', methods=['POST'])
+def configure_profiling():
+    """行動決定のプロファイリングを切り替える（enabled / cprofile / capacity / clear）"""
+    data = request.get_json(silent=True) or {}
+    capacity = data.get('capacity')
+    if capacity is not None and (not isinstance(capacity, int) or capacity <= 0):
+        return jsonify({'error': 'capacityは正の整数で指定してください'}), 400
+    if data.get('clear', False):
+        PROFILER.clear()
+    PROFILER.configure(enabled=data.get('enabled'), use_cprofile=data.get('cprofile'), capacity=capacity)
+    logger.info(f"プロファイリング設定: {PROFILER.status()}")
+    return jsonify(PROFILER.status())
+
+@app.route('/api/profiling/traces', methods=['GET'])
+def profiling_traces():
+    """記録したトレースをJSON Lines形式でダウンロードする"""
+    return Response(PROFILER.export_jsonl(), mimetype='application/x-ndjson',
+                    headers={'Content-Disposition': 'attachment; filename=decision_traces.jsonl'})
+
+@app.route('/api/profiling/pstats', methods=['GET'])
+def profiling_pstats():
+    """cProfileの集計をpstats形式でダウンロードする（format=textなら累積時間順の上位を表示）"""
+    as_text = request.args.get('format') == 'text'
+    data = PROFILER.summary_text() if as_text else PROFILER.export_pstats()
+    if data is None:
+        return jsonify({'error': 'cProfileの記録がありません（cprofileを有効にしてください）'}), 404
+    if as_text:
+        return Response(data, mimetype='text/plain')
+    return Response(data, mimetype='application/octet-stream',
+                    headers={'Content-Disposition': 'attachment; filename=decisions.pstats'})
+
+@app.route('/api/evaluate', methods=['POST'])
+def start_evaluation():
+    """エージェントの一括評価を開始する"""
+    data = request.get_json(silent=True) or {}
+    try:
+        seed = data.get('seed')
+        job = evaluation_manager.start(
+            data.get('agentType', 'rule'),
+            int(data.get('games', 100)),
+            int(data.get('sequenceLength', 3)),
+            int(seed) if seed is not None else None
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(job.snapshot()), 202
+
+@app.route('/api/evaluate/<job_id>', methods=['GET'])
+def evaluation_status(job_id):
+    """評価の進捗と集計結果を取得する"""
+    job = evaluation_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': '評価ジョブが見つかりません'}), 404
+    return jsonify(job.snapshot())
+
+@app.route('/api/evaluate/<job_id>/stream', methods=['GET'])
+def evaluation_stream(job_id):
+    """評価の進捗を1行1JSON（NDJSON）で終了まで送り続ける"""
+    job = evaluation_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': '評価ジョブが見つかりません'}), 404
+    
+    def generate():
+        version = -1
+        while True:
+            version = job.wait_for_update(version, timeout=15)
+            snapshot = job.snapshot()
+            yield json.dumps(snapshot, ensure_ascii=False) + '\n'
+            if snapshot['status'] != 'running':
+                break
+    
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@app.route('/api/evaluate/<job_id>', methods=['DELETE'])
+def cancel_evaluation(job_id):
+    """評価を中止する"""
+    if not evaluation_manager.cancel(job_id):
+        return jsonify({'success': False, 'message': '実行中の評価ジョブが見つかりません'}), 404
+    return jsonify({'success': True, 'message': '評価を中止しました'})
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """トレーニング（kind='training'）または評価（kind='evaluation'）のジョブを登録する"""
+    data = request.get_json(silent=True) or {}
+    try:
+        job = job_manager.submit(data.get('kind', 'training'), data.get('params', {}))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(job.snapshot()), 202
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """登録されているジョブの一覧"""
+    return jsonify({'jobs': [job.snapshot() for job in job_manager.list()]})
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """ジョブの進捗・結果・成果物の一覧を取得する"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'ジョブが見つかりません'}), 404
+    return jsonify(job.snapshot())
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """ジョブを中止する（実行中ならサブプロセスを終了させる）"""
+    if not job_manager.cancel(job_id):
+        return jsonify({'success': False, 'message': '実行中または待機中のジョブが見つかりません'}), 404
+    return jsonify({'success': True, 'message': 'ジョブを中止しました'})
+
+@app.route('/api/jobs/<job_id>/artifacts/<name>', methods=['GET'])
+def job_artifact(job_id, name):
+    """ジョブの成果物（Q値テーブルや統計）をダウンロードする"""
+    job = job_manager.get(job_id)
+    if job is None or name not in job.artifacts():
+        return jsonify({'error': '成果物が見つかりません'}), 404
+    return send_from_directory(job.artifact_dir, name, as_attachment=True)
+
+def format_sse(event: str, data: dict) -> str:
+    """SSEの1イベント分の文字列を作る"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.route('/api/events', methods=['GET'])
+def event_stream():
+    """トレーニングの進捗（training）と自分のセッションのAIの手（moves）をSSEで配信する"""
+    requested = request.args.get('topics', 'training').split(',')
+    topics = []
+    if 'training' in requested:
+        topics.append('training')
+    if 'moves' in requested:
+        topics.append(f"moves:{get_session_id()}")
+    
+    subscription = event_broadcaster.subscribe(topics)
+    if subscription is None:
+        return jsonify({'error': '接続数が上限に達しています'}), 503
+    
+    def generate():
+        try:
+            # 接続直後に現在の状態を送り、以降は差分だけを送る
+            if 'training' in subscription.topics:
+                yield format_sse('training', dict(current_training_stats(), active=training_active))
+            while True:
+                events = subscription.get(timeout=15)
+                if not events:
+                    # 接続維持のためのコメント行
+                    yield ': keepalive\n\n'
+                    continue
+                for event, data in events:
+                    yield format_sse(event, data)
+        finally:
+            event_broadcaster.unsubscribe(subscription)
+    
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 def main():
     parser = argparse.ArgumentParser(description='カラーリンクゲームサーバー')
     parser.add_argument('--host', default='127.0.0.1', help='ホストアドレス')
@@ -0,0 +1,109 @@
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class Subscription:
+    """1つの購読者（SSE接続）に届けるイベントのバッファ
+
+    バッファには上限があり、読み出しが追いつかない購読者がいても配信側は待たされない。
+    あふれた場合は古いイベントから捨て、次の読み出しで'resync'イベントを先頭に付けて
+    クライアントに状態の取り直しを促す。
+    """
+
+    def __init__(self, topics: Iterable[str], max_pending: int = 100, coalesce_window: float = 0.25):
+        self.topics = set(topics)
+        self.max_pending = max_pending
+        self.coalesce_window = coalesce_window
+        self.dropped = 0
+        self.closed = False
+        self._pending = OrderedDict()  # キー -> [イベント名, データ]
+        self._seq = 0
+        self._cond = threading.Condition()
+
+    def push(self, event: str, data: Dict[str, Any], coalesce_key: Optional[str] = None) -> None:
+        """イベントを追加する（coalesce_keyが同じ未送信イベントには差分をまとめる）"""
+        with self._cond:
+            if coalesce_key is not None and coalesce_key in self._pending:
+                self._pending[coalesce_key][1].update(data)
+            else:
+                if coalesce_key is None:
+                    key = self._seq
+                    self._seq += 1
+                else:
+                    key = coalesce_key
+                self._pending[key] = [event, dict(data)]
+                if len(self._pending) > self.max_pending:
+                    self._pending.popitem(last=False)
+                    self.dropped += 1
+            self._cond.notify()
+
+    def get(self, timeout: float) -> List[Tuple[str, Dict[str, Any]]]:
+        """イベントを待って取り出す（timeout秒以内に何もなければ空リスト）
+
+        最初のイベントが届いてからcoalesce_window秒だけ待ち、その間の更新をまとめて返す。
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._pending or self.closed, timeout):
+                return []
+        if self.coalesce_window > 0 and not self.closed:
+            time.sleep(self.coalesce_window)
+        with self._cond:
+            events = [(event, data) for event, data in self._pending.values()]
+            self._pending.clear()
+            if self.dropped:
+                events.insert(0, ('resync', {'dropped': self.dropped}))
+                self.dropped = 0
+        return events
+
+    def close(self) -> None:
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+class EventBroadcaster:
+    """トピックごとにイベントを購読者へ配信する"""
+
+    def __init__(self, max_pending: int = 100, coalesce_window: float = 0.25, max_subscribers: int = 100):
+        """
+        Args:
+            max_pending: 購読者ごとに保持する未送信イベントの上限
+            coalesce_window: 同じキーの更新をまとめて送るまでの待ち時間（秒）
+            max_subscribers: 同時に接続できる購読者の上限
+        """
+        self.max_pending = max_pending
+        self.coalesce_window = coalesce_window
+        self.max_subscribers = max_subscribers
+        self._subscriptions = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, topics: Iterable[str]) -> Optional[Subscription]:
+        """購読を開始する（上限に達している場合はNone）"""
+        subscription = Subscription(topics, self.max_pending, self.coalesce_window)
+        with self._lock:
+            if len(self._subscriptions) >= self.max_subscribers:
+                logger.warning(f"購読者数が上限に達しています: {self.max_subscribers}")
+                return None
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscription.close()
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def has_subscribers(self, topic: str) -> bool:
+        """購読者がいるか（いなければ配信用のデータを作らずに済ませられる）"""
+        with self._lock:
+            return any(topic in subscription.topics for subscription in self._subscriptions)
+
+    def publish(self, topic: str, event: str, data: Dict[str, Any], coalesce_key: Optional[str] = None) -> None:
+        """トピックの購読者全員にイベントを配信する"""
+        with self._lock:
+            subscriptions = [s for s in self._subscriptions if topic in s.topics]
+        for subscription in subscriptions:
+            subscription.push(event, data, coalesce_key)
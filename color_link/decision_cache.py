@@ -0,0 +1,145 @@
+"""ルールベースAIの行動スコアのキャッシュ（メモリ上のLRUとSQLiteの2段）
+
+キーは盤面の上部（シーケンス長ぶんの行）と候補集合のZobristハッシュ。値は25行動の
+乱数を含まない情報量スコア。同じ局面はゲームをまたいで（特に序盤に）何度も現れるため、
+エントロピーの計算を省いてすぐに行動を選べる。
+
+SQLiteのファイルは複数のプロセス（評価・トレーニングのワーカー）で共有でき、
+再起動後もそのまま使える。評価の計算方法を変えたときは SCORE_VERSION を上げる
+（古いバージョンの値は参照されない）。
+
+COLOR_LINK_DECISION_CACHE にファイルのパスを指定すると、起動時から全エージェントで使う
+（":memory:" ならディスクを使わずメモリ上のLRUだけ）。
+"""
+import os
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import numpy as np
+from color_link import metrics
+from color_link.game.feedback import COLORS, NUM_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# 行動スコアの計算方法のバージョン（2: 候補集合のハッシュが衝突しない方式に変更）
+SCORE_VERSION = 2
+NUM_ACTIONS = len(COLORS) * NUM_COLUMNS
+
+def _to_sqlite_key(key: int) -> int:
+    """64ビットの符号なしハッシュをSQLiteの符号付き整数に収める"""
+    return key - (1 << 64) if key >= (1 << 63) else key
+
+class DecisionCache:
+    """局面のキーから25行動のスコアを引くキャッシュ（スレッドセーフ）"""
+
+    def __init__(self, path: Optional[str] = None, capacity: int = 10000):
+        """
+        Args:
+            path: SQLiteのファイル（Noneまたは":memory:"ならメモリ上のLRUのみ）
+            capacity: メモリ上に保持する局面数（超えたら最も古く使われたものから捨てる）
+        """
+        self.path = None if path in (None, ':memory:') else path
+        self.capacity = capacity
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {'memory': 0, 'disk': 0, 'miss': 0}
+        self._db = None
+        if self.path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            # 読み込みと書き込みを別のプロセスから同時に行えるようにする
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS decisions (version INTEGER, key INTEGER, scores BLOB, '
+                'PRIMARY KEY (version, key)) WITHOUT ROWID')
+
+    def get(self, key: int) -> Optional[np.ndarray]:
+        """スコアを取得する（なければNone。呼び出し側で書き換えないこと）"""
+        with self._lock:
+            scores = self._memory.get(key)
+            if scores is not None:
+                self._memory.move_to_end(key)
+                return self._count('memory', scores)
+            if self._db is None:
+                return self._count('miss', None)
+            row = self._db.execute('SELECT scores FROM decisions WHERE version = ? AND key = ?',
+                                   (SCORE_VERSION, _to_sqlite_key(key))).fetchone()
+            if row is None:
+                return self._count('miss', None)
+            scores = np.frombuffer(row[0], dtype=np.float64)
+            self._remember(key, scores)
+            return self._count('disk', scores)
+
+    def put(self, key: int, scores: np.ndarray) -> None:
+        """評価したスコアを保存する（評価していない行動は-inf）"""
+        scores = np.array(scores, dtype=np.float64)
+        if scores.shape != (NUM_ACTIONS,):
+            raise ValueError(f"スコアは{NUM_ACTIONS}行動分が必要です: {scores.shape}")
+        scores.flags.writeable = False
+        with self._lock:
+            self._remember(key, scores)
+            if self._db is not None:
+                self._db.execute('INSERT OR REPLACE INTO decisions (version, key, scores) VALUES (?, ?, ?)',
+                                 (SCORE_VERSION, _to_sqlite_key(key), scores.tobytes()))
+
+    def _remember(self, key: int, scores: np.ndarray) -> None:
+        self._memory[key] = scores
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.capacity:
+            self._memory.popitem(last=False)
+        metrics.DECISION_CACHE_ENTRIES.set(len(self._memory))
+
+    def _count(self, result: str, scores: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        self._counts[result] += 1
+        metrics.DECISION_CACHE_LOOKUPS.labels(result).inc()
+        return scores
+
+    def stats(self) -> Dict[str, Any]:
+        """参照数とヒット率"""
+        with self._lock:
+            lookups = sum(self._counts.values())
+            hits = self._counts['memory'] + self._counts['disk']
+            stats = {
+                'lookups': lookups,
+                'memoryHits': self._counts['memory'],
+                'diskHits': self._counts['disk'],
+                'misses': self._counts['miss'],
+                'hitRate': hits / lookups if lookups else 0.0,
+                'memoryEntries': len(self._memory),
+                'capacity': self.capacity,
+                'path': self.path
+            }
+            if self._db is not None:
+                stats['diskEntries'] = self._db.execute(
+                    'SELECT COUNT(*) FROM decisions WHERE version = ?', (SCORE_VERSION,)).fetchone()[0]
+            return stats
+
+    def clear(self) -> None:
+        """メモリとディスクの内容を消す"""
+        with self._lock:
+            self._memory.clear()
+            self._counts = dict.fromkeys(self._counts, 0)
+            if self._db is not None:
+                self._db.execute('DELETE FROM decisions')
+            metrics.DECISION_CACHE_ENTRIES.set(0)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+def _cache_from_env() -> Optional[DecisionCache]:
+    """COLOR_LINK_DECISION_CACHE（SQLiteのパスまたは":memory:"）が指定されていれば起動時から有効にする"""
+    path = os.environ.get('COLOR_LINK_DECISION_CACHE')
+    if not path:
+        return None
+    capacity = int(os.environ.get('COLOR_LINK_DECISION_CACHE_SIZE', 10000))
+    logger.info(f"行動スコアのキャッシュを有効化: {path} (メモリ上限={capacity})")
+    return DecisionCache(path, capacity)
+
+# エージェントが既定で使うキャッシュ（Noneなら使わない）
+DECISION_CACHE = _cache_from_env()
@@ -0,0 +1,297 @@
+import os
+import sys
+import random
+import threading
+import time
+import uuid
+import logging
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+import numpy as np
+from color_link.game.color_link import ColorLinkGame
+from color_link.rng import RandomLike, derive_seed
+
+logger = logging.getLogger(__name__)
+
+AGENT_TYPES = ('rule', 'rl', 'hybrid')
+# 1回の評価で指定できるゲーム数の上限（プロセスプールを長時間占有しないように）
+MAX_EVALUATION_GAMES = 10000
+
+# ワーカープロセス内で読み込んだQ値テーブル（ファイルごとに一度だけ読み込む。Noneは既定の保存先）
+_worker_q_tables = {}
+
+def _init_worker() -> None:
+    """ワーカープロセスの初期化（大量のゲームを回すためログと標準出力を抑制する）"""
+    logging.disable(logging.CRITICAL)
+    sys.stdout = open(os.devnull, 'w')
+
+def _create_evaluation_agent(agent_type: str, q_table_path: Optional[str] = None, rng: RandomLike = None):
+    """評価用のエージェントを生成（学習は行わず、保存済みのQ値テーブルを使う）"""
+    from color_link.agents.rule_based_agent import RuleBasedAgent
+    from color_link.agents.rl_agent import RLAgent
+    from color_link.agents.hybrid_agent import HybridAgent
+
+    if agent_type == 'rule':
+        return RuleBasedAgent(rng=rng)
+
+    q_table = _worker_q_tables.get(q_table_path)
+    if q_table is None:
+        loader = RLAgent()
+        loader.load_q_table(q_table_path)
+        q_table = _worker_q_tables[q_table_path] = loader.q_table
+
+    if agent_type == 'rl':
+        agent = RLAgent(rng=rng)
+        agent.q_table = q_table
+    else:
+        agent = HybridAgent(rng=rng)
+        agent.rl_agent.q_table = q_table
+    agent.learning_mode = False
+    return agent
+
+def play_evaluation_game(agent_type: str, sequence_length: int, seed: int,
+                         q_table_path: Optional[str] = None,
+                         board_colors: Optional[List[List[str]]] = None,
+                         target_sequence: Optional[List[str]] = None) -> Dict[str, Any]:
+    """1ゲームをAIにプレイさせ、勝敗・ターン数・1手ごとの思考時間とCPU時間（ミリ秒）を返す
+
+    盤面と目標シーケンスを指定しなければシードからランダムに生成する。
+    """
+    # ゲームとエージェントでこのゲーム専用の乱数生成器を共有する（同じシードなら同じ盤面・同じ行動になる）
+    rng = random.Random(seed)
+    agent = _create_evaluation_agent(agent_type, q_table_path, rng)
+    game = ColorLinkGame(rng=rng)
+    game.new_game(sequence_length, board_colors=board_colors, target_sequence=target_sequence)
+
+    decision_ms = []
+    cpu_ms = []
+    while not game.game_over:
+        state = game.get_state()
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        action = agent.decide_next_move(state)
+        cpu_ms.append((time.process_time() - cpu_start) * 1000)
+        decision_ms.append((time.perf_counter() - start) * 1000)
+        game.make_move(action['color'], action['column'])
+
+    return {
+        'won': game.winner,
+        'turns': len(game.history),
+        'decisionMs': decision_ms,
+        'cpuMs': cpu_ms
+    }
+
+def play_evaluation_batch(agent_type: str, sequence_length: int, seeds: List[int]) -> List[Dict[str, Any]]:
+    """複数ゲームをまとめてプレイする（プロセス間通信の回数を減らすための単位）"""
+    return [play_evaluation_game(agent_type, sequence_length, seed) for seed in seeds]
+
+class EvaluationStats:
+    """評価結果の集計（勝率・ターン数の分布・思考時間のパーセンタイル）"""
+
+    def __init__(self):
+        self.games = 0
+        self.wins = 0
+        self.total_win_turns = 0
+        self.min_turns = None
+        self.turn_distribution = {}  # ターン数 -> 勝利したゲーム数
+        self._decision_ms = []
+
+    def add(self, result: Dict[str, Any]) -> None:
+        """1ゲームの結果を加える"""
+        self.games += 1
+        self._decision_ms.extend(result['decisionMs'])
+        if result['won']:
+            turns = result['turns']
+            self.wins += 1
+            self.total_win_turns += turns
+            self.turn_distribution[turns] = self.turn_distribution.get(turns, 0) + 1
+            if self.min_turns is None or turns < self.min_turns:
+                self.min_turns = turns
+
+    def summary(self) -> Dict[str, Any]:
+        """集計結果をJSONで返せる形にする"""
+        latency = {}
+        if self._decision_ms:
+            values = np.asarray(self._decision_ms)
+            p50, p90, p99 = np.percentile(values, [50, 90, 99])
+            latency = {
+                'p50': float(p50),
+                'p90': float(p90),
+                'p99': float(p99),
+                'max': float(values.max()),
+                'mean': float(values.mean()),
+                'moves': int(values.size)
+            }
+        return {
+            'games': self.games,
+            'wins': self.wins,
+            'winRate': self.wins / self.games * 100 if self.games else 0,
+            'avgTurns': self.total_win_turns / self.wins if self.wins else 0,
+            'minTurns': self.min_turns,
+            'turnDistribution': {str(turns): count for turns, count in sorted(self.turn_distribution.items())},
+            'decisionLatencyMs': latency
+        }
+
+class EvaluationJob:
+    """1回の評価（エージェント・ゲーム数・シーケンス長・シード）の進捗と結果"""
+
+    def __init__(self, agent_type: str, games: int, sequence_length: int, seed: int):
+        self.job_id = uuid.uuid4().hex
+        self.agent_type = agent_type
+        self.games = games
+        self.sequence_length = sequence_length
+        self.seed = seed
+        self.status = 'running'  # 'running' / 'completed' / 'cancelled' / 'failed'
+        self.error = None
+        self.stats = EvaluationStats()
+        self.started_at = time.monotonic()
+        self.elapsed_time = 0.0
+        self.version = 0  # 進捗が更新されるたびに増える
+        self.cancel_requested = False
+        self.changed = threading.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.status != 'running'
+
+    def record(self, results: List[Dict[str, Any]]) -> None:
+        """ワーカーから返ってきた結果を反映する"""
+        with self.changed:
+            for result in results:
+                self.stats.add(result)
+            self._touch()
+
+    def finish(self, status: str, error: Optional[str] = None) -> None:
+        with self.changed:
+            self.status = status
+            self.error = error
+            self._touch()
+
+    def _touch(self) -> None:
+        """進捗の更新を待機中のストリームに通知する（self.changedを保持して呼ぶ）"""
+        self.elapsed_time = time.monotonic() - self.started_at
+        self.version += 1
+        self.changed.notify_all()
+
+    def wait_for_update(self, version: int, timeout: float) -> int:
+        """versionより新しい進捗が出るか終了するまで待ち、最新のversionを返す"""
+        with self.changed:
+            self.changed.wait_for(lambda: self.version != version or self.done, timeout)
+            return self.version
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.changed:
+            return {
+                'jobId': self.job_id,
+                'agentType': self.agent_type,
+                'games': self.games,
+                'sequenceLength': self.sequence_length,
+                'seed': self.seed,
+                'status': self.status,
+                'error': self.error,
+                'completedGames': self.stats.games,
+                'elapsedTime': self.elapsed_time,
+                'summary': self.stats.summary()
+            }
+
+class EvaluationManager:
+    """評価ジョブをワーカープロセスのプールで実行する"""
+
+    def __init__(self, max_workers: Optional[int] = None, max_jobs: int = 20, max_games: int = MAX_EVALUATION_GAMES):
+        """
+        Args:
+            max_workers: ワーカープロセス数（Noneの場合はCPU数）
+            max_jobs: 結果を保持しておく評価ジョブの上限（古いものから破棄）
+            max_games: 1回の評価で指定できるゲーム数の上限
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_jobs = max_jobs
+        self.max_games = max_games
+        self._executor = None
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """プールは最初の評価で生成する（スレッドを使うFlaskからforkしないようspawnで起動）"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker
+                )
+            return self._executor
+
+    def start(self, agent_type: str, games: int, sequence_length: int = 3, seed: Optional[int] = None) -> EvaluationJob:
+        """評価ジョブを開始する（結果はバックグラウンドで集計される）"""
+        if agent_type not in AGENT_TYPES:
+            raise ValueError(f"未知のAIタイプ: {agent_type}")
+        if not 1 <= games <= self.max_games:
+            raise ValueError(f"ゲーム数は1以上{self.max_games}以下で指定してください")
+        if not 1 <= sequence_length <= 5:
+            raise ValueError("シーケンス長は1以上5以下で指定してください")
+        if seed is None:
+            seed = random.randrange(2 ** 31)
+
+        job = EvaluationJob(agent_type, games, sequence_length, seed)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            while len(self._jobs) > self.max_jobs:
+                oldest_id, oldest = next(iter(self._jobs.items()))
+                if not oldest.done:
+                    break
+                del self._jobs[oldest_id]
+
+        thread = threading.Thread(target=self._run, args=(job,))
+        thread.daemon = True
+        thread.start()
+        logger.info(f"評価を開始: ID={job.job_id}, エージェント={agent_type}, {games}ゲーム, シーケンス長={sequence_length}, シード={seed}")
+        return job
+
+    def get(self, job_id: str) -> Optional[EvaluationJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """評価を中止する（実行中のバッチは完了を待たずに破棄される）"""
+        job = self.get(job_id)
+        if job is None or job.done:
+            return False
+        job.cancel_requested = True
+        return True
+
+    def _run(self, job: EvaluationJob) -> None:
+        """ゲームをバッチに分けてプールに投入し、完了したものから集計する"""
+        try:
+            executor = self._get_executor()
+            # 各ワーカーに数回ずつ行き渡る程度のバッチサイズにして進捗を細かく返す
+            batch_size = max(1, min(100, job.games // (self.max_workers * 4)))
+            seeds = [derive_seed(job.seed, i) for i in range(job.games)]
+            futures = [
+                executor.submit(play_evaluation_batch, job.agent_type, job.sequence_length, seeds[i:i + batch_size])
+                for i in range(0, job.games, batch_size)
+            ]
+            for future in as_completed(futures):
+                if job.cancel_requested:
+                    for pending in futures:
+                        pending.cancel()
+                    job.finish('cancelled')
+                    logger.info(f"評価を中止: ID={job.job_id}, {job.stats.games}/{job.games}ゲーム完了")
+                    return
+                job.record(future.result())
+
+            job.finish('completed')
+            summary = job.stats.summary()
+            logger.info(f"評価完了: ID={job.job_id}, 勝率={summary['winRate']:.2f}%, "
+                        f"平均ターン={summary['avgTurns']:.2f}, 経過時間={job.elapsed_time:.1f}秒")
+        except Exception as e:
+            logger.error(f"評価中にエラーが発生: {str(e)}", exc_info=True)
+            job.finish('failed', str(e))
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
@@ -0,0 +1,78 @@
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+class EventSink:
+    """ゲーム・エージェントのイベントの受け取り先（emitを実装する）"""
+
+    def emit(self, event: str, fields: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+class EventHub:
+    """イベントを登録されたシンクに配る
+
+    受け取り先がなければ偽になるので、呼び出し側は ``if EVENTS:`` で確認してから
+    イベントの内容を組み立てる（受け取り先がない間は辞書の生成も行わない）。
+    """
+
+    def __init__(self):
+        self._sinks = ()  # 配信中に変更されても影響しないよう、変更のたびに作り直すタプル
+        self._lock = threading.Lock()
+
+    def __bool__(self) -> bool:
+        return bool(self._sinks)
+
+    def add_sink(self, sink: EventSink) -> EventSink:
+        with self._lock:
+            self._sinks = self._sinks + (sink,)
+        return sink
+
+    def remove_sink(self, sink: EventSink) -> None:
+        with self._lock:
+            self._sinks = tuple(s for s in self._sinks if s is not sink)
+
+    def emit(self, event: str, **fields) -> None:
+        for sink in self._sinks:
+            sink.emit(event, fields)
+
+    @contextmanager
+    def collect(self, *events: str):
+        """ブロックの間だけイベントを記録するコレクターを登録する（テスト・ベンチマーク用）"""
+        collector = self.add_sink(MemoryCollector(events))
+        try:
+            yield collector
+        finally:
+            self.remove_sink(collector)
+
+class MemoryCollector(EventSink):
+    """イベントをメモリ上のリストに記録する（eventsを指定した場合はそのイベントのみ）"""
+
+    def __init__(self, events=()):
+        self.events = frozenset(events)
+        self.records: List[Tuple[str, Dict[str, Any]]] = []
+
+    def emit(self, event: str, fields: Dict[str, Any]) -> None:
+        if not self.events or event in self.events:
+            self.records.append((event, fields))
+
+    def of(self, event: str) -> List[Dict[str, Any]]:
+        """指定したイベントの内容の一覧"""
+        return [fields for name, fields in self.records if name == event]
+
+    def clear(self) -> None:
+        self.records.clear()
+
+class LoggingSink(EventSink):
+    """イベントをログに出力する（出力されるレベルのときだけ文字列にする）"""
+
+    def __init__(self, logger: Optional[logging.Logger] = None, level: int = logging.DEBUG):
+        self.logger = logger or logging.getLogger('color_link.events')
+        self.level = level
+
+    def emit(self, event: str, fields: Dict[str, Any]) -> None:
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, "%s %s", event, fields)
+
+# ゲームとエージェントのイベントの配信先
+EVENTS = EventHub()
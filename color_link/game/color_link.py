@@ -1,37 +1,76 @@
-import random
 import numpy as np
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, NamedTuple, Optional, Tuple
+from color_link.events import EVENTS
+from color_link.game.feedback import column_top, hits_blows
+from color_link.game.zobrist import board_hash, shift_delta
+from color_link.rng import RandomLike, resolve_rng
+
+class GameSnapshot(NamedTuple):
+    """snapshotで取得したゲームの局面（ゲームの世代、その時点までに打った手数、最後の手を打った版番号）"""
+    generation: int
+    depth: int
+    move_version: int  # 手がなければ0
 
 class ColorLinkGame:
-    def __init__(self):
+    def __init__(self, rng: RandomLike = None):
+        """
+        Args:
+            rng: 盤面と目標シーケンスの生成に使う乱数生成器またはシード（省略時はグローバルなrandomモジュール）
+        """
+        self.rng = resolve_rng(rng)
         self.colors = ['red', 'blue', 'yellow', 'green', 'purple']
         self.board = []
+        self.initial_board = []  # ゲーム開始時の盤面の色（リプレイ・状態の復元用）
         self.target_sequence = []
         self.history = []
         self.game_over = False
         self.winner = False
         self.max_turns = 50
         self.sequence_length = 3
-        
-    def new_game(self, sequence_length: int = 3) -> None:
-        """新しいゲームを開始する"""
+        self.version = 0  # 状態が変わるたびに増える版番号（差分レスポンスの整合性確認用）
+        self.generation = 0  # new_gameのたびに増える番号（別のゲームのスナップショットを復元しないため）
+        self._undo_stack = []  # 手ごとの (列の下端から押し出された色, 手を打った版番号)（unmake_moveで色を戻す）
+        self._last_move_version = None  # 直前のmake_moveで更新した版番号（差分レスポンスの判定用）
+        self.column_feedback = []  # 全5列の現在の(HIT, BLOW)（手を打つたびに変わった列だけ再計算する）
+        self.zobrist_hash = 0  # 盤面のZobristハッシュ（手を打つたびに変わった列の分だけ更新する）
+        
+    def new_game(self, sequence_length: int = 3, board_colors: Optional[List[List[str]]] = None,
+                 target_sequence: Optional[List[str]] = None, seed: Optional[int] = None) -> None:
+        """新しいゲームを開始する（盤面と目標シーケンスを指定しなければランダム生成）
+
+        seedを指定すると、そのシードの乱数生成器に切り替えてから生成する（同じシードなら同じゲームになる）。
+        """
+        if seed is not None:
+            self.rng = resolve_rng(seed)
         self.sequence_length = sequence_length
         
         # ボードの初期化（5x5グリッド）
         self.board = []
-        for _ in range(5):
+        for i in range(5):
             row = []
-            for _ in range(5):
-                row.append({'color': random.choice(self.colors)})
+            for j in range(5):
+                color = board_colors[i][j] if board_colors is not None else self.rng.choice(self.colors)
+                row.append({'color': color})
             self.board.append(row)
+        self.initial_board = [[cell['color'] for cell in row] for row in self.board]
         
         # 目標シーケンスをランダム生成
-        self.target_sequence = [random.choice(self.colors) for _ in range(sequence_length)]
+        if target_sequence is not None:
+            self.target_sequence = list(target_sequence)
+        else:
+            self.target_sequence = [self.rng.choice(self.colors) for _ in range(sequence_length)]
+        
+        self.column_feedback = [self.check_sequence(column) for column in range(5)]
+        self.zobrist_hash = board_hash(self.board, sequence_length)
         
         self.history = []
         self.game_over = False
         self.winner = False
-        print(f"新しいゲームを開始しました。目標シーケンス: {self.target_sequence}")
+        self._undo_stack = []
+        self.generation += 1
+        self.version += 1
+        if EVENTS:
+            EVENTS.emit('game.new', sequence_length=sequence_length, version=self.version)
     
     def make_move(self, color: str, column: int) -> Dict[str, Any]:
         """指定された色を指定された列に挿入する"""
@@ -41,13 +80,17 @@ class ColorLinkGame:
         if color not in self.colors or column < 0 or column >= 5:
             return {'valid': False, 'message': '無効な移動です'}
         
-        # 列に色を挿入してシフト
+        # 列に色を挿入してシフト（押し出される下端の色は版番号とともにunmake_move用に記録）
+        column_colors = [row[column]['color'] for row in self.board]
+        self._undo_stack.append((column_colors[4], self.version + 1))
+        self.zobrist_hash ^= shift_delta(column_colors, column, color)
         for i in range(4, 0, -1):
-            self.board[i][column]['color'] = self.board[i-1][column]['color']
+            self.board[i][column]['color'] = column_colors[i-1]
         self.board[0][column]['color'] = color
         
-        # 結果を判定
+        # 結果を判定（変わったのはこの列だけなので、他の列の判定結果はそのまま使う）
         hits, blows = self.check_sequence(column)
+        self.column_feedback[column] = (hits, blows)
         
         # 履歴に記録
         self.history.append({
@@ -59,21 +102,23 @@ class ColorLinkGame:
         
         # 現在のターン数
         current_turn = len(self.history)
+        self.version += 1
+        self._last_move_version = self.version
         
         # ゲーム終了チェック
         if hits == self.sequence_length:
             self.game_over = True
             self.winner = True
-            print(f"勝利！シーケンスが一致しました。ターン数: {current_turn}")
         elif current_turn >= self.max_turns:
             self.game_over = True
             self.winner = False
-            print(f"敗北。最大ターン数 {self.max_turns} に達しました。正解は {self.target_sequence} でした。")
         
-        # 現在の状態をログ出力
-        column_colors = [self.board[i][column]['color'] for i in range(self.sequence_length)]
-        print(f"移動: 色={color}, 列={column}, 列の上部={column_colors}")
-        print(f"結果: {hits} HIT / {blows} BLOW, ターン={current_turn}/{self.max_turns}, ゲーム終了={self.game_over}")
+        # 受け取り先がある場合だけイベントを組み立てる（目標シーケンスは含めない）
+        if EVENTS:
+            EVENTS.emit('game.move', color=color, column=column, hits=hits, blows=blows,
+                        turn=current_turn, max_turns=self.max_turns)
+            if self.game_over:
+                EVENTS.emit('game.end', winner=self.winner, turns=current_turn)
         
         return {
             'valid': True,
@@ -85,33 +130,57 @@ class ColorLinkGame:
             'max_turns': self.max_turns
         }
     
+    def unmake_move(self) -> Dict[str, Any]:
+        """直前の手を取り消す（列を上にシフトし、押し出された色を下端に戻す）
+
+        探索で仮の手を打って戻すためのもので、盤面をコピーせずに済む。
+        取り消した手の履歴を返す。打った手がなければValueError。
+        """
+        if not self.history:
+            raise ValueError('取り消す手がありません')
+        
+        move = self.history.pop()
+        column = move['column']
+        for i in range(4):
+            self.board[i][column]['color'] = self.board[i+1][column]['color']
+        self.board[4][column]['color'] = self._undo_stack.pop()[0]
+        # 戻した列に取り消した色を差し込むと取り消す前の列になるので、同じXORで元のハッシュに戻る
+        self.zobrist_hash ^= shift_delta([row[column]['color'] for row in self.board], column, move['color'])
+        self.column_feedback[column] = self.check_sequence(column)
+        
+        # 終了したゲームにはそれ以上手を打てないため、取り消した後は常に進行中
+        self.game_over = False
+        self.winner = False
+        self.version += 1
+        return move
+    
+    def snapshot(self) -> GameSnapshot:
+        """現在の局面を表す値を取得する（盤面はコピーしない）
+
+        以降に打った手をrestoreでunmake_moveして戻すため、取得も保持も定数時間で済む。
+        """
+        return GameSnapshot(self.generation, len(self.history), self._undo_stack[-1][1] if self._undo_stack else 0)
+    
+    def restore(self, snapshot: GameSnapshot) -> None:
+        """snapshotで取得した局面まで手を取り消す
+
+        別のゲーム（new_game後）の局面や、すでに取り消した手より先の局面、取り消した後に
+        別の手を打って分岐した局面（同じ手数でも手を打った版番号が違う）はValueError。
+        """
+        depth = snapshot.depth
+        if (snapshot.generation != self.generation or depth > len(self.history)
+                or (depth > 0 and self._undo_stack[depth - 1][1] != snapshot.move_version)):
+            raise ValueError('このゲームで復元できない局面です')
+        while len(self.history) > snapshot.depth:
+            self.unmake_move()
+    
     def check_sequence(self, column: int) -> Tuple[int, int]:
         """指定された列の上部と目標シーケンスを比較してHITとBLOWを計算する"""
-        hits = 0
-        blows = 0
-        
-        # コピーを作成して一致チェック
-        column_colors = [self.board[i][column]['color'] for i in range(self.sequence_length)]
-        target_copy = self.target_sequence.copy()
-        column_copy = column_colors.copy()
-        
-        # HITチェック（色と位置が一致）
-        for i in range(self.sequence_length):
-            if i < len(column_colors) and i < len(self.target_sequence) and column_colors[i] == self.target_sequence[i]:
-                hits += 1
-                target_copy[i] = None
-                column_copy[i] = None
-        
-        # BLOWチェック（色のみ一致）
-        for i in range(self.sequence_length):
-            if i < len(column_copy) and column_copy[i] is not None:
-                for j in range(self.sequence_length):
-                    if j < len(target_copy) and target_copy[j] is not None and column_copy[i] == target_copy[j]:
-                        blows += 1
-                        target_copy[j] = None
-                        break
-        
-        return hits, blows
+        return hits_blows(self.target_sequence, column_top(self.board, column, self.sequence_length))
+    
+    def get_column_feedback(self) -> List[Tuple[int, int]]:
+        """全5列の現在の(HIT, BLOW)（目標シーケンスを知っているシミュレーター・学習用。プレイヤーには公開しない）"""
+        return list(self.column_feedback)
     
     def get_state(self, hide_sequence: bool = True) -> Dict[str, Any]:
         """ゲームの現在の状態を取得する"""
@@ -123,5 +192,28 @@ class ColorLinkGame:
             'targetSequence': None if hide_sequence else self.target_sequence,
             'sequenceLength': self.sequence_length,
             'maxTurns': self.max_turns,
+            'currentTurn': len(self.history),
+            'version': self.version
+        }
+    
+    def get_state_delta(self, base_version: int, hide_sequence: bool = True) -> Optional[Dict[str, Any]]:
+        """base_versionの状態からの差分（直前の1手で変わった列と履歴の追加分）を取得する
+
+        差分で表せない場合（版が1つ前でない、新しいゲームが始まった、直前の変更が手の取り消し等）はNoneを返す。
+        """
+        if not self.history or base_version != self.version - 1 or self._last_move_version != self.version:
+            return None
+        
+        last_move = self.history[-1]
+        column = last_move['column']
+        return {
+            'version': self.version,
+            'baseVersion': base_version,
+            'column': column,
+            'columnColors': [row[column]['color'] for row in self.board],
+            'historyEntry': last_move,
+            'gameOver': self.game_over,
+            'winner': self.winner,
+            'targetSequence': None if hide_sequence else self.target_sequence,
             'currentTurn': len(self.history)
         } 
\ No newline at end of file
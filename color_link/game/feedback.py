@@ -0,0 +1,59 @@
+"""HIT/BLOWの判定
+
+ゲームの判定（ColorLinkGame.check_sequence）とエージェントの候補の絞り込みで同じ計算を使う。
+BLOWは「色ごとの出現数の小さい方の合計 − HIT」で求める（位置の一致を除いた色の一致数）。
+
+numpy版は目標（候補シーケンス）N個と列C本の組み合わせをまとめて判定する:
+    hits, blows = feedback_matrix(encode(candidates), encode(column_tops(board, L)))  # それぞれ (N, C)
+"""
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+
+COLORS = ['red', 'blue', 'yellow', 'green', 'purple']
+COLOR_INDEX: Dict[str, int] = {color: i for i, color in enumerate(COLORS)}
+NUM_COLUMNS = 5
+
+def hits_blows(target: Sequence[str], column: Sequence[str]) -> Tuple[int, int]:
+    """目標シーケンスと列の上部（同じ長さ）のHITとBLOW"""
+    hits = 0
+    target_rest: Dict[str, int] = {}
+    column_rest: Dict[str, int] = {}
+    for t, c in zip(target, column):
+        if t == c:
+            hits += 1
+        else:
+            target_rest[t] = target_rest.get(t, 0) + 1
+            column_rest[c] = column_rest.get(c, 0) + 1
+    blows = 0
+    for color, count in target_rest.items():
+        other = column_rest.get(color)
+        if other:
+            blows += count if count < other else other
+    return hits, blows
+
+def column_top(board: List[List[Dict[str, str]]], column: int, length: int) -> List[str]:
+    """盤面の指定した列の上からlength個の色"""
+    return [board[i][column]['color'] for i in range(length)]
+
+def column_tops(board: List[List[Dict[str, str]]], length: int) -> List[List[str]]:
+    """盤面の全列の上からlength個の色（列ごと）"""
+    return [column_top(board, column, length) for column in range(NUM_COLUMNS)]
+
+def encode(sequences: Sequence[Sequence[str]]) -> np.ndarray:
+    """色のシーケンスの並びを色インデックスの配列 (N, L) に変換する"""
+    return np.array([[COLOR_INDEX[color] for color in sequence] for sequence in sequences], dtype=np.int8).reshape(len(sequences), -1)
+
+def _color_counts(encoded: np.ndarray) -> np.ndarray:
+    """(N, L) の色インデックスから色ごとの出現数 (N, 色数) を求める"""
+    return (encoded[:, :, None] == np.arange(len(COLORS), dtype=np.int8)).sum(axis=1)
+
+def feedback_matrix(targets: np.ndarray, columns: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """目標 (N, L) と列 (C, L) のすべての組み合わせのHITとBLOW（それぞれ (N, C)）"""
+    hits = (targets[:, None, :] == columns[None, :, :]).sum(axis=2)
+    matches = np.minimum(_color_counts(targets)[:, None, :], _color_counts(columns)[None, :, :]).sum(axis=2)
+    return hits, matches - hits
+
+def probe(target: Sequence[str], columns: Sequence[Sequence[str]]) -> Tuple[np.ndarray, np.ndarray]:
+    """仮の目標シーケンスを全列と一度に比較したときのHITとBLOW（それぞれ列数の長さ）"""
+    hits, blows = feedback_matrix(encode([target]), encode(columns))
+    return hits[0], blows[0]
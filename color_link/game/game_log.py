@@ -0,0 +1,291 @@
+"""終了したゲームを追記していくバイナリのゲーム記録
+
+ファイルは先頭のヘッダ（b'CLGL' + バージョン）のあとにゲームごとのレコードが続く。
+レコードは「本体の長さ（varint）+ 本体 + 本体のCRC32（4バイト）」で、本体は
+
+    シーケンス長（1バイト）, AIタイプ（1バイト。state_token.AGENT_TYPESの番号）,
+    最大ターン数（varint）, 開始時の盤面（25マスの5進数、varint）, 目標シーケンス（5進数、varint）,
+    手数（varint）, 手ごとに「色×5+列」と「HIT×6+BLOW」の2バイト
+
+20手のゲームでおよそ60バイトになる。書き込み途中で停止して末尾のレコードが欠けていても、
+それより前のゲームはそのまま読める。
+
+使い方:
+    with GameLogWriter('games.clgl') as log:
+        log.append(game, 'rule')
+    for record in read_games('games.clgl'):  # 1ゲームずつ読み込む
+        ...
+    python -m color_link.game.game_log games.clgl  # 件数・勝率などの集計
+"""
+import os
+import sys
+import zlib
+import logging
+import argparse
+import threading
+from collections import Counter
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+from color_link.game.color_link import ColorLinkGame
+from color_link.game.feedback import COLORS, COLOR_INDEX
+from color_link.game.state_token import AGENT_TYPES
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'CLGL'
+LOG_VERSION = 1
+HEADER = MAGIC + bytes([LOG_VERSION])
+# 読み込み時に一度に読むバイト数
+READ_CHUNK_SIZE = 1 << 20
+# エージェントのクラス名からAIタイプへの対応
+AGENT_CLASS_TYPES = {'RuleBasedAgent': 'rule', 'RLAgent': 'rl', 'HybridAgent': 'hybrid'}
+
+class GameLogError(ValueError):
+    """ゲーム記録の形式が不正"""
+
+class GameRecord(NamedTuple):
+    """記録された1ゲーム（手は (色, 列, HIT, BLOW)）"""
+    initial_board: List[List[str]]
+    target: List[str]
+    moves: List[Tuple[str, int, int, int]]
+    agent: Optional[str]
+    max_turns: int
+
+    @property
+    def sequence_length(self) -> int:
+        return len(self.target)
+
+    @property
+    def turns(self) -> int:
+        return len(self.moves)
+
+    @property
+    def won(self) -> bool:
+        return bool(self.moves) and self.moves[-1][2] == len(self.target)
+
+def agent_type_of(agent) -> Optional[str]:
+    """エージェントのAIタイプ（'rule' / 'rl' / 'hybrid'、不明ならNone）"""
+    return AGENT_CLASS_TYPES.get(type(agent).__name__)
+
+def record_from_game(game: ColorLinkGame, agent_type: Optional[str] = None) -> GameRecord:
+    """ゲームの開始時の盤面と手順から記録を作る"""
+    return GameRecord(
+        [list(row) for row in game.initial_board],
+        list(game.target_sequence),
+        [(move['color'], move['column'], move['hits'], move['blows']) for move in game.history],
+        agent_type,
+        game.max_turns
+    )
+
+def replay(record: GameRecord) -> ColorLinkGame:
+    """記録からゲームを再現する（盤面・履歴・勝敗が記録した時点と同じになる）"""
+    game = ColorLinkGame()
+    game.max_turns = record.max_turns
+    game.new_game(record.sequence_length, board_colors=record.initial_board, target_sequence=record.target)
+    for color, column, _, _ in record.moves:
+        game.make_move(color, column)
+    return game
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _read_varint(data: bytes, pos: int) -> Tuple[Optional[int], int]:
+    """posからvarintを読む（データが途中で終わっていれば (None, pos)）"""
+    value = 0
+    shift = 0
+    end = len(data)
+    while pos < end:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+    return None, pos
+
+def encode_record(record: GameRecord) -> bytes:
+    """1ゲームをレコード（長さ + 本体 + CRC32）に変換する"""
+    n = len(COLORS)
+    board_value = 0
+    for row in record.initial_board:
+        for color in row:
+            board_value = board_value * n + COLOR_INDEX[color]
+    target_value = 0
+    for color in record.target:
+        target_value = target_value * n + COLOR_INDEX[color]
+
+    body = bytearray([record.sequence_length, AGENT_TYPES.index(record.agent)])
+    _write_varint(body, record.max_turns)
+    _write_varint(body, board_value)
+    _write_varint(body, target_value)
+    _write_varint(body, len(record.moves))
+    for color, column, hits, blows in record.moves:
+        body.append(COLOR_INDEX[color] * 5 + column)
+        body.append(hits * 6 + blows)
+
+    out = bytearray()
+    _write_varint(out, len(body))
+    out += body
+    out += zlib.crc32(body).to_bytes(4, 'big')
+    return bytes(out)
+
+def decode_record(body: bytes) -> GameRecord:
+    """レコードの本体から1ゲームを取り出す"""
+    n = len(COLORS)
+    if len(body) < 2 or not 1 <= body[0] <= 5 or body[1] >= len(AGENT_TYPES):
+        raise GameLogError("レコードの本体が不正です")
+    sequence_length = body[0]
+    max_turns, pos = _read_varint(body, 2)
+    board_value, pos = _read_varint(body, pos)
+    target_value, pos = _read_varint(body, pos)
+    move_count, pos = _read_varint(body, pos)
+    if move_count is None or len(body) != pos + move_count * 2:
+        raise GameLogError("レコードの本体が不正です")
+
+    cells = []
+    for _ in range(25):
+        board_value, index = divmod(board_value, n)
+        cells.append(COLORS[index])
+    cells.reverse()
+    target = []
+    for _ in range(sequence_length):
+        target_value, index = divmod(target_value, n)
+        target.append(COLORS[index])
+    target.reverse()
+
+    moves = []
+    for i in range(pos, len(body), 2):
+        color_index, column = divmod(body[i], 5)
+        hits, blows = divmod(body[i + 1], 6)
+        if color_index >= n:
+            raise GameLogError("レコードの手順が不正です")
+        moves.append((COLORS[color_index], column, hits, blows))
+    return GameRecord([cells[i * 5:(i + 1) * 5] for i in range(5)], target, moves, AGENT_TYPES[body[1]], max_turns)
+
+class GameLogWriter:
+    """ゲーム記録のファイルに追記する（スレッドセーフ）
+
+    書き込みはバッファリングされるため、ほかのプロセスから読む前にflush()またはclose()する。
+    複数のプロセスから記録する場合はプロセスごとに別のファイルにする。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.games_written = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(HEADER)
+        else:
+            with open(path, 'rb') as f:
+                if f.read(len(HEADER)) != HEADER:
+                    self._file.close()
+                    raise GameLogError(f"ゲーム記録のファイルではありません: {path}")
+
+    def append(self, game: ColorLinkGame, agent_type: Optional[str] = None) -> None:
+        """ゲームを1件追記する"""
+        self.write(record_from_game(game, agent_type))
+
+    def write(self, record: GameRecord) -> None:
+        data = encode_record(record)
+        with self._lock:
+            self._file.write(data)
+            self.games_written += 1
+
+    def flush(self) -> None:
+        with self._lock:
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def read_games(path: str) -> Iterator[GameRecord]:
+    """ゲーム記録のファイルから1ゲームずつ読み込む（ファイル全体をメモリに載せない）
+
+    末尾の書きかけのレコードは読み飛ばす。途中のレコードが壊れていればGameLogError。
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(HEADER)) != HEADER:
+            raise GameLogError(f"ゲーム記録のファイルではありません: {path}")
+        buffer = b''
+        while True:
+            chunk = f.read(READ_CHUNK_SIZE)
+            buffer += chunk
+            pos = 0
+            while True:
+                length, start = _read_varint(buffer, pos)
+                if length is None or start + length + 4 > len(buffer):
+                    break
+                body = buffer[start:start + length]
+                if zlib.crc32(body) != int.from_bytes(buffer[start + length:start + length + 4], 'big'):
+                    raise GameLogError(f"レコードが壊れています: {path}")
+                yield decode_record(body)
+                pos = start + length + 4
+            buffer = buffer[pos:]
+            if not chunk:
+                if buffer:
+                    logger.warning(f"末尾の書きかけのレコードを読み飛ばしました: {path} ({len(buffer)}バイト)")
+                return
+
+def summarize(path: str) -> dict:
+    """ゲーム記録の件数・勝率・平均ターン数（AIタイプ別）"""
+    games = Counter()
+    wins = Counter()
+    turns = Counter()
+    for record in read_games(path):
+        agent = record.agent or 'none'
+        games[agent] += 1
+        wins[agent] += record.won
+        turns[agent] += record.turns
+    total = sum(games.values())
+    return {
+        'games': total,
+        'bytes': os.path.getsize(path),
+        'bytesPerGame': os.path.getsize(path) / total if total else None,
+        'agents': {
+            agent: {
+                'games': games[agent],
+                'winRate': wins[agent] / games[agent] * 100,
+                'avgTurns': turns[agent] / games[agent]
+            }
+            for agent in sorted(games)
+        }
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='ゲーム記録の集計')
+    parser.add_argument('path', help='ゲーム記録のファイル')
+    args = parser.parse_args(argv)
+
+    summary = summarize(args.path)
+    print(f"{summary['games']}ゲーム, {summary['bytes']}バイト"
+          + (f" ({summary['bytesPerGame']:.1f}バイト/ゲーム)" if summary['games'] else ''))
+    for agent, s in summary['agents'].items():
+        print(f"  {agent:<8} {s['games']:>10}ゲーム  勝率={s['winRate']:6.2f}%  平均ターン={s['avgTurns']:.2f}")
+    return 0
+
+def _log_from_env() -> Optional[GameLogWriter]:
+    """COLOR_LINK_GAME_LOG にファイルのパスを指定すると、APIとトレーニングで終了したゲームを記録する"""
+    path = os.environ.get('COLOR_LINK_GAME_LOG')
+    if not path:
+        return None
+    logger.info(f"ゲーム記録を有効化: {path}")
+    return GameLogWriter(path)
+
+# アプリが終了したゲームを記録する先（Noneなら記録しない）
+GAME_LOG = _log_from_env()
+
+if __name__ == '__main__':
+    sys.exit(main())
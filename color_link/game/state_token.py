@@ -0,0 +1,161 @@
+import base64
+import hashlib
+import hmac
+import os
+from typing import Any, Iterable, List, Optional, Tuple
+from color_link.game.color_link import ColorLinkGame
+
+# トークン形式のバージョン
+TOKEN_VERSION = 1
+# フラグ
+FLAG_ENCRYPTED = 0x01
+# 署名（HMAC-SHA256を切り詰めたもの）と暗号化用ノンスのバイト数
+MAC_SIZE = 16
+NONCE_SIZE = 8
+# トークンに記録するAIタイプ（0はAIなし）
+AGENT_TYPES = [None, 'rule', 'rl', 'hybrid']
+
+class StateTokenError(ValueError):
+    """トークンの形式不正・改ざん・鍵の不一致"""
+
+class StateTokenCodec:
+    """ゲームの状態を署名付き（任意で暗号化）のコンパクトなトークンに変換する
+
+    盤面は開始時の25マスを5進数で8バイトに、目標シーケンスを2バイトに、
+    各手を「色×列」の1バイトに詰める。現在の盤面・HIT/BLOW・勝敗は復元時に
+    手をリプレイして求めるため、50手のゲームでも本体は60バイト程度に収まる。
+    """
+
+    def __init__(self, secret_key: bytes, encrypt: bool = True):
+        if isinstance(secret_key, str):
+            secret_key = secret_key.encode('utf-8')
+        if not secret_key:
+            raise ValueError("トークンの署名には秘密鍵が必要です")
+        # 署名用と暗号化用で鍵を分ける
+        self._mac_key = hmac.new(secret_key, b'color-link/state-token/mac', hashlib.sha256).digest()
+        self._enc_key = hmac.new(secret_key, b'color-link/state-token/enc', hashlib.sha256).digest()
+        self.encrypt = encrypt
+        self.colors = ColorLinkGame().colors
+
+    def encode(self, game: ColorLinkGame, agent_type: Optional[str] = None) -> str:
+        """ゲームの状態をトークンに変換する"""
+        body = self._pack(game, agent_type)
+        flags = 0
+        header = bytes([TOKEN_VERSION])
+        if self.encrypt:
+            flags |= FLAG_ENCRYPTED
+            nonce = os.urandom(NONCE_SIZE)
+            body = nonce + self._xor_keystream(nonce, body)
+        signed = header + bytes([flags]) + body
+        mac = hmac.new(self._mac_key, signed, hashlib.sha256).digest()[:MAC_SIZE]
+        return base64.urlsafe_b64encode(signed + mac).rstrip(b'=').decode('ascii')
+
+    def decode(self, token: str, observers: Iterable[Any] = ()) -> Tuple[ColorLinkGame, Optional[str]]:
+        """トークンからゲームを復元し、(ゲーム, AIタイプ) を返す
+
+        復元は開始時の盤面から手をリプレイして行う。observersを渡すと、開始時と
+        各手の後の状態がobserve()に渡されるため、エージェントの候補も同時に再構築できる。
+        """
+        initial_board, target, moves, max_turns, agent_type = self._unpack(self._verify(token))
+        observers = list(observers)
+        game = ColorLinkGame()
+        game.max_turns = max_turns
+        game.new_game(len(target), board_colors=initial_board, target_sequence=target)
+        for observer in observers:
+            observer.observe(game.get_state())
+        for color, column in moves:
+            result = game.make_move(color, column)
+            if not result['valid']:
+                raise StateTokenError("トークンの手順をリプレイできません")
+            for observer in observers:
+                observer.observe(game.get_state())
+        return game, agent_type
+
+    def read_agent_type(self, token: str) -> Optional[str]:
+        """リプレイせずにトークンのAIタイプだけを読み出す"""
+        return self._unpack(self._verify(token))[4]
+
+    def _verify(self, token: str) -> bytes:
+        """署名を検証し、（必要なら復号した）本体を返す"""
+        if not token:
+            raise StateTokenError("トークンがありません")
+        try:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        except (ValueError, TypeError):
+            raise StateTokenError("トークンの形式が不正です")
+        if len(raw) < 2 + MAC_SIZE:
+            raise StateTokenError("トークンが短すぎます")
+        signed, mac = raw[:-MAC_SIZE], raw[-MAC_SIZE:]
+        expected = hmac.new(self._mac_key, signed, hashlib.sha256).digest()[:MAC_SIZE]
+        if not hmac.compare_digest(mac, expected):
+            raise StateTokenError("トークンの署名が一致しません")
+        version, flags, body = signed[0], signed[1], signed[2:]
+        if version != TOKEN_VERSION:
+            raise StateTokenError(f"未対応のトークンバージョンです: {version}")
+        if flags & FLAG_ENCRYPTED:
+            if len(body) < NONCE_SIZE:
+                raise StateTokenError("トークンが短すぎます")
+            nonce, body = body[:NONCE_SIZE], body[NONCE_SIZE:]
+            body = self._xor_keystream(nonce, body)
+        return body
+
+    def _xor_keystream(self, nonce: bytes, data: bytes) -> bytes:
+        """HMAC-SHA256をカウンターモードで用いた鍵ストリームとのXOR（暗号化・復号とも同じ）"""
+        stream = bytearray()
+        counter = 0
+        while len(stream) < len(data):
+            stream.extend(hmac.new(self._enc_key, nonce + counter.to_bytes(4, 'big'), hashlib.sha256).digest())
+            counter += 1
+        return bytes(a ^ b for a, b in zip(data, stream))
+
+    def _pack(self, game: ColorLinkGame, agent_type: Optional[str]) -> bytes:
+        """ゲームをバイナリに詰める"""
+        color_index = {color: i for i, color in enumerate(self.colors)}
+        n = len(self.colors)
+
+        board_value = 0
+        for row in game.initial_board:
+            for color in row:
+                board_value = board_value * n + color_index[color]
+        target_value = 0
+        for color in game.target_sequence:
+            target_value = target_value * n + color_index[color]
+
+        body = bytearray([game.sequence_length, game.max_turns, AGENT_TYPES.index(agent_type)])
+        body += board_value.to_bytes(8, 'big')
+        body += target_value.to_bytes(2, 'big')
+        for move in game.history:
+            body.append(color_index[move['color']] * 5 + move['column'])
+        return bytes(body)
+
+    def _unpack(self, body: bytes) -> Tuple[List[List[str]], List[str], List[Tuple[str, int]], int, Optional[str]]:
+        """バイナリからゲームの構成要素を取り出す"""
+        if len(body) < 13:
+            raise StateTokenError("トークンの本体が不正です")
+        n = len(self.colors)
+        sequence_length, max_turns, agent_code = body[0], body[1], body[2]
+        if not 1 <= sequence_length <= 5 or agent_code >= len(AGENT_TYPES):
+            raise StateTokenError("トークンの本体が不正です")
+
+        board_value = int.from_bytes(body[3:11], 'big')
+        cells = []
+        for _ in range(25):
+            board_value, index = divmod(board_value, n)
+            cells.append(self.colors[index])
+        cells.reverse()
+        initial_board = [cells[i * 5:(i + 1) * 5] for i in range(5)]
+
+        target_value = int.from_bytes(body[11:13], 'big')
+        target = []
+        for _ in range(sequence_length):
+            target_value, index = divmod(target_value, n)
+            target.append(self.colors[index])
+        target.reverse()
+
+        moves = []
+        for code in body[13:]:
+            color_code, column = divmod(code, 5)
+            if color_code >= n:
+                raise StateTokenError("トークンの手順が不正です")
+            moves.append((self.colors[color_code], column))
+        return initial_board, target, moves, max_turns, AGENT_TYPES[agent_code]
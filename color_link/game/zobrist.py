@@ -0,0 +1,124 @@
+"""盤面と候補集合のZobristハッシュ（64ビット）
+
+盤面のハッシュは「(行, 列, 色) ごとの乱数」と「シーケンス長ごとの乱数」のXOR。
+1手で変わるのは1列（5マス）だけなので、その列の変更前と変更後の値をXORすれば更新できる。
+候補集合のハッシュは各候補シーケンスのハッシュのXOR（順序によらない）。シーケンスのハッシュは
+シーケンス全体ごとに独立した乱数にする（位置・色ごとの乱数のXORだと、集合のハッシュが
+位置・色ごとの出現数の偶奇だけで決まり、{rb, br} と {rr, bb} のような別の集合が衝突する）。
+
+乱数はsplitmix64で固定の値から生成するため、プロセスやバージョンが変わっても同じハッシュになる
+（Q値テーブルや永続化したキャッシュのキーに使える）。
+"""
+import itertools
+from typing import Any, Dict, List, Sequence
+from color_link.game.feedback import COLOR_INDEX, COLORS, NUM_COLUMNS
+
+MASK64 = (1 << 64) - 1
+NUM_ROWS = 5
+MAX_SEQUENCE_LENGTH = 5
+
+def _mix64(z: int) -> int:
+    """splitmix64の出力関数（64ビットの値をかき混ぜる）"""
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+def _splitmix64(state: int):
+    """splitmix64の乱数列"""
+    while True:
+        state = (state + 0x9E3779B97F4A7C15) & MASK64
+        yield _mix64(state)
+
+_keys = _splitmix64(0xC0102C1)
+# BOARD_KEYS[row][column][color_index]
+BOARD_KEYS: List[List[List[int]]] = [[[next(_keys) for _ in COLORS] for _ in range(NUM_COLUMNS)] for _ in range(NUM_ROWS)]
+# LENGTH_KEYS[sequence_length]（同じ盤面でもシーケンス長が違えば別の局面）
+LENGTH_KEYS: List[int] = [next(_keys) for _ in range(MAX_SEQUENCE_LENGTH + 1)]
+del _keys
+# SEQUENCE_KEYS[length][index]（indexはシーケンスを色インデックスの5進数とみなした値）。
+# 長さの違うシーケンスが同じ値にならないよう、先頭に1の桁を付けた値をかき混ぜる
+SEQUENCE_KEYS: List[List[int]] = [
+    [_mix64((0xC0102C1 << 32) ^ (len(COLORS) ** length + index)) for index in range(len(COLORS) ** length)]
+    for length in range(MAX_SEQUENCE_LENGTH + 1)
+]
+# CELL_KEYS[column][row][color]（手ごとの更新で色インデックスへの変換を省くための同じ値の表）
+CELL_KEYS: List[List[Dict[str, int]]] = [
+    [dict(zip(COLORS, BOARD_KEYS[row][column])) for row in range(NUM_ROWS)] for column in range(NUM_COLUMNS)
+]
+
+def column_hash(colors: Sequence[str], column: int) -> int:
+    """1列（上から下への5色）のハッシュ"""
+    h = 0
+    for keys, color in zip(CELL_KEYS[column], colors):
+        h ^= keys[color]
+    return h
+
+def shift_delta(colors: Sequence[str], column: int, color: str) -> int:
+    """列（上から下への5色）の上端にcolorを差し込んで1つずつ下げたときの、ハッシュに掛けるXOR"""
+    keys = CELL_KEYS[column]
+    delta = 0
+    previous = color
+    for row in range(NUM_ROWS):
+        current = colors[row]
+        if current != previous:
+            delta ^= keys[row][current] ^ keys[row][previous]
+        previous = current
+    return delta
+
+def board_hash(board: List[List[Dict[str, str]]], sequence_length: int) -> int:
+    """盤面全体のハッシュ（ゲームが手ごとに更新する値と同じ）"""
+    h = LENGTH_KEYS[sequence_length]
+    for row, cells in enumerate(board):
+        for column, cell in enumerate(cells):
+            h ^= BOARD_KEYS[row][column][COLOR_INDEX[cell['color']]]
+    return h
+
+def top_rows_hash(board: List[List[Dict[str, str]]], sequence_length: int) -> int:
+    """盤面の上からシーケンス長ぶんの行だけのハッシュ（HIT/BLOWの判定に関わる部分）"""
+    h = LENGTH_KEYS[sequence_length]
+    for row in range(sequence_length):
+        for column, cell in enumerate(board[row]):
+            h ^= BOARD_KEYS[row][column][COLOR_INDEX[cell['color']]]
+    return h
+
+def sequence_hash(sequence: Sequence[str]) -> int:
+    """候補シーケンス1つのハッシュ"""
+    index = 0
+    for color in sequence:
+        index = index * len(COLORS) + COLOR_INDEX[color]
+    return SEQUENCE_KEYS[len(sequence)][index]
+
+# シーケンス長ごとの全シーケンス（絞り込み前の候補集合）のハッシュ
+_full_set_hashes: Dict[int, int] = {}
+
+def candidates_hash(sequences: Sequence[Sequence[str]]) -> int:
+    """候補集合のハッシュ（順序によらない。候補に重複はない前提）"""
+    if not sequences:
+        return 0
+    length = len(sequences[0])
+    if len(sequences) == len(COLORS) ** length:
+        # 重複がなければ全シーケンスなので、長さごとに一度だけ計算する
+        h = _full_set_hashes.get(length)
+        if h is None:
+            h = _full_set_hashes[length] = _xor_hashes(itertools.product(COLORS, repeat=length))
+        return h
+    return _xor_hashes(sequences)
+
+def _xor_hashes(sequences) -> int:
+    n = len(COLORS)
+    h = 0
+    for sequence in sequences:
+        index = 0
+        for color in sequence:
+            index = index * n + COLOR_INDEX[color]
+        h ^= SEQUENCE_KEYS[len(sequence)][index]
+    return h
+
+def combine(board_key: int, candidates_key: int) -> int:
+    """盤面と候補集合のハッシュを1つのキーにする（単純なXORだと打ち消し合うため候補側を混ぜてから合わせる）"""
+    mixed = (candidates_key * 0x9E3779B97F4A7C15) & MASK64
+    return board_key ^ mixed ^ (mixed >> 29)
+
+def position_key(game_state: Dict[str, Any], sequences: Sequence[Sequence[str]]) -> int:
+    """ゲーム状態の盤面と候補集合から、置換表やキャッシュのキーを求める"""
+    return combine(board_hash(game_state['board'], game_state.get('sequenceLength', 3)), candidates_hash(sequences))
@@ -0,0 +1,329 @@
+import os
+import sys
+import json
+import random
+import threading
+import time
+import uuid
+import logging
+import multiprocessing
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional
+from color_link.evaluation import MAX_EVALUATION_GAMES
+
+logger = logging.getLogger(__name__)
+
+JOB_KINDS = ('training', 'evaluation')
+# ジョブの進捗をサブプロセスから送る最短間隔（秒）
+PROGRESS_INTERVAL = 0.5
+
+def _job_main(kind: str, params: Dict[str, Any], artifact_dir: str, conn, nice: int) -> None:
+    """サブプロセスで1つのジョブを実行する（進捗と結果はconnで親プロセスに送る）"""
+    logging.disable(logging.CRITICAL)
+    sys.stdout = open(os.devnull, 'w')
+    if nice and hasattr(os, 'nice'):
+        # Webサーバーより優先度を下げてCPUを奪わないようにする
+        os.nice(nice)
+
+    last_report = [0.0]
+
+    def report(make_progress) -> None:
+        """一定間隔ごとに進捗を送る（進捗の作成も送るときだけ行う）"""
+        now = time.monotonic()
+        if now - last_report[0] >= PROGRESS_INTERVAL:
+            last_report[0] = now
+            conn.send(('progress', make_progress()))
+
+    try:
+        if kind == 'training':
+            result = _run_training_job(params, artifact_dir, report)
+        else:
+            result = _run_evaluation_job(params, artifact_dir, report)
+        conn.send(('done', result))
+    except Exception as e:
+        conn.send(('error', f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+def _run_training_job(params: Dict[str, Any], artifact_dir: str, report) -> Dict[str, Any]:
+    """トレーニングジョブ：学習したQ値テーブルと統計を成果物として保存する"""
+    from color_link.agents.rl_agent import RLAgent
+    from color_link.agents.hybrid_agent import HybridAgent
+    from color_link.training import load_checkpoint, new_training_stats, restore_checkpoint, train_agent
+    from color_link.game.game_log import GameLogWriter
+
+    learning_rate = float(params.get('learningRate', 0.1))
+    discount_factor = float(params.get('discountFactor', 0.9))
+    # シードを指定した場合はジョブ専用の乱数生成器で学習する（同じシードなら同じQ値テーブルになる）
+    rng = random.Random(params['seed']) if params.get('seed') is not None else None
+    if params.get('agentType', 'rl') == 'hybrid':
+        agent = HybridAgent(learning_rate=learning_rate, discount_factor=discount_factor, rng=rng)
+        agent.rl_agent.exploration_rate = float(params.get('explorationRate', 0.5))
+    else:
+        agent = RLAgent(learning_rate=learning_rate, discount_factor=discount_factor,
+                        exploration_rate=float(params.get('explorationRate', 0.5)), rng=rng)
+    agent.learning_mode = True
+
+    stats = new_training_stats()
+    if params.get('resumeFromJob'):
+        # 別のジョブのチェックポイントから、学習状態と乱数の状態ごと続きを実行する
+        checkpoint_path = os.path.join(os.path.dirname(artifact_dir), params['resumeFromJob'], 'checkpoint.json')
+        stats = restore_checkpoint(load_checkpoint(checkpoint_path), agent)
+    elif params.get('initFromSaved', False):
+        agent.load_q_table()
+
+    q_table_path = os.path.join(artifact_dir, 'q_table.json')
+    # recordGamesを指定した場合は、学習に使ったゲームを成果物として記録する
+    game_log = GameLogWriter(os.path.join(artifact_dir, 'games.clgl')) if params.get('recordGames') else None
+    try:
+        train_agent(agent, int(params.get('numGames', 1000)), int(params.get('sequenceLength', 3)),
+                    stats=stats, on_progress=lambda: report(lambda: dict(stats)),
+                    save_path=q_table_path,
+                    checkpoint_path=os.path.join(artifact_dir, 'checkpoint.json'),
+                    checkpoint_params=params,
+                    game_log=game_log)
+    finally:
+        if game_log is not None:
+            game_log.close()
+
+    with open(os.path.join(artifact_dir, 'stats.json'), 'w') as f:
+        json.dump(stats, f)
+    return stats
+
+def _run_evaluation_job(params: Dict[str, Any], artifact_dir: str, report) -> Dict[str, Any]:
+    """評価ジョブ：qTableFromJobで指定したトレーニングジョブのQ値テーブル（省略時は既定の保存先）でゲームをプレイして集計する"""
+    from color_link.evaluation import EvaluationStats, play_evaluation_game
+    from color_link.rng import derive_seed
+
+    q_table_path = None
+    if params.get('qTableFromJob'):
+        q_table_path = os.path.join(os.path.dirname(artifact_dir), params['qTableFromJob'], 'q_table.json')
+    games = int(params.get('games', 100))
+    base_seed = int(params.get('seed') or 0)
+    stats = EvaluationStats()
+    for i in range(games):
+        stats.add(play_evaluation_game(params.get('agentType', 'rule'), int(params.get('sequenceLength', 3)),
+                                       derive_seed(base_seed, i), q_table_path))
+        report(stats.summary)
+    return stats.summary()
+
+def _int_param(params: Dict[str, Any], name: str, default: int) -> int:
+    """整数のパラメータを取り出す（整数に変換できなければValueError）"""
+    value = params.get(name, default)
+    if isinstance(value, bool):
+        raise ValueError(f"{name}は整数で指定してください")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name}は整数で指定してください")
+
+class Job:
+    """トレーニング・評価ジョブ1件（ID・パラメータ・進捗・結果・成果物）"""
+
+    def __init__(self, kind: str, params: Dict[str, Any], artifact_root: str):
+        self.job_id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.artifact_dir = os.path.join(artifact_root, self.job_id)
+        self.status = 'queued'  # 'queued' / 'running' / 'completed' / 'failed' / 'cancelled'
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_requested = False
+        self.process = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ('completed', 'failed', 'cancelled')
+
+    def artifacts(self) -> List[str]:
+        """保存された成果物のファイル名"""
+        if not os.path.isdir(self.artifact_dir):
+            return []
+        return sorted(os.listdir(self.artifact_dir))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'jobId': self.job_id,
+            'kind': self.kind,
+            'params': self.params,
+            'status': self.status,
+            'progress': self.progress,
+            'result': self.result,
+            'error': self.error,
+            'artifacts': self.artifacts(),
+            'createdAt': self.created_at,
+            'startedAt': self.started_at,
+            'finishedAt': self.finished_at
+        }
+
+class JobManager:
+    """ジョブを待ち行列に積み、同時実行数の上限までサブプロセスで実行する"""
+
+    def __init__(self, artifact_root: str, max_concurrent: Optional[int] = None,
+                 nice: int = 10, max_jobs: int = 100):
+        """
+        Args:
+            artifact_root: ジョブごとの成果物を保存するディレクトリ
+            max_concurrent: 同時に実行するジョブ数（Noneの場合はWebサーバー用に1コア残す）
+            nice: サブプロセスの優先度を下げる量（0なら変更しない）
+            max_jobs: 保持するジョブ情報の上限（終了したものから破棄）
+        """
+        self.artifact_root = artifact_root
+        self.max_concurrent = max_concurrent or max(1, (os.cpu_count() or 1) - 1)
+        self.nice = nice
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()
+        self._queue = deque()
+        self._running = 0
+        self._lock = threading.Lock()
+        self._context = multiprocessing.get_context('spawn')
+
+    def submit(self, kind: str, params: Optional[Dict[str, Any]] = None) -> Job:
+        """ジョブを登録する（空きがあればすぐに、なければ順番が来たら実行される）"""
+        if kind not in JOB_KINDS:
+            raise ValueError(f"未知のジョブ種別: {kind}")
+        params = params or {}
+        resume_from = params.get('resumeFromJob')
+        if resume_from is not None and not self._has_artifact(resume_from, 'checkpoint.json'):
+            raise ValueError(f"再開元のチェックポイントが見つかりません: {resume_from}")
+        # サーバー上の任意のファイルを読ませないよう、Q値テーブルはジョブIDで成果物を指定させる
+        if 'qTablePath' in params:
+            raise ValueError("qTablePathは指定できません（qTableFromJobにトレーニングジョブのIDを指定してください）")
+        q_table_from = params.get('qTableFromJob')
+        if q_table_from is not None and not self._has_artifact(q_table_from, 'q_table.json'):
+            raise ValueError(f"Q値テーブルが見つかりません: {q_table_from}")
+        if kind == 'evaluation':
+            # サブプロセスを起動する前に、評価APIと同じ範囲に収まっているか確かめる
+            games = _int_param(params, 'games', 100)
+            if not 1 <= games <= MAX_EVALUATION_GAMES:
+                raise ValueError(f"ゲーム数は1以上{MAX_EVALUATION_GAMES}以下で指定してください")
+            if not 1 <= _int_param(params, 'sequenceLength', 3) <= 5:
+                raise ValueError("シーケンス長は1以上5以下で指定してください")
+        job = Job(kind, dict(params), self.artifact_root)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._queue.append(job)
+            self._prune()
+        logger.info(f"ジョブを登録: ID={job.job_id}, 種別={kind}, パラメータ={job.params}")
+        self._dispatch()
+        return job
+
+    def _has_artifact(self, job_id, name: str) -> bool:
+        """ジョブIDの形式が正しく、そのジョブの成果物nameがあるか"""
+        return (isinstance(job_id, str) and job_id.isalnum()
+                and os.path.isfile(os.path.join(self.artifact_root, job_id, name)))
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> bool:
+        """ジョブを中止する（実行中ならサブプロセスを終了させる）"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.done:
+                return False
+            job.cancel_requested = True
+            if job.status == 'queued':
+                self._queue.remove(job)
+                self._finish(job, 'cancelled')
+                return True
+            process = job.process
+
+        # 実行中：終了シグナルを送り、応じなければ強制終了する
+        process.terminate()
+        process.join(timeout=5)
+        if process.is_alive():
+            process.kill()
+        logger.info(f"ジョブを中止: ID={job_id}")
+        return True
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> bool:
+        """ジョブの終了を待つ（テストやスクリプト用）"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        job = self.get(job_id)
+        while job is not None and not job.done:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def _dispatch(self) -> None:
+        """空きがある分だけ待ち行列のジョブを開始する"""
+        while True:
+            with self._lock:
+                if self._running >= self.max_concurrent or not self._queue:
+                    return
+                job = self._queue.popleft()
+                self._running += 1
+                job.status = 'running'
+                job.started_at = time.time()
+
+                # 中止要求がプロセスの起動途中に来ないよう、起動まではロックを保持する
+                os.makedirs(job.artifact_dir, exist_ok=True)
+                parent_conn, child_conn = self._context.Pipe(duplex=False)
+                job.process = self._context.Process(
+                    target=_job_main,
+                    args=(job.kind, job.params, job.artifact_dir, child_conn, self.nice),
+                    daemon=True
+                )
+                job.process.start()
+                child_conn.close()  # 子プロセスの終了をEOFで検知できるよう親側の送信口を閉じる
+
+            thread = threading.Thread(target=self._monitor, args=(job, parent_conn))
+            thread.daemon = True
+            thread.start()
+            logger.info(f"ジョブを開始: ID={job.job_id}, PID={job.process.pid}")
+
+    def _monitor(self, job: Job, conn) -> None:
+        """サブプロセスからの進捗を受け取り、終了したら次のジョブを開始する"""
+        status, error = None, None
+        try:
+            while True:
+                try:
+                    message, payload = conn.recv()
+                except (EOFError, OSError):
+                    break
+                if message == 'progress':
+                    job.progress = payload
+                elif message == 'done':
+                    job.result = payload
+                    status = 'completed'
+                elif message == 'error':
+                    status, error = 'failed', payload
+        finally:
+            conn.close()
+            job.process.join()
+
+        if job.cancel_requested and status != 'completed':
+            status, error = 'cancelled', None
+        elif status is None:
+            status, error = 'failed', f"プロセスが異常終了しました（終了コード={job.process.exitcode}）"
+
+        with self._lock:
+            self._running -= 1
+            self._finish(job, status, error)
+        logger.info(f"ジョブ終了: ID={job.job_id}, 状態={status}")
+        self._dispatch()
+
+    def _finish(self, job: Job, status: str, error: Optional[str] = None) -> None:
+        """ジョブを終了状態にする（self._lockを保持して呼ぶ）"""
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        job.process = None
+
+    def _prune(self) -> None:
+        """保持上限を超えたら終了済みのジョブ情報を古い順に破棄する（self._lockを保持して呼ぶ）"""
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.done]:
+            if len(self._jobs) <= self.max_jobs:
+                break
+            del self._jobs[job_id]
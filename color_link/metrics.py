@@ -0,0 +1,221 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, List, Optional, Sequence, Tuple
+
+# 処理時間（秒）のヒストグラムの既定のバケット
+DEFAULT_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    """ラベルをPrometheusのテキスト形式にする"""
+    pairs = list(zip(names, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = [(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for name, value in pairs]
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+class _Metric:
+    """ラベルの値ごとに集計値を持つメトリクスの共通部分"""
+    metric_type = ''
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """ラベルの値に対応する集計先を取得する（初回のみ作成）"""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.metric_type}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+    def _render_child(self, key, child) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(child.value)}"]
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+class Counter(_Metric):
+    """単調増加するカウンター"""
+    metric_type = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+class _GaugeChild:
+    def __init__(self):
+        self._value = 0.0
+        self._function = None
+
+    @property
+    def value(self) -> float:
+        return self._function() if self._function is not None else self._value
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """値を取得時に計算する（Q値テーブルの状態数のように都度数える必要のない値向け）"""
+        self._function = function
+
+class Gauge(_Metric):
+    """増減する現在値"""
+    metric_type = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self.labels().set_function(function)
+
+class _HistogramChild:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最後は+Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        """ブロックの処理時間（秒）を記録する"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+class Histogram(_Metric):
+    """あらかじめ決めたバケットごとの件数と合計（イベントごとの値は保持しない）"""
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def _render_child(self, key, child) -> List[str]:
+        with child._lock:
+            counts = list(child.counts)
+            total = child.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            labels = _format_labels(self.label_names, key, ('le', _format_value(bound)))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.label_names, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class Registry:
+    """メトリクスをまとめてテキスト形式で出力する"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"メトリクス名が重複しています: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help_text, label_names))
+
+    def gauge(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help_text, label_names))
+
+    def histogram(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, label_names, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+# アプリ全体で共有するレジストリとメトリクス
+REGISTRY = Registry()
+
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    'color_link_http_request_duration_seconds', 'APIリクエストの処理時間', ('route', 'method'))
+HTTP_REQUESTS = REGISTRY.counter(
+    'color_link_http_requests_total', 'APIリクエスト数', ('route', 'method', 'status'))
+DECISION_DURATION = REGISTRY.histogram(
+    'color_link_decide_next_move_seconds', 'AIの行動決定にかかった時間', ('agent',))
+FILTER_SEQUENCES_DURATION = REGISTRY.histogram(
+    'color_link_filter_sequences_seconds', 'シーケンス候補の絞り込みにかかった時間')
+CHOOSE_BEST_ACTION_DURATION = REGISTRY.histogram(
+    'color_link_choose_best_action_seconds', '最も情報量の多い行動の選択にかかった時間')
+CANDIDATE_SEQUENCES = REGISTRY.histogram(
+    'color_link_candidate_sequences', '絞り込み後のシーケンス候補数（ターン別、10ターン目以降はまとめる）', ('turn',),
+    buckets=(0, 1, 2, 5, 10, 25, 50, 125, 250, 625, 3125))
+Q_TABLE_STATES = REGISTRY.gauge(
+    'color_link_q_table_states', 'Q値テーブルの状態数', ('agent',))
+TRAINING_GAMES = REGISTRY.counter(
+    'color_link_training_games_total', 'トレーニングでプレイしたゲーム数')
+TRAINING_GAMES_PER_SECOND = REGISTRY.gauge(
+    'color_link_training_games_per_second', '実行中のトレーニングの1秒あたりのゲーム数')
+DECISION_CACHE_LOOKUPS = REGISTRY.counter(
+    'color_link_decision_cache_lookups_total', '行動スコアのキャッシュの参照数（result: memory / disk / miss）', ('result',))
+DECISION_CACHE_ENTRIES = REGISTRY.gauge(
+    'color_link_decision_cache_entries', '行動スコアのキャッシュのメモリ上の件数')
+
+def observe_candidates(turn: int, count: int) -> None:
+    """ターンごとのシーケンス候補数を記録する"""
+    CANDIDATE_SEQUENCES.labels('10+' if turn >= 10 else turn).observe(count)
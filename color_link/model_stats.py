@@ -0,0 +1,150 @@
+import sys
+import json
+import time
+import argparse
+from typing import Any, Dict, List, Optional
+
+# Q値の初期値（0.1 + 0.01未満の乱数）の範囲
+INITIAL_Q_MIN = 0.1
+INITIAL_Q_MAX = 0.11
+# 訪問回数ヒストグラムの区間の下限（最後の区間は上限なし）
+VISIT_BUCKETS = (0, 1, 2, 5, 10, 50, 100, 1000)
+
+def _visit_histogram(q_table: Dict[str, Dict[str, float]], visit_counts: Dict[str, int]) -> Dict[str, int]:
+    """状態ごとの学習回数を区間に分けて数える（'0'は行動選択で登録されただけの状態）"""
+    labels = []
+    for lower, upper in zip(VISIT_BUCKETS, VISIT_BUCKETS[1:] + (None,)):
+        if upper is None:
+            labels.append(f"{lower}+")
+        elif upper - lower == 1:
+            labels.append(str(lower))
+        else:
+            labels.append(f"{lower}-{upper - 1}")
+    histogram = dict.fromkeys(labels, 0)
+    for state_key in q_table:
+        visits = visit_counts.get(state_key, 0)
+        index = len(VISIT_BUCKETS) - 1
+        while VISIT_BUCKETS[index] > visits:
+            index -= 1
+        histogram[labels[index]] += 1
+    return histogram
+
+def q_table_stats(q_table: Dict[str, Dict[str, float]], visit_counts: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    """Q値テーブルの大きさ・メモリ使用量の概算・学習の行き届き具合を集計する
+
+    バイト数はsys.getsizeofによる概算で、テーブル（外側の辞書）・状態キー・状態ごとの辞書と
+    行動キー・Q値のオブジェクトを合計する（インターンされた文字列の共有は考慮しない）。
+    """
+    visit_counts = visit_counts or {}
+    key_bytes = 0
+    value_bytes = 0
+    entries = 0
+    initial_entries = 0
+    q_min, q_max, q_sum = float('inf'), float('-inf'), 0.0
+
+    for state_key, q_values in q_table.items():
+        key_bytes += sys.getsizeof(state_key)
+        value_bytes += sys.getsizeof(q_values)
+        for action_key, value in list(q_values.items()):
+            value_bytes += sys.getsizeof(action_key) + sys.getsizeof(value)
+            entries += 1
+            if INITIAL_Q_MIN <= value < INITIAL_Q_MAX:
+                initial_entries += 1
+            q_min = min(q_min, value)
+            q_max = max(q_max, value)
+            q_sum += value
+
+    table_bytes = sys.getsizeof(q_table)
+    learned_states = sum(1 for state_key in q_table if visit_counts.get(state_key, 0) > 0)
+    revisited_states = sum(1 for state_key in q_table if visit_counts.get(state_key, 0) > 1)
+    return {
+        'states': len(q_table),
+        'entries': entries,
+        'bytes': {
+            'table': table_bytes,
+            'keys': key_bytes,
+            'values': value_bytes,
+            'total': table_bytes + key_bytes + value_bytes
+        },
+        'visits': {
+            'histogram': _visit_histogram(q_table, visit_counts),
+            'learnedStates': learned_states,
+            'revisitedStates': revisited_states,
+            'neverRevisitedStates': len(q_table) - revisited_states
+        },
+        'initialEntries': initial_entries,
+        'initialFraction': initial_entries / entries if entries else 0.0,
+        'qValues': {
+            'min': q_min if entries else None,
+            'max': q_max if entries else None,
+            'mean': q_sum / entries if entries else None
+        }
+    }
+
+class GrowthTracker:
+    """トレーニング中の状態数の推移を記録する（上限を超えたら間引いて一定の点数に保つ）"""
+
+    def __init__(self, max_samples: int = 200):
+        self.max_samples = max_samples
+        self.samples = []  # [ゲーム数, 状態数, 経過秒数]
+        self._started_at = time.monotonic()
+        self._stride = 1  # 何ゲームごとに記録するか（間引くたびに倍にする）
+
+    def record(self, games_played: int, states: int) -> None:
+        if self.samples and games_played % self._stride != 0:
+            return
+        self.samples.append([games_played, states, round(time.monotonic() - self._started_at, 3)])
+        if len(self.samples) > self.max_samples:
+            # 1点おきに間引き、以後の記録間隔も倍にする
+            self.samples = self.samples[::2]
+            self._stride *= 2
+
+    def summary(self) -> Dict[str, Any]:
+        """推移と増加率（記録の最初と最後から計算）"""
+        states_per_game = None
+        states_per_second = None
+        if len(self.samples) >= 2:
+            (first_games, first_states, first_time), (last_games, last_states, last_time) = self.samples[0], self.samples[-1]
+            if last_games > first_games:
+                states_per_game = (last_states - first_states) / (last_games - first_games)
+            if last_time > first_time:
+                states_per_second = (last_states - first_states) / (last_time - first_time)
+        return {
+            'samples': self.samples,
+            'statesPerGame': states_per_game,
+            'statesPerSecond': states_per_second
+        }
+
+def _format_report(stats: Dict[str, Any]) -> List[str]:
+    """コマンドライン用の表示"""
+    lines = [
+        f"状態数: {stats['states']} （エントリ数: {stats['entries']}）",
+        f"メモリ使用量（概算）: 合計 {stats['bytes']['total'] / 1024:.1f} KiB "
+        f"（キー {stats['bytes']['keys'] / 1024:.1f} KiB, 値 {stats['bytes']['values'] / 1024:.1f} KiB）",
+        f"初期値のままのエントリ: {stats['initialEntries']} （{stats['initialFraction'] * 100:.1f}%）",
+        f"再訪問されていない状態: {stats['visits']['neverRevisitedStates']}",
+        "学習回数の分布:"
+    ]
+    for label, count in stats['visits']['histogram'].items():
+        lines.append(f"  {label:>8}: {count}")
+    return lines
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """保存済みのQ値テーブルを集計して表示する"""
+    from color_link.agents.rl_agent import RLAgent
+
+    parser = argparse.ArgumentParser(description='Q値テーブルの統計を表示')
+    parser.add_argument('path', nargs='?', default=None, help='Q値テーブルのファイル（省略時は既定の保存先）')
+    parser.add_argument('--json', action='store_true', help='JSON形式で出力')
+    args = parser.parse_args(argv)
+
+    agent = RLAgent()
+    agent.load_q_table(args.path)
+    stats = q_table_stats(agent.q_table, agent.visit_counts)
+    if args.json:
+        print(json.dumps(stats, ensure_ascii=False, indent=2))
+    else:
+        print('\n'.join(_format_report(stats)))
+
+if __name__ == '__main__':
+    main()
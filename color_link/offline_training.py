@@ -0,0 +1,254 @@
+"""記録済みのゲームからのオフラインQ学習
+
+ゲーム記録（game_log）やルールベースエージェントのシミュレーションから遷移
+（状態キー, 行動, 報酬, 次の状態キー, 終了）を取り出し、固定したデータに対して
+エポックごとに全遷移のQ値をまとめて更新する（learning_rate=1で fitted Q iteration）。
+ゲームを再シミュレーションせずに何エポックでも回せるため、オンライン学習（train_agent）より安く済む。
+
+状態キーと報酬はRLAgentの_get_state_key / calculate_rewardでオンライン学習と同じ順に求めるので、
+結果は既存のQ値テーブル（{状態キー: {"color:column": Q値}}）の形式でそのまま保存・利用できる。
+
+使い方:
+    python -m color_link.offline_training games.clgl --epochs 50 --output q_table.json
+    python -m color_link.offline_training --simulate 1000 --seed 1  # ルールベースのプレイから学習
+"""
+import sys
+import time
+import logging
+import argparse
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from color_link.agents.action_space import NUM_ACTIONS, action_index, action_key
+from color_link.agents.rl_agent import RLAgent
+from color_link.agents.rule_based_agent import RuleBasedAgent
+from color_link.game.color_link import ColorLinkGame
+from color_link.game.game_log import GameRecord, read_games, record_from_game
+from color_link.rng import RandomLike, resolve_rng
+
+logger = logging.getLogger(__name__)
+
+# RLAgent.learnがHITごとにQ値へ直接加える値
+LEARN_HIT_BONUS = 0.05
+# オンライン学習で初めての状態・行動に設定されるQ値
+INITIAL_Q_VALUE = 0.1
+
+def simulate_rule_games(num_games: int, sequence_length: int = 3, rng: RandomLike = None) -> Iterator[GameRecord]:
+    """ルールベースエージェントにゲームをプレイさせ、1ゲームずつ記録を返す"""
+    rng = resolve_rng(rng)
+    agent = RuleBasedAgent(rng=rng)
+    for _ in range(num_games):
+        game = ColorLinkGame(rng=rng)
+        game.new_game(sequence_length)
+        while not game.game_over:
+            action = agent.decide_next_move(game.get_state())
+            game.make_move(action['color'], action['column'])
+        yield record_from_game(game, 'rule')
+
+def record_transitions(record: GameRecord, agent: RLAgent) -> Iterator[Tuple[str, int, float, str, bool]]:
+    """記録を再現しながら遷移 (状態キー, 行動インデックス, 報酬, 次の状態キー, 終了) を返す
+
+    報酬にはlearnがHITごとにQ値へ加えるボーナスを、同じ固定点になるよう学習率で割って含める。
+    """
+    hit_bonus = LEARN_HIT_BONUS / agent.learning_rate
+    agent.reset_episode()
+    game = ColorLinkGame()
+    game.max_turns = record.max_turns
+    game.new_game(record.sequence_length, board_colors=record.initial_board, target_sequence=record.target)
+
+    state_key = agent._get_state_key(game.get_state())
+    for color, column, hits, blows in record.moves:
+        game.make_move(color, column)
+        last_move = game.history[-1]
+        if (last_move['hits'], last_move['blows']) != (hits, blows):
+            raise ValueError(f"記録と再現したゲームの結果が一致しません（{len(game.history)}手目）")
+        new_state = game.get_state()
+        reward = agent.calculate_reward(new_state) + hit_bonus * hits
+        next_key = agent._get_state_key(new_state)
+        yield state_key, action_index(color, column), reward, next_key, game.game_over
+        state_key = next_key
+
+class TransitionDataset:
+    """遷移を状態インデックスの配列として溜める（状態キーは一度だけ保持する）"""
+
+    def __init__(self):
+        self.state_keys: List[str] = []
+        self._state_index: Dict[str, int] = {}
+        self._states = array('i')
+        self._actions = array('b')
+        self._rewards = array('d')
+        self._next_states = array('i')
+        self._done = array('b')
+        self.games = 0
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def _index(self, state_key: str) -> int:
+        index = self._state_index.get(state_key)
+        if index is None:
+            index = self._state_index[state_key] = len(self.state_keys)
+            self.state_keys.append(state_key)
+        return index
+
+    def add(self, state_key: str, action: int, reward: float, next_key: str, done: bool) -> None:
+        self._states.append(self._index(state_key))
+        self._actions.append(action)
+        self._rewards.append(reward)
+        self._next_states.append(self._index(next_key))
+        self._done.append(done)
+
+    def add_record(self, record: GameRecord, agent: RLAgent) -> None:
+        """1ゲーム分の遷移を追加する（agentは状態キーと報酬の計算に使う）"""
+        for transition in record_transitions(record, agent):
+            self.add(*transition)
+        self.games += 1
+
+    def extend(self, records: Iterable[GameRecord], agent: RLAgent) -> None:
+        """記録を1ゲームずつ読みながら遷移を追加する"""
+        for record in records:
+            self.add_record(record, agent)
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """(状態, 行動, 報酬, 次の状態, 終了) のnumpy配列"""
+        return (np.frombuffer(self._states, dtype=np.int32),
+                np.frombuffer(self._actions, dtype=np.int8).astype(np.intp),
+                np.frombuffer(self._rewards, dtype=np.float64),
+                np.frombuffer(self._next_states, dtype=np.int32),
+                np.frombuffer(self._done, dtype=np.int8).astype(bool))
+
+def fit_q_values(dataset: TransitionDataset, q: np.ndarray, known: np.ndarray,
+                 epochs: int = 50, discount_factor: float = 0.9, learning_rate: float = 1.0,
+                 tolerance: float = 1e-6) -> Tuple[int, float]:
+    """固定した遷移に対してQ値 (状態数, 25) を繰り返し更新する（qとknownはその場で書き換える）
+
+    エポックごとに全遷移の目標値 r + γ·max Q(s') を求め、同じ状態・行動の目標値の平均に
+    learning_rateの割合だけ近づける。max Q(s') はknownがTrueの行動だけで取り、
+    1つもなければ0とする（オンライン学習でテーブルに状態がない場合と同じ）。
+
+    Returns:
+        (実行したエポック数, 最後のエポックでのQ値の最大変化量)
+    """
+    states, actions, rewards, next_states, done = dataset.arrays()
+    pairs = states * NUM_ACTIONS + actions
+    counts = np.bincount(pairs, minlength=q.size)
+    visited = counts > 0
+    known |= visited.reshape(q.shape)
+    has_known = known.any(axis=1)
+    bootstrap = discount_factor * ~done
+    flat_q = q.reshape(-1)
+
+    max_delta = 0.0
+    epoch = 0
+    for epoch in range(1, epochs + 1):
+        max_next = np.where(known, q, -np.inf).max(axis=1)
+        max_next[~has_known] = 0.0
+        targets = rewards + bootstrap * max_next[next_states]
+        mean_targets = np.bincount(pairs, weights=targets, minlength=q.size)[visited] / counts[visited]
+        delta = learning_rate * (mean_targets - flat_q[visited])
+        flat_q[visited] += delta
+        max_delta = float(np.abs(delta).max()) if delta.size else 0.0
+        logger.debug("オフライン学習: エポック%d, 最大変化量=%.6f", epoch, max_delta)
+        if max_delta < tolerance:
+            break
+    return epoch, max_delta
+
+def train_offline(records: Iterable[GameRecord], agent: Optional[RLAgent] = None,
+                  epochs: int = 50, learning_rate: float = 1.0,
+                  discount_factor: Optional[float] = None, tolerance: float = 1e-6) -> Dict[str, Any]:
+    """記録したゲームからQ値を学習し、agentのQ値テーブルに書き込む
+
+    agentのテーブルにすでにある値は初期値として使い、データにない状態・行動はそのまま残す。
+
+    Args:
+        records: 学習に使うゲーム記録（read_gamesやsimulate_rule_gamesのように1件ずつ渡せばよい）
+        agent: 書き込み先のエージェント（省略時は新しく作成）
+        epochs: 最大エポック数
+        learning_rate: エポックごとに目標値へ近づける割合（1なら目標値で置き換える）
+        discount_factor: 割引率（省略時はagentの割引率）
+        tolerance: Q値の最大変化量がこれを下回ったら打ち切る
+    Returns:
+        統計（ゲーム数・遷移数・状態数・エポック数・最大変化量・所要時間）
+    """
+    if agent is None:
+        agent = RLAgent()
+    if discount_factor is None:
+        discount_factor = agent.discount_factor
+
+    start = time.perf_counter()
+    dataset = TransitionDataset()
+    dataset.extend(records, agent)
+    collect_seconds = time.perf_counter() - start
+
+    # 既存のQ値を初期値にする
+    num_states = len(dataset.state_keys)
+    q = np.full((num_states, NUM_ACTIONS), INITIAL_Q_VALUE)
+    known = np.zeros((num_states, NUM_ACTIONS), dtype=bool)
+    for i, state_key in enumerate(dataset.state_keys):
+        for key, value in agent.q_table.get(state_key, {}).items():
+            color, column = key.split(':')
+            a = action_index(color, int(column))
+            q[i, a] = value
+            known[i, a] = True
+
+    epochs_run, max_delta = fit_q_values(dataset, q, known, epochs, discount_factor, learning_rate, tolerance)
+
+    # 学習した状態・行動だけをテーブルに書き戻す
+    states, actions = dataset.arrays()[:2]
+    pair_counts = np.bincount(states * NUM_ACTIONS + actions, minlength=q.size).reshape(q.shape)
+    for i, a in zip(*np.nonzero(pair_counts)):
+        agent.q_table.setdefault(dataset.state_keys[i], {})[action_key(a)] = float(q[i, a])
+    state_counts = pair_counts.sum(axis=1)
+    for i in np.flatnonzero(state_counts):
+        state_key = dataset.state_keys[i]
+        agent.visit_counts[state_key] = agent.visit_counts.get(state_key, 0) + int(state_counts[i])
+
+    stats = {
+        'games': dataset.games,
+        'transitions': len(dataset),
+        'states': num_states,
+        'epochs': epochs_run,
+        'maxDelta': max_delta,
+        'collectSeconds': collect_seconds,
+        'fitSeconds': time.perf_counter() - start - collect_seconds
+    }
+    logger.info(f"オフライン学習完了: {stats['games']}ゲーム, {stats['transitions']}遷移, "
+                f"{stats['states']}状態, {stats['epochs']}エポック")
+    return stats
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='記録したゲームからQ値テーブルを学習')
+    parser.add_argument('logs', nargs='*', help='ゲーム記録のファイル')
+    parser.add_argument('--simulate', type=int, default=0, help='ルールベースエージェントにプレイさせるゲーム数')
+    parser.add_argument('--sequence-length', type=int, default=3, help='シミュレーションのシーケンス長')
+    parser.add_argument('--seed', type=int, default=None, help='シミュレーションの乱数シード')
+    parser.add_argument('--epochs', type=int, default=50, help='最大エポック数')
+    parser.add_argument('--learning-rate', type=float, default=1.0, help='エポックごとの更新の割合')
+    parser.add_argument('--discount', type=float, default=None, help='割引率（省略時はRLAgentの既定値）')
+    parser.add_argument('--init', default=None, help='初期値にするQ値テーブル（省略時は空から学習）')
+    parser.add_argument('--output', default=None, help='Q値テーブルの保存先（省略時は既定の保存先）')
+    args = parser.parse_args(argv)
+
+    if not args.logs and not args.simulate:
+        parser.error('ゲーム記録のファイルか--simulateを指定してください')
+
+    def records():
+        for path in args.logs:
+            yield from read_games(path)
+        if args.simulate:
+            yield from simulate_rule_games(args.simulate, args.sequence_length, args.seed)
+
+    agent = RLAgent()
+    if args.init:
+        agent.load_q_table(args.init)
+    stats = train_offline(records(), agent, epochs=args.epochs, learning_rate=args.learning_rate,
+                          discount_factor=args.discount)
+    agent.save_q_table(args.output)
+
+    print(f"{stats['games']}ゲーム, {stats['transitions']}遷移, {stats['states']}状態")
+    print(f"{stats['epochs']}エポック (最大変化量={stats['maxDelta']:.6f}), "
+          f"遷移の収集={stats['collectSeconds']:.2f}秒, 学習={stats['fitSeconds']:.2f}秒")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
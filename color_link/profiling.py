@@ -0,0 +1,170 @@
+import os
+import io
+import json
+import time
+import marshal
+import pstats
+import cProfile
+import threading
+import functools
+from collections import deque
+from typing import Any, Dict, Optional
+
+class DecisionProfiler:
+    """エージェントの行動決定・学習ごとのトレースとcProfileの集計（無効時はフラグの確認のみ）
+
+    トレースは上限付きのリングバッファに保持し、古いものから捨てる。1件のトレースには
+    シーケンス候補数の変化・評価した行動数・選んだ行動・処理ごとの時間が入る。
+    """
+
+    def __init__(self, enabled: bool = False, use_cprofile: bool = False, capacity: int = 1000):
+        self.enabled = enabled
+        self.use_cprofile = use_cprofile
+        self.traces = deque(maxlen=capacity)
+        self._stats = None  # 集計済みのpstats.Stats
+        self._sequence = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()  # スレッドごとの実行中のトレース
+
+    def configure(self, enabled: Optional[bool] = None, use_cprofile: Optional[bool] = None,
+                  capacity: Optional[int] = None) -> None:
+        with self._lock:
+            if enabled is not None:
+                self.enabled = enabled
+            if use_cprofile is not None:
+                self.use_cprofile = use_cprofile
+            if capacity is not None and capacity != self.traces.maxlen:
+                self.traces = deque(self.traces, maxlen=capacity)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.traces.clear()
+            self._stats = None
+            self._sequence = 0
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'cprofile': self.use_cprofile,
+                'traces': len(self.traces),
+                'capacity': self.traces.maxlen,
+                'profiledCalls': self._stats.total_calls if self._stats is not None else 0
+            }
+
+    def run(self, phase: str, func, agent, args, kwargs):
+        """計測しながらメソッドを実行する
+
+        トレース中でなければ decide_next_move / learn が新しいトレースを開始し、
+        それ以外のメソッドは実行中のトレースに処理時間を加算する。
+        """
+        trace = getattr(self._local, 'trace', None)
+        if trace is None:
+            if phase not in ('decide_next_move', 'learn'):
+                return func(agent, *args, **kwargs)
+            return self._run_traced(phase, func, agent, args, kwargs)
+
+        start = time.perf_counter()
+        try:
+            return func(agent, *args, **kwargs)
+        finally:
+            entry = trace['phases'].setdefault(phase, {'ms': 0.0, 'calls': 0})
+            entry['ms'] += (time.perf_counter() - start) * 1000
+            entry['calls'] += 1
+
+    def _run_traced(self, phase: str, func, agent, args, kwargs):
+        candidates = getattr(agent, 'possible_sequences', None)
+        trace = {
+            'kind': phase,
+            'agent': type(agent).__name__,
+            'timestamp': time.time(),
+            'candidatesBefore': len(candidates) if candidates is not None else None,
+            'phases': {}
+        }
+        if args and isinstance(args[0], dict) and 'history' in args[0]:
+            trace['turn'] = len(args[0]['history'])
+
+        profile = None
+        if self.use_cprofile:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:  # 他のプロファイラが動作中
+                profile = None
+
+        self._local.trace = trace
+        start = time.perf_counter()
+        result = None
+        try:
+            result = func(agent, *args, **kwargs)
+            return result
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if profile is not None:
+                profile.disable()
+            self._local.trace = None
+
+            candidates = getattr(agent, 'possible_sequences', None)
+            trace['candidatesAfter'] = len(candidates) if candidates is not None else None
+            trace['ms'] = elapsed_ms
+            # キャッシュを使う場合も含め、情報量を計算した行動の数
+            trace['actionsScored'] = trace['phases'].get('_information_score', {}).get('calls', 0)
+            if phase == 'decide_next_move' and isinstance(result, dict):
+                trace['action'] = {'color': result.get('color'), 'column': result.get('column')}
+            self._record(trace, profile)
+
+    def _record(self, trace: Dict[str, Any], profile: Optional[cProfile.Profile]) -> None:
+        with self._lock:
+            self._sequence += 1
+            trace['seq'] = self._sequence
+            self.traces.append(trace)
+            if profile is not None:
+                if self._stats is None:
+                    self._stats = pstats.Stats(profile)
+                else:
+                    self._stats.add(profile)
+
+    def export_jsonl(self) -> str:
+        """トレースをJSON Lines形式で出力する"""
+        with self._lock:
+            traces = list(self.traces)
+        return ''.join(json.dumps(trace, ensure_ascii=False) + '\n' for trace in traces)
+
+    def export_pstats(self) -> Optional[bytes]:
+        """集計したプロファイルをpstatsのファイル形式（pstats.Stats(path)で読める）で出力する"""
+        with self._lock:
+            if self._stats is None:
+                return None
+            return marshal.dumps(self._stats.stats)
+
+    def summary_text(self, limit: int = 30) -> Optional[str]:
+        """累積時間順の上位の関数（確認用のテキスト）"""
+        with self._lock:
+            if self._stats is None:
+                return None
+            stream = io.StringIO()
+            self._stats.stream = stream
+            self._stats.sort_stats('cumulative').print_stats(limit)
+            return stream.getvalue()
+
+def _profiler_from_env() -> DecisionProfiler:
+    """COLOR_LINK_PROFILE=trace（トレースのみ）または cprofile（cProfileも使う）で起動時から有効にする"""
+    mode = os.environ.get('COLOR_LINK_PROFILE', '').lower()
+    return DecisionProfiler(
+        enabled=mode in ('1', 'trace', 'cprofile'),
+        use_cprofile=mode == 'cprofile',
+        capacity=int(os.environ.get('COLOR_LINK_PROFILE_BUFFER', 1000))
+    )
+
+PROFILER = _profiler_from_env()
+
+def profiled(phase: str):
+    """エージェントのメソッドを計測対象にするデコレータ"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if not PROFILER.enabled:
+                return func(self, *args, **kwargs)
+            return PROFILER.run(phase, func, self, args, kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,48 @@
+"""ゲームとエージェントが使う乱数生成器
+
+ゲームとエージェントは `rng` 引数で乱数生成器を受け取る。
+- 省略（None）またはrandomモジュール: グローバルな random モジュールを使う（random.seed で全体を固定する従来の動作）
+- int: そのシードで作った random.Random
+- random.Random: そのまま使う（複数のオブジェクトで共有すると1つの乱数列を順に消費する）
+- numpy.random.Generator: そこから取り出したシードで作った random.Random
+
+並列のシミュレーションではゲーム・エージェントごとに別の乱数生成器を渡すことで互いに干渉せず、
+同じシードなら実行順序やプロセス数によらず同じ結果になる。
+"""
+import random
+from typing import Any, List, Optional, Union
+import numpy as np
+
+RandomLike = Union[None, int, random.Random, np.random.Generator]
+
+def resolve_rng(rng: RandomLike = None):
+    """rng引数を random.Random と同じメソッドを持つ乱数生成器に変換する"""
+    if rng is None or rng is random:
+        return random
+    if isinstance(rng, random.Random):
+        return rng
+    if isinstance(rng, np.random.Generator):
+        return random.Random(int(rng.integers(2 ** 63)))
+    if isinstance(rng, (int, np.integer)):
+        return random.Random(int(rng))
+    raise TypeError(f"乱数生成器として使えない値です: {rng!r}")
+
+def derive_seed(seed: int, *keys: int) -> int:
+    """親のシードとインデックス（ゲーム番号・ワーカー番号など）から子のシードを決定的に求める
+
+    numpy.random.SeedSequence で混ぜるので、seed + i のように隣り合うシードの乱数列が似ることがない。
+    """
+    sequence = np.random.SeedSequence(int(seed), spawn_key=tuple(int(key) for key in keys))
+    return int(sequence.generate_state(1, dtype=np.uint64)[0] >> 1)
+
+def get_rng_state(rng) -> Optional[List[Any]]:
+    """乱数生成器の状態をJSONで保存できる形で取得する（グローバルな random モジュールはNone）"""
+    if not isinstance(rng, random.Random):
+        return None
+    version, internal_state, gauss_next = rng.getstate()
+    return [version, list(internal_state), gauss_next]
+
+def set_rng_state(rng, state: List[Any]) -> None:
+    """get_rng_stateで取得した状態を復元する"""
+    version, internal_state, gauss_next = state
+    rng.setstate((version, tuple(internal_state), gauss_next))
@@ -0,0 +1,91 @@
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+from color_link.game.color_link import ColorLinkGame
+
+logger = logging.getLogger(__name__)
+
+class GameSession:
+    """1セッション（ブラウザのタブやユーザー）ごとのゲームとAIエージェント"""
+
+    def __init__(self, session_id: str, agent_factory: Callable[[str], Any]):
+        self.session_id = session_id
+        self.game = ColorLinkGame()
+        self.lock = threading.RLock()  # セッション単位のロック（他セッションをブロックしない）
+        self.last_access = time.monotonic()
+        self.current_agent_type = None
+        self._agent_factory = agent_factory
+        self._agents = {}  # AIタイプ -> エージェント（必要になった時点で生成）
+
+    def get_agent(self, ai_type: str) -> Any:
+        """指定タイプのエージェントを取得（未生成なら生成）"""
+        if ai_type not in self._agents:
+            self._agents[ai_type] = self._agent_factory(ai_type)
+        return self._agents[ai_type]
+
+    def select_agent(self, ai_type: Optional[str]) -> Any:
+        """使用するAIエージェントを切り替える（Noneまたは未知のタイプならAIなし）"""
+        agent = self.get_agent(ai_type) if ai_type in ('rule', 'rl', 'hybrid') else None
+        self.current_agent_type = ai_type if agent is not None else None
+        return agent
+
+    @property
+    def current_agent(self) -> Any:
+        """現在使用中のAIエージェント"""
+        if self.current_agent_type is None:
+            return None
+        return self.get_agent(self.current_agent_type)
+
+class SessionManager:
+    """セッションIDごとにGameSessionを管理し、一定時間使われないセッションを破棄する"""
+
+    def __init__(self, agent_factory: Callable[[str], Any], ttl_seconds: float = 1800, max_sessions: int = 1000):
+        """
+        Args:
+            agent_factory: AIタイプ（'rule'/'rl'/'hybrid'）からエージェントを生成する関数
+            ttl_seconds: 最終アクセスからセッションを破棄するまでの秒数
+            max_sessions: 同時に保持するセッションの上限（超えた場合は最も古いものから破棄）
+        """
+        self.agent_factory = agent_factory
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()  # 最終アクセスが古い順
+        self._lock = threading.Lock()  # セッション表の操作だけを保護する
+
+    def get(self, session_id: str) -> GameSession:
+        """セッションを取得（存在しなければ作成）し、最終アクセス時刻を更新する"""
+        now = time.monotonic()
+        with self._lock:
+            game_session = self._sessions.get(session_id)
+            if game_session is None:
+                game_session = GameSession(session_id, self.agent_factory)
+                self._sessions[session_id] = game_session
+                logger.info(f"セッションを作成: {session_id}, セッション数={len(self._sessions)}")
+            else:
+                self._sessions.move_to_end(session_id)
+            game_session.last_access = now
+            self._evict(now)
+        return game_session
+
+    def remove(self, session_id: str) -> None:
+        """セッションを破棄する"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def _evict(self, now: float) -> None:
+        """期限切れと上限超過のセッションを古い順に破棄する（self._lockを保持して呼ぶ）"""
+        while self._sessions:
+            oldest_id, oldest = next(iter(self._sessions.items()))
+            expired = now - oldest.last_access > self.ttl_seconds
+            if not expired and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[oldest_id]
+            logger.info(f"セッションを破棄: {oldest_id}, 理由={'期限切れ' if expired else '上限超過'}")
@@ -1,15 +1,20 @@
 document.addEventListener('DOMContentLoaded', () => {
     // ゲーム状態
     let gameState = null;
+    let stateToken = null;  // ステートレスモードでサーバーから受け取る状態トークン
     let selectedColor = 'red';
     let aiEnabled = false;
     let aiType = 'none';
     let aiDelay = 1000;
     let aiInterval = null;
+    let autoplayRun = 0;            // 自動プレイの世代（停止後に届いた古い応答を見分ける）
+    let autoplayMoves = [];         // 表示待ちのAIの手 [色, 列, HIT, BLOW]
+    let autoplayFinalState = null;  // サーバー側で指し終えた後のゲーム状態
     let learningMode = false;
     let debugMode = false;
     let gameMode = 'normal'; // 'normal', 'eval', 'train'
-    let trainInterval = null;
+    let trainEventSource = null;  // トレーニング進捗のSSE接続
+    let serverTrainingStats = {};  // SSEで受け取った差分を積み上げたトレーニング統計
     const aiIntervalDelay = 1000;
     
     // 評価モードの状態
@@ -230,10 +235,10 @@ document.addEventListener('DOMContentLoaded', () => {
             aiDelay = parseInt(e.target.value);
             delayValue.textContent = (aiDelay / 1000).toFixed(1) + '秒';
             
-            // 自動プレイ中なら再開
+            // 自動プレイ中なら表示間隔だけ変更する
             if (aiInterval) {
-                stopAIAutoPlay();
-                startAIAutoPlay();
+                clearInterval(aiInterval);
+                aiInterval = setInterval(stepAIAutoPlay, aiDelay);
             }
         });
         
@@ -296,7 +301,10 @@ document.addEventListener('DOMContentLoaded', () => {
     
     // 新しいゲームを開始
     function startNewGame() {
-        // 必ず自動プレイを停止
+        // 必ず自動プレイを停止（表示待ちの手は破棄）
+        autoplayRun++;
+        autoplayFinalState = null;
+        autoplayMoves = [];
         stopAIAutoPlay();
         
         const sequenceLength = parseInt(sequenceLengthSelect.value);
@@ -318,6 +326,7 @@ document.addEventListener('DOMContentLoaded', () => {
         .then(response => response.json())
         .then(data => {
             gameState = data.game_state;
+            stateToken = data.stateToken || null;
             
             // UIの更新
             renderGameBoard();
@@ -451,11 +460,35 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
     
+    // ステートレスモードの状態トークンをクエリ文字列に付ける
+    function stateTokenParam() {
+        return stateToken ? `&stateToken=${encodeURIComponent(stateToken)}` : '';
+    }
+    
     // メッセージの表示
     function showMessage(message) {
         messageBox.textContent = message;
     }
     
+    // レスポンスのゲーム状態を反映（差分ならローカルの状態に適用し、全体なら置き換える）
+    function applyStateResponse(data) {
+        if (!data.delta) {
+            gameState = data.game_state;
+            return;
+        }
+        
+        const delta = data.delta;
+        delta.columnColors.forEach((color, row) => {
+            gameState.board[row][delta.column].color = color;
+        });
+        gameState.history.push(delta.historyEntry);
+        gameState.gameOver = delta.gameOver;
+        gameState.winner = delta.winner;
+        gameState.targetSequence = delta.targetSequence;
+        gameState.currentTurn = delta.currentTurn;
+        gameState.version = delta.version;
+    }
+    
     // プレイヤーの移動
     function makeMove(color, column) {
         if (!gameState || gameState.gameOver) return;
@@ -472,7 +505,10 @@ document.addEventListener('DOMContentLoaded', () => {
             body: JSON.stringify({
                 color: color,
                 column: column,
-                debugMode: debugMode
+                debugMode: debugMode,
+                stateToken: stateToken,
+                delta: true,
+                version: gameState.version
             })
         })
         .then(response => response.json())
@@ -482,7 +518,8 @@ document.addEventListener('DOMContentLoaded', () => {
                 return;
             }
             
-            gameState = data.game_state;
+            applyStateResponse(data);
+            stateToken = data.stateToken || null;
             
             // UIの更新
             renderGameBoard();
@@ -537,6 +574,8 @@ document.addEventListener('DOMContentLoaded', () => {
     }
     
     // AI自動プレイの開始
+    // サーバー側で最後まで（または上限手数まで）1リクエストで指し、返ってきた手を
+    // aiDelay間隔で順に表示する
     function startAIAutoPlay() {
         if (aiInterval) {
             clearInterval(aiInterval);
@@ -544,13 +583,88 @@ document.addEventListener('DOMContentLoaded', () => {
         
         if (!aiEnabled || !gameState || gameState.gameOver) return;
         
-        aiInterval = setInterval(() => {
-            if (gameState && !gameState.gameOver) {
-                makeAIMove();
-            } else {
+        const run = ++autoplayRun;
+        autoplayMoves = [];
+        autoplayFinalState = null;
+        aiInterval = setInterval(stepAIAutoPlay, aiDelay);
+        
+        // 思考時間は1手あたり行動間隔の8割までに制限
+        const budgetMs = Math.floor(aiDelay * 0.8);
+        fetch('/api/ai_autoplay', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                debugMode: debugMode,
+                budgetMs: budgetMs,
+                stateToken: stateToken
+            })
+        })
+        .then(response => response.json())
+        .then(data => {
+            // 新しいゲームの開始などで破棄された自動プレイの応答は無視
+            if (run !== autoplayRun) return;
+            
+            if (data.error) {
+                showMessage(data.error);
+                stopAIAutoPlay();
+                return;
+            }
+            
+            console.log(`AI自動プレイ: ${data.moves.length}手, 思考時間合計=${data.decisionMs}ms`);
+            stateToken = data.stateToken || null;
+            autoplayMoves = data.moves;
+            autoplayFinalState = data.game_state;
+            
+            // 応答待ちの間に停止された場合は最終状態に揃える
+            if (!aiInterval) {
                 stopAIAutoPlay();
             }
-        }, aiDelay);
+        })
+        .catch(error => {
+            console.error('AI自動プレイ中にエラーが発生しました:', error);
+            showMessage('AI行動中にエラーが発生しました。');
+            stopAIAutoPlay();
+        });
+    }
+    
+    // AI自動プレイの1手分を表示
+    function stepAIAutoPlay() {
+        // サーバーの応答待ち
+        if (!autoplayFinalState) return;
+        
+        if (autoplayMoves.length === 0) {
+            stopAIAutoPlay();
+            return;
+        }
+        
+        const [color, column, hits, blows] = autoplayMoves.shift();
+        applyMoveLocally(color, column, hits, blows);
+        
+        renderGameBoard();
+        renderHistory();
+        
+        const currentTurn = gameState.history.length;
+        const maxTurns = gameState.maxTurns || 12;
+        const colorName = {
+            'red': '赤',
+            'blue': '青',
+            'yellow': '黄',
+            'green': '緑',
+            'purple': '紫'
+        }[color];
+        showMessage(`AIは ${colorName} を列${column + 1}に挿入しました。結果: ${hits} HIT / ${blows} BLOW (${currentTurn}/${maxTurns}ターン)`);
+    }
+    
+    // サーバーから受け取った手をローカルの盤面に反映する（列を1つ下にずらして先頭に挿入）
+    function applyMoveLocally(color, column, hits, blows) {
+        for (let row = gameState.board.length - 1; row > 0; row--) {
+            gameState.board[row][column].color = gameState.board[row - 1][column].color;
+        }
+        gameState.board[0][column].color = color;
+        gameState.history.push({ color: color, column: column, hits: hits, blows: blows });
+        gameState.currentTurn = gameState.history.length;
     }
     
     // AI自動プレイの停止
@@ -564,6 +678,27 @@ document.addEventListener('DOMContentLoaded', () => {
                 aiMoveBtn.textContent = 'AI行動';
             }
         }
+        
+        // サーバー側では既に指し終えているため、表示を最終状態に揃える
+        if (autoplayFinalState) {
+            gameState = autoplayFinalState;
+            autoplayFinalState = null;
+            autoplayMoves = [];
+            
+            renderGameBoard();
+            renderHistory();
+            updateTargetSequence();
+            
+            if (gameState.gameOver) {
+                const currentTurn = gameState.currentTurn || gameState.history.length;
+                if (gameState.winner) {
+                    showMessage(`AIが正解を見つけました！(${currentTurn}ターン)`);
+                } else {
+                    showMessage(`ゲームオーバー。AIは正解を見つけられませんでした。(${gameState.maxTurns}ターン)`);
+                }
+                aiMoveBtn.disabled = true;
+            }
+        }
     }
     
     // AI移動
@@ -581,8 +716,9 @@ document.addEventListener('DOMContentLoaded', () => {
         // ボタンを一時的に無効化
         aiMoveBtn.disabled = true;
         
-        // APIリクエスト
-        fetch(`/api/ai_move?debugMode=${debugMode}`)
+        // APIリクエスト（思考時間は行動間隔の8割までに制限）
+        const budgetMs = Math.floor(aiDelay * 0.8);
+        fetch(`/api/ai_move?debugMode=${debugMode}&budgetMs=${budgetMs}&delta=true&version=${gameState.version}${stateTokenParam()}`)
             .then(response => {
                 console.log('AI行動のレスポンスを受信:', response.status);
                 return response.json();
@@ -595,7 +731,8 @@ document.addEventListener('DOMContentLoaded', () => {
                     return;
                 }
                 
-                gameState = data.game_state;
+                applyStateResponse(data);
+                stateToken = data.stateToken || null;
                 
                 // UIの更新
                 renderGameBoard();
@@ -656,7 +793,8 @@ document.addEventListener('DOMContentLoaded', () => {
             completedGames: 0,
             currentAgentIndex: 0,
             agents: [],
-            isRunning: true
+            isRunning: true,
+            jobId: null  // 実行中のサーバー側評価ジョブ
         };
         
         // 選択されたエージェントを設定
@@ -713,124 +851,93 @@ document.addEventListener('DOMContentLoaded', () => {
         runEvaluationGame();
     }
     
-    // 評価ゲームの実行
+    // 評価ゲームの実行（サーバー側のワーカープロセスで一括実行し、進捗をストリームで受け取る）
     function runEvaluationGame() {
         if (!evalStats.isRunning) return;
         
         // 現在のエージェント情報
         const currentAgent = evalStats.agents[evalStats.currentAgentIndex];
         
-        // 新しいゲームのパラメータ設定
+        // 評価のパラメータ設定
         const sequenceLength = parseInt(evalSeqLengthSelect.value);
         
-        // AIタイプを現在のエージェントに合わせる
-        aiType = currentAgent.type;
-        
-        fetch('/api/new_game', {
+        fetch('/api/evaluate', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
             },
             body: JSON.stringify({
-                sequenceLength: sequenceLength,
-                aiType: aiType,
-                learningMode: false,
-                debugMode: true,
-                gameMode: 'eval'
+                agentType: currentAgent.type,
+                games: evalStats.totalGames,
+                sequenceLength: sequenceLength
             })
         })
         .then(response => response.json())
-        .then(data => {
-            gameState = data.game_state;
-            
-            // UIの更新
-            renderGameBoard();
-            renderHistory();
-            updateTargetSequence();
-            
-            // 評価のためのAI自動プレイ
-            runEvaluationLoop();
-        })
-        .catch(error => {
-            console.error('評価ゲームの開始中にエラー:', error);
-            showMessage('評価ゲームの開始中にエラーが発生しました。');
-            stopEvaluation();
-        });
-    }
-    
-    // 評価ループ（AI自動プレイ）
-    function runEvaluationLoop() {
-        if (!evalStats.isRunning || !gameState) return;
-        
-        // 現在のエージェント
-        const currentAgent = evalStats.agents[evalStats.currentAgentIndex];
-        
-        if (gameState.gameOver) {
-            // ゲーム結果の記録
-            currentAgent.completedGames++;
-            
-            if (gameState.winner) {
-                currentAgent.wins++;
-                const turns = gameState.currentTurn;
-                currentAgent.totalTurns += turns;
-                
-                if (turns < currentAgent.minTurns) {
-                    currentAgent.minTurns = turns;
-                }
+        .then(job => {
+            if (job.error) {
+                throw new Error(job.error);
             }
+            evalStats.jobId = job.jobId;
+            return readEvaluationStream(job.jobId, currentAgent);
+        })
+        .then(() => {
+            evalStats.jobId = null;
+            if (!evalStats.isRunning) return;
             
-            // 総進捗の更新
-            evalStats.completedGames++;
-            
-            // 評価統計の更新
-            updateEvaluationStats();
-            
-            // 次のゲームか次のエージェントか終了
-            if (currentAgent.completedGames < evalStats.totalGames) {
-                // 同じエージェントで次のゲーム
-                setTimeout(runEvaluationGame, 500);
-            } else if (evalStats.currentAgentIndex < evalStats.agents.length - 1) {
+            if (evalStats.currentAgentIndex < evalStats.agents.length - 1) {
                 // 次のエージェントに進む
                 evalStats.currentAgentIndex++;
-                setTimeout(runEvaluationGame, 500);
+                runEvaluationGame();
             } else {
                 // 全エージェントの評価が完了
                 showMessage(`評価完了！全${evalStats.completedGames}ゲームの評価が終了しました。`);
-                
-                // 比較結果を表示（複数エージェントの場合）
-                if (evalStats.agents.length > 1) {
-                    displayComparisonResults();
-                }
-                
                 stopEvaluation();
             }
+        })
+        .catch(error => {
+            console.error('評価中にエラー:', error);
+            showMessage('評価中にエラーが発生しました。');
+            stopEvaluation();
+        });
+    }
+    
+    // 評価の進捗ストリーム（1行1JSON）を終了まで読み、統計表示を更新する
+    function readEvaluationStream(jobId, agent) {
+        return fetch(`/api/evaluate/${jobId}/stream`).then(response => {
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
             
-            return;
-        }
-        
-        // AIによる行動
-        fetch(`/api/ai_move?debugMode=true&evaluationMode=true`)
-            .then(response => response.json())
-            .then(data => {
-                if (data.error) {
-                    console.error('AI行動エラー:', data.error);
-                    return;
-                }
-                
-                gameState = data.game_state;
+            const read = () => reader.read().then(({ done, value }) => {
+                if (done) return;
                 
-                // UIの更新
-                renderGameBoard();
-                renderHistory();
-                updateTargetSequence();
-                
-                // 評価速度を調整（より速く）
-                setTimeout(runEvaluationLoop, 10);
-            })
-            .catch(error => {
-                console.error('評価中にエラー:', error);
-                stopEvaluation();
+                buffer += decoder.decode(value, { stream: true });
+                const lines = buffer.split('\n');
+                buffer = lines.pop();
+                lines.filter(line => line.trim()).forEach(line => {
+                    applyEvaluationProgress(agent, JSON.parse(line));
+                });
+                return read();
             });
+            return read();
+        });
+    }
+    
+    // サーバーの集計結果をエージェントの統計に反映
+    function applyEvaluationProgress(agent, progress) {
+        if (progress.status === 'failed') {
+            throw new Error(progress.error);
+        }
+        
+        const summary = progress.summary;
+        evalStats.completedGames += progress.completedGames - agent.completedGames;
+        agent.completedGames = progress.completedGames;
+        agent.wins = summary.wins;
+        agent.totalTurns = summary.avgTurns * summary.wins;
+        agent.minTurns = summary.minTurns !== null ? summary.minTurns : Infinity;
+        agent.latency = summary.decisionLatencyMs;
+        
+        updateEvaluationStats();
     }
     
     // 評価統計の更新
@@ -863,11 +970,22 @@ document.addEventListener('DOMContentLoaded', () => {
             'hybrid': 'ハイブリッド'
         };
         
-        showMessage(`評価中: ${agentTypes[currentAgent.type]}エージェント (${currentAgent.completedGames}/${evalStats.totalGames}ゲーム完了)`);
+        // 1手あたりの思考時間（中央値/99パーセンタイル）
+        const latency = currentAgent.latency && currentAgent.latency.p50 !== undefined ?
+            `, 思考時間 p50=${currentAgent.latency.p50.toFixed(1)}ms / p99=${currentAgent.latency.p99.toFixed(1)}ms` : '';
+        
+        showMessage(`評価中: ${agentTypes[currentAgent.type]}エージェント (${currentAgent.completedGames}/${evalStats.totalGames}ゲーム完了${latency})`);
     }
     
     // 評価の停止
     function stopEvaluation() {
+        // 実行中の評価ジョブがあればサーバー側でも中止する
+        if (evalStats.jobId) {
+            fetch(`/api/evaluate/${evalStats.jobId}`, { method: 'DELETE' })
+                .catch(error => console.error('評価の中止中にエラー:', error));
+            evalStats.jobId = null;
+        }
+        
         evalStats.isRunning = false;
         startEvalBtn.disabled = false;
         stopEvalBtn.disabled = true;
@@ -935,8 +1053,8 @@ document.addEventListener('DOMContentLoaded', () => {
             if (data.success) {
                 addTrainingLog(data.message, 'success');
                 
-                // 定期的にトレーニング状態を取得
-                trainInterval = setInterval(fetchTrainingStatus, 1000);
+                // トレーニング状態の更新をSSEで受け取る
+                subscribeTrainingEvents();
             } else {
                 showMessage('トレーニングの開始に失敗しました: ' + data.message);
                 addTrainingLog('トレーニング開始失敗: ' + data.message, 'error');
@@ -951,45 +1069,41 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
     
-    // トレーニング状態の取得
+    // トレーニング進捗のSSE購読（サーバーからは変化した項目だけが送られてくる）
+    function subscribeTrainingEvents() {
+        serverTrainingStats = {};
+        trainEventSource = new EventSource('/api/events?topics=training');
+        
+        trainEventSource.addEventListener('training', (e) => {
+            Object.assign(serverTrainingStats, JSON.parse(e.data));
+            handleTrainingStatus({ active: serverTrainingStats.active, stats: serverTrainingStats });
+        });
+        
+        // 配信が追いつかずイベントが捨てられた場合は状態を取り直す
+        trainEventSource.addEventListener('resync', fetchTrainingStatus);
+        
+        trainEventSource.onerror = () => {
+            addTrainingLog('進捗の受信が途切れました。再接続します...', 'warning');
+        };
+    }
+    
+    // SSE購読の終了
+    function closeTrainingEvents() {
+        if (trainEventSource) {
+            trainEventSource.close();
+            trainEventSource = null;
+        }
+    }
+    
+    // トレーニング状態の取得（SSEの取りこぼし時の再同期用）
     function fetchTrainingStatus() {
         if (!trainStats.isRunning) return;
         
         fetch('/api/training_status')
             .then(response => response.json())
             .then(data => {
-                // 非アクティブの場合、トレーニング完了
-                if (!data.active) {
-                    addTrainingLog('トレーニングが完了しました', 'success');
-                    showMessage('トレーニングが完了しました！');
-                    stopTraining();
-                    return;
-                }
-                
-                const stats = data.stats;
-                
-                // 統計の更新
-                if (stats) {
-                    // 前回の表示から変化がある場合だけログに表示
-                    if (trainStats.completedEpisodes !== stats.games_played) {
-                        const newGames = stats.games_played - trainStats.completedEpisodes;
-                        
-                        if (newGames > 0 && stats.games_played % 10 === 0) {
-                            addTrainingLog(
-                                `進捗: ${stats.games_played}/${trainStats.totalEpisodes} ゲーム完了 ` +
-                                `(勝率: ${stats.win_rate.toFixed(1)}%, 平均ターン: ${stats.avg_turns.toFixed(1)})`, 
-                                'info'
-                            );
-                        }
-                    }
-                    
-                    trainStats.completedEpisodes = stats.games_played;
-                    trainStats.wins = stats.games_won;
-                    trainStats.elapsedTime = stats.elapsed_time;
-                    
-                    // UI更新
-                    updateTrainingStats(stats);
-                }
+                serverTrainingStats = Object.assign({}, data.stats, { active: data.active });
+                handleTrainingStatus(data);
             })
             .catch(error => {
                 console.error('トレーニング状態取得エラー:', error);
@@ -997,6 +1111,44 @@ document.addEventListener('DOMContentLoaded', () => {
             });
     }
     
+    // トレーニング状態の反映
+    function handleTrainingStatus(data) {
+        if (!trainStats.isRunning) return;
+        
+        // 非アクティブの場合、トレーニング完了
+        if (!data.active) {
+            addTrainingLog('トレーニングが完了しました', 'success');
+            showMessage('トレーニングが完了しました！');
+            stopTraining();
+            return;
+        }
+        
+        const stats = data.stats;
+        
+        // 統計の更新
+        if (stats) {
+            // 前回の表示から変化がある場合だけログに表示
+            if (trainStats.completedEpisodes !== stats.games_played) {
+                const newGames = stats.games_played - trainStats.completedEpisodes;
+                
+                if (newGames > 0 && stats.games_played % 10 === 0) {
+                    addTrainingLog(
+                        `進捗: ${stats.games_played}/${trainStats.totalEpisodes} ゲーム完了 ` +
+                        `(勝率: ${stats.win_rate.toFixed(1)}%, 平均ターン: ${stats.avg_turns.toFixed(1)})`, 
+                        'info'
+                    );
+                }
+            }
+            
+            trainStats.completedEpisodes = stats.games_played;
+            trainStats.wins = stats.games_won;
+            trainStats.elapsedTime = stats.elapsed_time;
+            
+            // UI更新
+            updateTrainingStats(stats);
+        }
+    }
+    
     // トレーニング統計の更新
     function updateTrainingStats(stats) {
         if (!stats) return;
@@ -1028,10 +1180,7 @@ document.addEventListener('DOMContentLoaded', () => {
     
     // トレーニングの停止
     function stopTraining() {
-        if (trainInterval) {
-            clearInterval(trainInterval);
-            trainInterval = null;
-        }
+        closeTrainingEvents();
         
         if (!trainStats.isRunning) return;
         
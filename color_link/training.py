@@ -0,0 +1,198 @@
+import os
+import json
+import random
+import logging
+from typing import Any, Callable, Dict, Optional
+import numpy as np
+from color_link.game.color_link import ColorLinkGame
+from color_link.game.game_log import GameLogWriter, agent_type_of
+from color_link import metrics
+from color_link.rng import get_rng_state, set_rng_state
+
+logger = logging.getLogger(__name__)
+
+# チェックポイント形式のバージョン
+CHECKPOINT_VERSION = 1
+
+def new_training_stats() -> Dict[str, Any]:
+    """トレーニング統計の初期値"""
+    return {
+        'games_played': 0,
+        'games_won': 0,
+        'win_rate': 0,
+        'avg_turns': 0,
+        'total_turns': 0
+    }
+
+def capture_rng_state() -> Dict[str, Any]:
+    """randomとnumpyの乱数生成器の状態をJSONで保存できる形で取得する"""
+    version, internal_state, gauss_next = random.getstate()
+    name, keys, pos, has_gauss, cached_gaussian = np.random.get_state()
+    return {
+        'random': [version, list(internal_state), gauss_next],
+        'numpy': [name, keys.tolist(), int(pos), int(has_gauss), float(cached_gaussian)]
+    }
+
+def restore_rng_state(state: Dict[str, Any]) -> None:
+    """capture_rng_stateで取得した乱数生成器の状態を復元する"""
+    version, internal_state, gauss_next = state['random']
+    random.setstate((version, tuple(internal_state), gauss_next))
+    name, keys, pos, has_gauss, cached_gaussian = state['numpy']
+    np.random.set_state((name, np.array(keys, dtype=np.uint32), pos, has_gauss, cached_gaussian))
+
+def save_checkpoint(path: str, agent, stats: Dict[str, Any], params: Optional[Dict[str, Any]] = None) -> None:
+    """Q値テーブル・学習状態・統計・乱数の状態をまとめて保存する
+
+    書き込み途中で停止しても前回のチェックポイントが壊れないよう、一時ファイルに書いてから置き換える。
+    """
+    checkpoint = {
+        'version': CHECKPOINT_VERSION,
+        'params': params or {},
+        'stats': stats,
+        'agent': agent.get_checkpoint_state(),
+        'rng': capture_rng_state(),
+        'agentRng': get_rng_state(agent.rng)  # エージェント固有の乱数生成器（グローバルを使う場合はNone）
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+    logger.info(f"チェックポイントを保存しました: {path} ({stats['games_played']}ゲーム完了)")
+
+def load_checkpoint(path: str) -> Optional[Dict[str, Any]]:
+    """チェックポイントを読み込む（存在しなければNone）"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        checkpoint = json.load(f)
+    if checkpoint.get('version') != CHECKPOINT_VERSION:
+        raise ValueError(f"未対応のチェックポイントのバージョンです: {checkpoint.get('version')}")
+    return checkpoint
+
+def restore_checkpoint(checkpoint: Dict[str, Any], agent) -> Dict[str, Any]:
+    """エージェントと乱数の状態を復元し、続きから使う統計を返す"""
+    agent.restore_checkpoint_state(checkpoint['agent'])
+    restore_rng_state(checkpoint['rng'])
+    if checkpoint.get('agentRng') is not None:
+        set_rng_state(agent.rng, checkpoint['agentRng'])
+    stats = new_training_stats()
+    stats.update(checkpoint['stats'])
+    return stats
+
+def train_agent(agent, num_games: int, sequence_length: int = 3,
+                stats: Optional[Dict[str, Any]] = None,
+                should_stop: Optional[Callable[[], bool]] = None,
+                on_progress: Optional[Callable[[], None]] = None,
+                save_path: Optional[str] = None,
+                save_interval: int = 100,
+                checkpoint_path: Optional[str] = None,
+                checkpoint_interval: int = 25,
+                checkpoint_params: Optional[Dict[str, Any]] = None,
+                game_log: Optional[GameLogWriter] = None) -> Dict[str, Any]:
+    """エージェントにゲームを繰り返しプレイさせて学習させる
+
+    statsにチェックポイントから復元した統計を渡すと、games_playedの続きから再開する。
+
+    Args:
+        agent: 学習モードに設定済みのRLAgentまたはHybridAgent
+        num_games: プレイするゲーム数
+        sequence_length: シーケンス長
+        stats: 進捗を書き込む統計（省略時は新しく作成）
+        should_stop: Trueを返したら中断する関数（手ごとに確認）
+        on_progress: 1ゲーム終わるごとに呼ばれる関数
+        save_path: Q値テーブルの保存先（省略時は既定の保存先）
+        save_interval: 何ゲームごとにQ値テーブルを保存するか
+        checkpoint_path: チェックポイントの保存先（省略時は保存しない）
+        checkpoint_interval: 何ゲームごとにチェックポイントを保存するか
+        checkpoint_params: チェックポイントに記録するトレーニングのパラメータ
+        game_log: 終了したゲームを追記するゲーム記録（省略時は記録しない）
+    Returns:
+        統計（statsと同じ辞書）
+    """
+    if stats is None:
+        stats = new_training_stats()
+    stats.setdefault('total_turns', 0)
+    decision_duration = metrics.DECISION_DURATION.labels(type(agent).__name__)
+    interrupted = False  # ゲームの途中で停止したか
+
+    for i in range(stats['games_played'], num_games):
+        if should_stop is not None and should_stop():  # 停止リクエストがあれば中断
+            break
+
+        # 新しいゲームを開始（トレーニング用のゲームインスタンス。エージェントと同じ乱数生成器を使う）
+        training_game = ColorLinkGame(rng=agent.rng)
+        training_game.new_game(sequence_length)
+        # 前のゲームの候補・状態キーを持ち越さない（オフライン学習と同じ状態キー・報酬になる）
+        agent.reset_episode()
+
+        # このゲームでの総ターン数
+        game_turns = 0
+
+        # ゲームが終了するまでプレイ
+        while not training_game.game_over:
+            if should_stop is not None and should_stop():  # 停止リクエストがあれば中断
+                break
+
+            # 現在の状態を取得（get_stateの盤面と履歴はゲームと同じオブジェクトのため、
+            # 手を打った後の学習で打つ前の状態として使えるようコピーしておく）
+            state = training_game.get_state()
+            state['board'] = [[dict(cell) for cell in row] for row in state['board']]
+            state['history'] = list(state['history'])
+
+            # エージェントに次の行動を決定させる
+            with decision_duration.time():
+                action = agent.decide_next_move(state)
+
+            # 行動を実行
+            training_game.make_move(action['color'], action['column'])
+
+            # 新しい状態を取得
+            new_state = training_game.get_state()
+
+            # 報酬を計算し、学習させる
+            reward = agent.calculate_reward(new_state)
+            agent.learn(state, action, reward, new_state)
+
+            game_turns += 1
+
+        # 途中で停止したゲームは統計にも記録にも含めない（再開時は最後のチェックポイントからやり直す）
+        if not training_game.game_over:
+            interrupted = True
+            break
+
+        if game_log is not None:
+            game_log.append(training_game, agent_type_of(agent))
+
+        # ゲーム終了後の統計情報更新
+        stats['games_played'] += 1
+        if training_game.winner:
+            stats['games_won'] += 1
+        stats['total_turns'] += game_turns
+        metrics.TRAINING_GAMES.inc()
+
+        # 進捗率と統計を更新
+        stats['win_rate'] = (stats['games_won'] / stats['games_played']) * 100
+        stats['avg_turns'] = stats['total_turns'] / stats['games_played']
+        if on_progress is not None:
+            on_progress()
+
+        # 一定ゲームごとにログ出力とモデル保存
+        if i % save_interval == 0:
+            logger.info(f"トレーニング進捗: {i}/{num_games} ゲーム完了, "
+                        f"勝率: {stats['win_rate']:.2f}%, "
+                        f"平均ターン: {stats['avg_turns']:.2f}")
+            agent.save_q_table(save_path)
+
+        # ゲームの区切りでチェックポイントを保存（再開時はここから同じ乱数列で続く）
+        if checkpoint_path and stats['games_played'] % checkpoint_interval == 0:
+            save_checkpoint(checkpoint_path, agent, stats, checkpoint_params)
+
+    # トレーニング完了（または停止）後の最終保存
+    agent.save_q_table(save_path)
+    if game_log is not None:
+        game_log.flush()
+    # チェックポイントはゲームの区切りでだけ保存する（途中で停止した場合は直前の区切りのものを残す）
+    if checkpoint_path and not interrupted:
+        save_checkpoint(checkpoint_path, agent, stats, checkpoint_params)
+    return stats
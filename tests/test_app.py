@@ -68,6 +68,341 @@ class TestFlaskApp:
         assert 'currentTurn' in data['game_state']
         assert data['game_state']['currentTurn'] == 1  # 1手目
     
+    def test_api_ai_move_with_budget(self, client):
+        """思考時間の上限を指定したAI行動APIが正しく動作するかテストする"""
+        # 初手で偶然勝利した場合はやり直す
+        for _ in range(5):
+            client.post('/api/new_game', json={'aiType': 'rule'})
+            response = client.get('/api/ai_move?budgetMs=50')
+            assert response.status_code == 200
+            if not response.json['game_state']['gameOver']:
+                break
+        
+        # 2手目以降は候補の評価が打ち切られる可能性がある
+        response = client.get('/api/ai_move?budgetMs=50')
+        assert response.status_code == 200
+        
+        data = response.json
+        assert 'action' in data
+        assert 'searchComplete' in data
+        assert 'decisionMs' in data
+        assert isinstance(data['searchComplete'], bool)
+        assert data['game_state']['currentTurn'] == 2
+
+    def test_api_ai_autoplay(self, client):
+        """AI自動プレイAPIが1リクエストで複数手を指すかテストする"""
+        client.post('/api/new_game', json={'aiType': 'rule'})
+        response = client.post('/api/ai_autoplay', json={'maxMoves': 3, 'budgetMs': 50})
+        assert response.status_code == 200
+
+        data = response.json
+        assert 1 <= len(data['moves']) <= 3
+        assert data['game_state']['currentTurn'] == len(data['moves'])
+        for color, column, hits, blows in data['moves']:
+            assert 0 <= column <= 4
+            assert hits + blows <= 3
+
+        # 盤面の履歴と返された手順が一致する
+        history = data['game_state']['history']
+        assert [[m['color'], m['column'], m['hits'], m['blows']] for m in history] == data['moves']
+
+    def test_api_make_move_delta(self, client):
+        """差分モードでは変わった列と履歴だけが返り、版が合わなければ全体が返るかテストする"""
+        response = client.post('/api/new_game', json={})
+        version = response.json['game_state']['version']
+        
+        response = client.post('/api/make_move', json={'color': 'red', 'column': 2, 'delta': True, 'version': version})
+        assert response.status_code == 200
+        data = response.json
+        assert 'game_state' not in data
+        assert data['delta']['version'] == version + 1
+        assert data['delta']['column'] == 2
+        assert data['delta']['columnColors'][0] == 'red'
+        assert data['delta']['historyEntry']['color'] == 'red'
+        
+        if not data['delta']['gameOver']:
+            # 古い版を送った場合は全体で再同期する
+            response = client.post('/api/make_move', json={'color': 'blue', 'column': 0, 'delta': True, 'version': version})
+            assert 'delta' not in response.json
+            assert response.json['game_state']['currentTurn'] == 2
+            assert response.json['game_state']['version'] == version + 2
+
+    def test_api_evaluate_validation(self, client):
+        """一括評価APIが不正なパラメータと存在しないジョブを拒否するかテストする"""
+        response = client.post('/api/evaluate', json={'agentType': 'unknown', 'games': 10})
+        assert response.status_code == 400
+        for params in ({'games': 0}, {'games': 10 ** 9}, {'games': 'many'},
+                       {'games': 10, 'sequenceLength': 0}, {'games': 10, 'sequenceLength': 6}):
+            response = client.post('/api/evaluate', json=dict(params, agentType='rule'))
+            assert response.status_code == 400
+        
+        response = client.get('/api/evaluate/missing')
+        assert response.status_code == 404
+        
+        # 評価ジョブも同じ範囲で拒否する
+        for params in ({'games': 10 ** 9}, {'games': 10, 'sequenceLength': 6}):
+            response = client.post('/api/jobs', json={'kind': 'evaluation', 'params': dict(params, agentType='rule')})
+            assert response.status_code == 400
+
+    def test_event_stream_sends_training_snapshot(self, client):
+        """SSE接続の直後にトレーニングの現在の状態が送られるかテストする"""
+        response = client.get('/api/events?topics=training', buffered=False)
+        try:
+            assert response.status_code == 200
+            assert response.mimetype == 'text/event-stream'
+            
+            first = next(response.response)
+            if isinstance(first, bytes):
+                first = first.decode('utf-8')
+            assert first.startswith('event: training\n')
+            assert '"active": false' in first
+        finally:
+            response.close()
+
+    def test_api_ai_autoplay_without_agent(self, client):
+        """AIが選択されていない場合はエラーになるかテストする"""
+        client.post('/api/new_game', json={})
+        response = client.post('/api/ai_autoplay', json={})
+        assert response.status_code == 400
+
+    def test_api_ai_autoplay_validation(self, client):
+        """maxMovesとbudgetMsが不正な場合は手を指さずにエラーになるかテストする"""
+        client.post('/api/new_game', json={'aiType': 'rule'})
+        for params in ({'maxMoves': 'abc'}, {'maxMoves': -1}, {'budgetMs': 'fast'}, {'budgetMs': -5}, {'maxMoves': [1]}):
+            response = client.post('/api/ai_autoplay', json=params)
+            assert response.status_code == 400
+        
+        response = client.post('/api/ai_autoplay', json={'maxMoves': '2', 'budgetMs': '50'})
+        assert response.status_code == 200
+        assert 1 <= len(response.json['moves']) <= 2
+
+    def test_metrics_endpoint(self, client):
+        """ルート別の処理時間とAIの思考時間がPrometheus形式で出力されるかテストする"""
+        client.post('/api/new_game', json={'aiType': 'rule'})
+        client.get('/api/ai_move')
+        response = client.get('/metrics')
+        assert response.status_code == 200
+        assert response.mimetype == 'text/plain'
+
+        text = response.get_data(as_text=True)
+        assert 'color_link_http_request_duration_seconds_count{route="/api/new_game",method="POST"}' in text
+        assert 'color_link_decide_next_move_seconds_count{agent="RuleBasedAgent"}' in text
+        assert 'color_link_q_table_states{agent="rl"}' in text
+
+    def test_api_model_stats(self, client):
+        """Q値テーブルの統計APIをテストする"""
+        response = client.get('/api/model_stats?agentType=rl')
+        assert response.status_code == 200
+        assert response.json['states'] >= 1
+        assert 'histogram' in response.json['visits']
+
+        response = client.get('/api/model_stats?agentType=rule')
+        assert response.status_code == 400
+
+    def test_api_profiling(self, client):
+        """APIでプロファイリングを有効にしてトレースをダウンロードできるかテストする"""
+        response = client.post('/api/profiling', json={'enabled': True, 'clear': True})
+        assert response.json['enabled']
+        try:
+            client.post('/api/new_game', json={'aiType': 'rule'})
+            client.get('/api/ai_move')
+            response = client.get('/api/profiling/traces')
+            assert response.mimetype == 'application/x-ndjson'
+            assert b'"kind": "decide_next_move"' in response.data
+            assert client.get('/api/profiling/pstats').status_code == 404
+        finally:
+            client.post('/api/profiling', json={'enabled': False, 'clear': True})
+
+    def test_sessions_do_not_interfere(self):
+        """別々のクライアントのゲームが互いに上書きされないかテストする"""
+        flask_app.config.update({"TESTING": True})
+        first = flask_app.test_client()
+        second = flask_app.test_client()
+        
+        first.post('/api/new_game', json={})
+        second.post('/api/new_game', json={})
+        
+        first.post('/api/make_move', json={'color': 'red', 'column': 0})
+        response = second.post('/api/make_move', json={'color': 'blue', 'column': 1})
+        
+        # 2つ目のクライアントのゲームは1手目のまま
+        assert response.json['game_state']['currentTurn'] == 1
+        assert response.json['game_state']['history'][0]['color'] == 'blue'
+    
+    def test_stateless_mode(self, client):
+        """ステートレスモードで状態トークンを往復させてプレイできるかテストする"""
+        flask_app.config['STATELESS_MODE'] = True
+        try:
+            response = client.post('/api/new_game', json={'aiType': 'rule'})
+            token = response.json['stateToken']
+            
+            response = client.post('/api/make_move', json={'color': 'red', 'column': 2, 'stateToken': token})
+            assert response.status_code == 200
+            assert response.json['game_state']['currentTurn'] == 1
+            token = response.json['stateToken']
+            
+            if not response.json['game_state']['gameOver']:
+                response = client.get(f'/api/ai_move?stateToken={token}')
+                assert response.status_code == 200
+                assert response.json['game_state']['currentTurn'] == 2
+            
+            # トークンがなければエラー
+            response = client.post('/api/make_move', json={'color': 'red', 'column': 2})
+            assert response.status_code == 400
+        finally:
+            flask_app.config['STATELESS_MODE'] = False
+    
+    def test_finished_games_are_recorded(self, client, tmp_path, monkeypatch):
+        """COLOR_LINK_GAME_LOGを指定した場合、APIで終了したゲームが記録されるかテストする"""
+        import color_link.app as app_module
+        from color_link.game.game_log import GameLogWriter, read_games
+        
+        log = GameLogWriter(str(tmp_path / 'games.clgl'))
+        monkeypatch.setattr(app_module, 'GAME_LOG', log)
+        state = client.post('/api/new_game', json={'aiType': 'rule', 'debugMode': True}).json['game_state']
+        target = state['targetSequence']
+        
+        # 列0に目標の色を下から順に差し込むと勝利で終わる
+        for color in reversed(target):
+            client.post('/api/make_move', json={'color': color, 'column': 0})
+        # 終了後のAIの手は無効なので記録を増やさない
+        for _ in range(3):
+            client.get('/api/ai_move')
+        
+        # 自動プレイで終了したゲームも1回だけ記録される
+        client.post('/api/new_game', json={'aiType': 'rule'})
+        client.post('/api/ai_autoplay', json={})
+        client.post('/api/ai_autoplay', json={})
+        log.close()
+        
+        records = list(read_games(log.path))
+        assert len(records) == 2
+        assert records[0].won
+        assert records[0].agent is None  # プレイヤーが指して終わったゲーム
+        assert records[0].target == target
+        assert records[1].agent == 'rule'
+    
+    def test_stateless_finished_game_recorded_once(self, client, tmp_path, monkeypatch):
+        """ステートレスモードで終了直前のトークンを送り直しても、ゲームが重ねて記録されないかテストする"""
+        import color_link.app as app_module
+        from color_link.game.game_log import GameLogWriter, read_games
+        
+        log = GameLogWriter(str(tmp_path / 'games.clgl'))
+        monkeypatch.setattr(app_module, 'GAME_LOG', log)
+        monkeypatch.setattr(app_module, '_recorded_games', app_module.OrderedDict())
+        monkeypatch.setitem(flask_app.config, 'STATELESS_MODE', True)
+        response = client.post('/api/new_game', json={'aiType': 'rule', 'debugMode': True})
+        target = response.json['game_state']['targetSequence']
+        token = response.json['stateToken']
+        
+        # 列0に目標の色を下から順に差し込み、最後の1手の前のトークンを残しておく
+        for color in reversed(target[1:]):
+            token = client.post('/api/make_move', json={'color': color, 'column': 0, 'stateToken': token}).json['stateToken']
+        for _ in range(2):
+            response = client.post('/api/make_move', json={'color': target[0], 'column': 0, 'stateToken': token})
+            assert response.json['game_state']['gameOver']
+        # 終了後のトークンでの手は無効なので記録しない
+        client.post('/api/make_move', json={'color': 'red', 'column': 1, 'stateToken': response.json['stateToken']})
+        log.close()
+        
+        records = list(read_games(log.path))
+        assert len(records) == 1
+        assert records[0].won and records[0].agent is None
+    
+    def test_session_agents_share_table_safely(self, tmp_path, monkeypatch, caplog):
+        """Q値テーブルを共有するセッションのエージェントが同時に学習しても、保存・読み込みが失敗しないかテストする"""
+        import random
+        import threading
+        import color_link.app as app_module
+        from color_link.agents.rl_agent import RLAgent
+        from color_link.game.color_link import ColorLinkGame
+        
+        shared = RLAgent(rng=0)
+        monkeypatch.setattr(app_module, 'rl_agent', shared)
+        agents = [app_module.create_agent('rl') for _ in range(4)]
+        assert all(agent.q_table is shared.q_table and agent.table_lock is shared.table_lock for agent in agents)
+        
+        errors = []
+        def play(agent, seed):
+            try:
+                agent.rng = random.Random(seed)
+                agent.learning_mode = True
+                for _ in range(3):
+                    game = ColorLinkGame(rng=seed)
+                    game.new_game(3)
+                    agent.reset_episode()
+                    while not game.game_over:
+                        state = game.get_state()
+                        action = agent.decide_next_move(state)
+                        game.make_move(action['color'], action['column'])
+                        new_state = game.get_state()
+                        agent.learn(state, action, agent.calculate_reward(new_state), new_state)
+            except Exception as e:
+                errors.append(e)
+        
+        threads = [threading.Thread(target=play, args=(agent, i)) for i, agent in enumerate(agents)]
+        for thread in threads:
+            thread.start()
+        path = str(tmp_path / 'q_table.json')
+        while any(thread.is_alive() for thread in threads):
+            shared.save_q_table(path)
+            shared.load_q_table(path)
+            shared.snapshot_table()
+        for thread in threads:
+            thread.join()
+        
+        assert errors == []
+        # 保存・読み込みの失敗はログに出る
+        assert not [r for r in caplog.records if r.levelname == 'ERROR']
+        shared.save_q_table(path)
+        loaded = RLAgent(rng=0)
+        loaded.load_q_table(path)
+        assert loaded.q_table == shared.q_table
+    
+    def test_learning_game_keeps_shared_table(self, client, tmp_path, monkeypatch):
+        """学習モードのゲームを始めても、ほかのセッションが学習した共有のQ値テーブルを読み込み直さないかテストする"""
+        import color_link.app as app_module
+        from color_link.agents.rl_agent import RLAgent
+        
+        path = str(tmp_path / 'q_table.json')
+        saved = RLAgent(rng=0)
+        saved.q_table['saved'] = {'red:0': 1.0}
+        saved.save_q_table(path)
+        shared = RLAgent(rng=0)
+        monkeypatch.setattr(RLAgent, 'default_q_table_path', staticmethod(lambda: path))
+        monkeypatch.setattr(app_module, 'rl_agent', shared)
+        monkeypatch.setattr(app_module, '_loaded_q_tables', set())
+        
+        # 最初の学習モードのゲームで保存済みのテーブルを読み込む
+        response = client.post('/api/new_game', json={'aiType': 'rl', 'learningMode': True},
+                               headers={'X-Session-Id': 'shared-table-1'})
+        assert response.status_code == 200
+        assert 'saved' in shared.q_table
+        
+        # 別のセッションで学習した内容は、次の学習モードのゲームでも残る
+        shared.q_table['learned'] = {'blue:1': 0.5}
+        response = client.post('/api/new_game', json={'aiType': 'rl', 'learningMode': True},
+                               headers={'X-Session-Id': 'shared-table-2'})
+        assert response.status_code == 200
+        assert shared.q_table['learned'] == {'blue:1': 0.5}
+        assert 'saved' in shared.q_table
+    
+    @pytest.mark.parametrize('ai_type', ['rl', 'hybrid'])
+    def test_new_game_resets_agent_candidates(self, client, ai_type):
+        """ゲームを最後までプレイした後の新しいゲームで、エージェントの候補が全シーケンスに戻るかテストする"""
+        import color_link.app as app_module
+        
+        headers = {'X-Session-Id': f'reset-candidates-{ai_type}'}
+        client.post('/api/new_game', json={'aiType': ai_type}, headers=headers)
+        while not client.post('/api/ai_autoplay', json={}, headers=headers).json['game_state']['gameOver']:
+            pass
+        
+        client.post('/api/new_game', json={'aiType': ai_type}, headers=headers)
+        agent = app_module.session_manager.get(headers['X-Session-Id']).current_agent
+        rl_agent = agent if ai_type == 'rl' else agent.rl_agent
+        assert len(rl_agent.possible_sequences) == 5 ** 3
+        assert not hasattr(rl_agent, 'prev_possibilities_count')
+    
     # 無効な移動のテストはスキップします - 実際のAPIの動作を先に確認する必要があります
 
     # AIアクションとゲーム状態取得のテストはアプリの実際のエンドポイントに合わせて修正
@@ -0,0 +1,82 @@
+import logging
+import threading
+import pytest
+from benchmarks.cases import BENCHMARKS, select
+from benchmarks.run import compare
+from benchmarks.loadtest import HttpTransport, InProcessTransport, run_load
+from benchmarks.exhaustive import all_targets, play_chunk, run_exhaustive, seeded_boards, summarize
+from color_link.rng import derive_seed
+
+class TestBenchmarks:
+    @pytest.mark.parametrize('name', list(BENCHMARKS))
+    def test_benchmark_runs(self, name):
+        """各ベンチマークの準備と1回の実行がエラーなく終わるかテストする"""
+        setup, ops, heavy = BENCHMARKS[name]
+        logging.disable(logging.CRITICAL)
+        try:
+            setup()()
+        finally:
+            logging.disable(logging.NOTSET)
+
+    def test_select(self):
+        """名前の一部でベンチマークを選べるかテストする"""
+        assert select(['rl.']) == ['rl.get_state_key', 'rl.learn']
+        assert select([]) == list(BENCHMARKS)
+
+    def test_compare_flags_regressions(self):
+        """しきい値を超えて遅くなったものだけがregressionになるかテストする"""
+        baseline = {'results': {'a': {'secondsPerOp': 1.0}, 'b': {'secondsPerOp': 1.0}, 'old': {'secondsPerOp': 1.0}}}
+        current = {'results': {'a': {'secondsPerOp': 1.1}, 'b': {'secondsPerOp': 1.5}, 'new': {'secondsPerOp': 1.0}}}
+        rows = {row['name']: row for row in compare(baseline, current, threshold=0.2)}
+
+        assert set(rows) == {'a', 'b'}
+        assert not rows['a']['regression']
+        assert rows['b']['regression']
+        assert rows['b']['ratio'] == 1.5
+
+class TestExhaustiveBenchmark:
+    def test_targets_and_boards(self):
+        """目標シーケンスを漏れなく列挙し、盤面がシードで固定されるかテストする"""
+        targets = all_targets(2)
+        assert len(targets) == 25
+        assert len({tuple(t) for t in targets}) == 25
+        assert seeded_boards(2, seed=3) == seeded_boards(2, seed=3)
+
+    def test_parallel_run_matches_serial(self):
+        """並列実行の集計が同じゲームを1プロセスで実行した結果と一致するかテストする"""
+        report = run_exhaustive(['rule'], 2, boards=1, seed=1, workers=2)
+        board = seeded_boards(1, seed=1)[0]
+        games = [{'seed': derive_seed(1, 0, i), 'board': board, 'target': target} for i, target in enumerate(all_targets(2))]
+        expected = summarize(play_chunk('rule', 2, games), max_turns=50)
+
+        result = report['results']['rule']
+        assert result['games'] == 25
+        for key in ('wins', 'meanTurns', 'p95Turns', 'maxTurnsToWin'):
+            assert result[key] == expected[key]
+
+class TestLoadTest:
+    def test_test_client_load(self):
+        """テストクライアントに対して各ルートのレイテンシとエラー率を集計できるかテストする"""
+        report = run_load(InProcessTransport(), concurrency=3, duration=0.5)
+
+        assert report['errors'] == 0
+        assert 'POST /api/new_game' in report['routes']
+        assert {'GET /api/ai_move [rule]', 'GET /api/ai_move [rl]', 'GET /api/ai_move [hybrid]'} <= set(report['routes'])
+        latency = report['routes']['POST /api/make_move']['latencyMs']
+        assert latency['p50'] <= latency['p95'] <= latency['p99']
+
+    def test_http_load(self):
+        """ローカルのポートで起動したサーバーに対して負荷をかけられるかテストする"""
+        from werkzeug.serving import make_server
+        from color_link.app import app
+
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            report = run_load(HttpTransport(f'http://127.0.0.1:{server.server_port}'), concurrency=2, duration=0.5)
+        finally:
+            server.shutdown()
+
+        assert report['requests'] > 0
+        assert report['errors'] == 0
@@ -0,0 +1,49 @@
+import pytest
+from color_link.broadcast import EventBroadcaster
+
+class TestEventBroadcaster:
+    def test_publish_to_topic_subscribers(self):
+        """購読しているトピックのイベントだけが届くかテストする"""
+        broadcaster = EventBroadcaster(coalesce_window=0)
+        training = broadcaster.subscribe(['training'])
+        moves = broadcaster.subscribe(['moves:a'])
+
+        broadcaster.publish('moves:a', 'move', {'column': 1})
+
+        assert training.get(timeout=0) == []
+        assert moves.get(timeout=0) == [('move', {'column': 1})]
+        assert broadcaster.has_subscribers('training')
+        assert not broadcaster.has_subscribers('moves:b')
+
+    def test_coalesce_deltas(self):
+        """同じキーの未送信の差分が1つにまとめられるかテストする"""
+        broadcaster = EventBroadcaster(coalesce_window=0)
+        subscription = broadcaster.subscribe(['training'])
+
+        broadcaster.publish('training', 'training', {'games_played': 1, 'win_rate': 100}, coalesce_key='training')
+        broadcaster.publish('training', 'training', {'games_played': 2}, coalesce_key='training')
+
+        assert subscription.get(timeout=0) == [('training', {'games_played': 2, 'win_rate': 100})]
+
+    def test_overflow_requests_resync(self):
+        """バッファがあふれた購読者には古いイベントを捨ててresyncを送るかテストする"""
+        broadcaster = EventBroadcaster(max_pending=3, coalesce_window=0)
+        subscription = broadcaster.subscribe(['moves:a'])
+
+        for column in range(5):
+            broadcaster.publish('moves:a', 'move', {'column': column})
+
+        events = subscription.get(timeout=0)
+        assert events[0] == ('resync', {'dropped': 2})
+        assert [data['column'] for _, data in events[1:]] == [2, 3, 4]
+
+    def test_subscriber_limit(self):
+        """購読者数の上限を超えた接続は拒否され、解除後は再び接続できるかテストする"""
+        broadcaster = EventBroadcaster(max_subscribers=1)
+        first = broadcaster.subscribe(['training'])
+
+        assert broadcaster.subscribe(['training']) is None
+
+        broadcaster.unsubscribe(first)
+        assert first.closed
+        assert broadcaster.subscribe(['training']) is not None
@@ -181,4 +181,89 @@ class TestColorLinkGame:
         assert state['winner'] == game.winner
         assert state['sequenceLength'] == game.sequence_length
         assert state['maxTurns'] == game.max_turns
-        assert state['currentTurn'] == len(game.history) 
\ No newline at end of file
+        assert state['currentTurn'] == len(game.history)
+
+    def test_state_delta(self):
+        """直前の1手分の差分が取得でき、版が合わない場合はNoneになるかテストする"""
+        game = ColorLinkGame()
+        game.new_game(board_colors=[['red'] * 5 for _ in range(5)], target_sequence=['blue', 'blue', 'blue'])
+        base_version = game.version
+        
+        # 新しいゲームの直後は差分がない
+        assert game.get_state_delta(base_version - 1) is None
+        
+        game.make_move('green', 1)
+        delta = game.get_state_delta(base_version)
+        assert delta['version'] == base_version + 1
+        assert delta['column'] == 1
+        assert delta['columnColors'] == ['green', 'red', 'red', 'red', 'red']
+        assert delta['historyEntry'] == game.history[-1]
+        assert delta['currentTurn'] == 1
+        assert delta['targetSequence'] is None
+        
+        # 2手以上離れた版からは差分を作らない（全体で再同期する）
+        game.make_move('blue', 2)
+        assert game.get_state_delta(base_version) is None
+        assert game.get_state()['version'] == base_version + 2
+        
+        # 手の取り消しは差分で表さない
+        version = game.version
+        game.unmake_move()
+        assert game.get_state_delta(version) is None
+    
+    def test_unmake_move(self):
+        """手を取り消すと押し出された色を含めて盤面と履歴が元に戻るかテストする"""
+        game = ColorLinkGame()
+        board = [[color] * 5 for color in game.colors]
+        game.new_game(board_colors=board, target_sequence=['green', 'red', 'blue'])
+        
+        game.make_move('purple', 2)
+        game.make_move('green', 2)
+        result = game.make_move('yellow', 0)
+        move = game.unmake_move()
+        assert move == {'color': 'yellow', 'column': 0, 'hits': result['hits'], 'blows': result['blows']}
+        game.unmake_move()
+        game.unmake_move()
+        
+        assert [[cell['color'] for cell in row] for row in game.board] == board
+        assert game.history == []
+        with pytest.raises(ValueError):
+            game.unmake_move()
+    
+    def test_unmake_winning_move(self):
+        """勝利した手を取り消すとゲームが進行中に戻るかテストする"""
+        game = ColorLinkGame()
+        game.new_game(board_colors=[['red'] * 5 for _ in range(5)], target_sequence=['blue', 'red', 'red'])
+        game.make_move('blue', 0)
+        assert game.game_over and game.winner
+        
+        game.unmake_move()
+        assert not game.game_over and not game.winner
+        assert game.make_move('green', 1)['valid']
+    
+    def test_snapshot_restore(self):
+        """スナップショットまで手を取り消せて、別のゲームの局面は復元できないかテストする"""
+        game = ColorLinkGame()
+        game.new_game(seed=3)
+        game.make_move('red', 1)
+        snapshot = game.snapshot()
+        board = [[cell['color'] for cell in row] for row in game.board]
+        
+        for column in range(5):
+            game.make_move('blue', column)
+        game.restore(snapshot)
+        assert len(game.history) == 1
+        assert [[cell['color'] for cell in row] for row in game.board] == board
+        
+        # 取り消した後に別の手を打った局面は、同じ手数でも復元できない
+        game.make_move('green', 2)
+        game.unmake_move()
+        game.unmake_move()
+        game.make_move('yellow', 3)
+        assert len(game.history) == 1
+        with pytest.raises(ValueError):
+            game.restore(snapshot)
+        
+        game.new_game(seed=3)
+        with pytest.raises(ValueError):
+            game.restore(snapshot)
@@ -0,0 +1,94 @@
+import random
+import numpy as np
+import pytest
+from color_link import decision_cache
+from color_link.decision_cache import DecisionCache
+from color_link.game.color_link import ColorLinkGame
+from color_link.agents.rule_based_agent import RuleBasedAgent
+
+
+def _play(agent, seed):
+    """同じシードの乱数生成器をゲームとエージェントで共有してプレイし、行動の列を返す"""
+    rng = random.Random(seed)
+    agent.rng = rng
+    game = ColorLinkGame(rng=rng)
+    game.new_game(3)
+    actions = []
+    while not game.game_over:
+        action = agent.decide_next_move(game.get_state())
+        game.make_move(action['color'], action['column'])
+        actions.append((action['color'], action['column']))
+    return actions
+
+
+class TestDecisionCache:
+    def test_lru_eviction_and_stats(self):
+        """上限を超えたら最も古く使われた局面から捨て、ヒット率を集計するかテストする"""
+        cache = DecisionCache(capacity=2)
+        cache.put(1, np.arange(25.0))
+        cache.put(2, np.ones(25))
+        assert cache.get(1) is not None  # 1を最近使ったものにする
+        cache.put(3, np.zeros(25))
+
+        assert cache.get(2) is None
+        assert cache.get(3)[0] == 0
+        stats = cache.stats()
+        assert stats['memoryHits'] == 2
+        assert stats['misses'] == 1
+        assert stats['hitRate'] == pytest.approx(2 / 3)
+        assert stats['memoryEntries'] == 2
+        with pytest.raises(ValueError):
+            cache.put(4, np.zeros(5))
+
+    def test_disk_tier_survives_restart(self, tmp_path):
+        """SQLiteに保存したスコアを別のインスタンスから読めるかテストする（64ビットのキーを含む）"""
+        path = str(tmp_path / 'cache' / 'decisions.sqlite')
+        key = (1 << 64) - 5
+        cache = DecisionCache(path)
+        cache.put(key, np.linspace(0, 1, 25))
+        cache.close()
+
+        reopened = DecisionCache(path)
+        assert np.array_equal(reopened.get(key), np.linspace(0, 1, 25))
+        assert reopened.get(key) is not None
+        stats = reopened.stats()
+        assert (stats['diskHits'], stats['memoryHits'], stats['diskEntries']) == (1, 1, 1)
+
+        reopened.clear()
+        assert reopened.get(key) is None
+        reopened.close()
+
+    def test_old_score_version_is_ignored(self, tmp_path, monkeypatch):
+        """評価方法のバージョンが違う値は使わないかテストする"""
+        path = str(tmp_path / 'decisions.sqlite')
+        cache = DecisionCache(path)
+        cache.put(7, np.ones(25))
+        cache.close()
+
+        monkeypatch.setattr(decision_cache, 'SCORE_VERSION', decision_cache.SCORE_VERSION + 1)
+        assert DecisionCache(path).get(7) is None
+
+    def test_agent_decisions_match_uncached(self):
+        """キャッシュを使っても同じ乱数なら同じ行動になり、同じ局面ではキャッシュが使われるかテストする"""
+        cache = DecisionCache()
+        for seed in (1, 2):
+            assert _play(RuleBasedAgent(decision_cache=cache), seed) == _play(RuleBasedAgent(), seed)
+        misses = cache.stats()['misses']
+
+        _play(RuleBasedAgent(decision_cache=cache), 1)
+        stats = cache.stats()
+        assert stats['misses'] == misses
+        assert stats['memoryHits'] > 0
+
+        # 同じ盤面で候補集合だけが違う局面を、キャッシュが取り違えない
+        game = ColorLinkGame(rng=3)
+        game.new_game(3)
+        state = game.get_state()
+        state['history'] = [{'color': 'red', 'column': 0, 'hits': 1, 'blows': 0}]
+        full = RuleBasedAgent()._generate_all_sequences(3)
+        column = ['red', 'red', 'red']
+        for hits in (1, 0):
+            candidates = RuleBasedAgent()._filter_sequences(full, column, hits, 0)
+            cached = RuleBasedAgent(rng=random.Random(hits), decision_cache=cache)
+            uncached = RuleBasedAgent(rng=random.Random(hits))
+            assert cached.decide_from_candidates(state, candidates) == uncached.decide_from_candidates(state, candidates)
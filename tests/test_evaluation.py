@@ -0,0 +1,51 @@
+import pytest
+from color_link.evaluation import EvaluationManager, EvaluationStats, play_evaluation_game
+
+class TestEvaluation:
+    def test_same_seed_is_reproducible(self):
+        """同じシードなら同じ結果になるかテストする"""
+        first = play_evaluation_game('rule', 3, 42)
+        second = play_evaluation_game('rule', 3, 42)
+
+        assert first['won'] == second['won']
+        assert first['turns'] == second['turns']
+        assert len(first['decisionMs']) == first['turns']
+
+    def test_stats_summary(self):
+        """勝率・ターン数の分布・思考時間のパーセンタイルが集計されるかテストする"""
+        stats = EvaluationStats()
+        stats.add({'won': True, 'turns': 4, 'decisionMs': [1.0, 2.0, 3.0, 4.0]})
+        stats.add({'won': True, 'turns': 6, 'decisionMs': [1.0] * 6})
+        stats.add({'won': False, 'turns': 50, 'decisionMs': [2.0] * 50})
+
+        summary = stats.summary()
+        assert summary['games'] == 3
+        assert summary['wins'] == 2
+        assert summary['winRate'] == pytest.approx(200 / 3)
+        assert summary['avgTurns'] == 5
+        assert summary['minTurns'] == 4
+        assert summary['turnDistribution'] == {'4': 1, '6': 1}
+        assert summary['decisionLatencyMs']['moves'] == 60
+        assert summary['decisionLatencyMs']['max'] == 4.0
+
+    def test_manager_runs_job_in_pool(self):
+        """ワーカープロセスのプールで評価ジョブが完了するかテストする"""
+        manager = EvaluationManager(max_workers=2)
+        try:
+            job = manager.start('rule', 6, 3, seed=1)
+            while not job.done:
+                job.wait_for_update(job.version, timeout=5)
+
+            snapshot = job.snapshot()
+            assert snapshot['status'] == 'completed'
+            assert snapshot['completedGames'] == 6
+            assert snapshot['summary']['games'] == 6
+            assert manager.get(job.job_id) is job
+        finally:
+            manager.shutdown()
+
+    def test_invalid_agent_type(self):
+        """未知のAIタイプはエラーになるかテストする"""
+        manager = EvaluationManager(max_workers=1)
+        with pytest.raises(ValueError):
+            manager.start('unknown', 10)
@@ -0,0 +1,51 @@
+import logging
+from color_link.game.color_link import ColorLinkGame
+from color_link.agents.rule_based_agent import RuleBasedAgent
+from color_link.events import EVENTS, EventHub, LoggingSink
+
+class TestEvents:
+    def test_game_emits_events_without_printing(self, capsys):
+        """ゲームのイベントがコレクターに届き、標準出力には何も出ないかテストする"""
+        game = ColorLinkGame()
+        with EVENTS.collect() as collector:
+            game.new_game(3, target_sequence=['red', 'blue', 'green'])
+            game.make_move('red', 0)
+
+        assert collector.of('game.new') == [{'sequence_length': 3, 'version': game.version - 1}]
+        move = collector.of('game.move')[0]
+        assert move['color'] == 'red' and move['column'] == 0 and move['turn'] == 1
+        # 目標シーケンスはイベントに含めない
+        assert all('target_sequence' not in fields for _, fields in collector.records)
+        assert capsys.readouterr().out == ''
+
+    def test_collector_filters_events(self):
+        """イベント名を指定したコレクターはそのイベントだけを記録するかテストする"""
+        game = ColorLinkGame()
+        game.new_game(3)
+        agent = RuleBasedAgent()
+        with EVENTS.collect('agent.action', 'agent.candidates') as collector:
+            for _ in range(2):
+                action = agent.decide_next_move(game.get_state())
+                game.make_move(action['color'], action['column'])
+
+        assert {name for name, _ in collector.records} == {'agent.action', 'agent.candidates'}
+        assert collector.of('agent.candidates')[0]['before'] == 125
+
+    def test_hub_is_falsy_without_sinks(self):
+        """シンクがなければ偽になり、削除後はイベントが届かないかテストする"""
+        hub = EventHub()
+        assert not hub
+        with hub.collect() as collector:
+            assert hub
+            hub.emit('a', x=1)
+        hub.emit('b', x=2)
+        assert not hub
+        assert collector.records == [('a', {'x': 1})]
+
+    def test_logging_sink(self, caplog):
+        """ログ出力用のシンクが指定したレベルで出力するかテストする"""
+        hub = EventHub()
+        hub.add_sink(LoggingSink(level=logging.INFO))
+        with caplog.at_level(logging.INFO, logger='color_link.events'):
+            hub.emit('game.end', winner=True, turns=7)
+        assert "game.end {'winner': True, 'turns': 7}" in caplog.text
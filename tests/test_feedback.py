@@ -0,0 +1,66 @@
+import random
+import itertools
+import numpy as np
+from color_link.game.color_link import ColorLinkGame
+from color_link.game.feedback import COLORS, column_tops, encode, feedback_matrix, hits_blows, probe
+
+
+def _reference_hits_blows(target, column):
+    """位置の一致を除いてから色の一致を1つずつ探す、素朴な判定"""
+    target_rest = list(target)
+    column_rest = list(column)
+    hits = 0
+    for i in range(len(target)):
+        if target[i] == column[i]:
+            hits += 1
+            target_rest[i] = column_rest[i] = None
+    blows = 0
+    for color in column_rest:
+        if color is not None and color in target_rest:
+            blows += 1
+            target_rest[target_rest.index(color)] = None
+    return hits, blows
+
+
+class TestFeedback:
+    def test_hits_blows_matches_reference(self):
+        """全ての長さ3の組み合わせで素朴な判定と一致するかテストする"""
+        sequences = [list(s) for s in itertools.product(COLORS, repeat=3)]
+        for target in sequences:
+            for column in sequences[::7]:
+                assert hits_blows(target, column) == _reference_hits_blows(target, column)
+
+    def test_feedback_matrix_matches_scalar(self):
+        """numpy版の判定が1つずつの判定と一致するかテストする"""
+        rng = random.Random(0)
+        targets = [[rng.choice(COLORS) for _ in range(4)] for _ in range(50)]
+        columns = [[rng.choice(COLORS) for _ in range(4)] for _ in range(5)]
+
+        hits, blows = feedback_matrix(encode(targets), encode(columns))
+        assert hits.shape == blows.shape == (50, 5)
+        for i, target in enumerate(targets):
+            for j, column in enumerate(columns):
+                assert (hits[i, j], blows[i, j]) == hits_blows(target, column)
+
+        probe_hits, probe_blows = probe(targets[3], columns)
+        assert np.array_equal(probe_hits, hits[3])
+        assert np.array_equal(probe_blows, blows[3])
+
+    def test_game_column_feedback_is_incremental(self):
+        """手を打つ・取り消すたびに全列の判定結果が再計算した値と一致するかテストする"""
+        game = ColorLinkGame(rng=1)
+        game.new_game(4)
+        game.max_turns = 1000
+
+        def expected():
+            hits, blows = probe(game.target_sequence, column_tops(game.board, 4))
+            return list(zip(hits.tolist(), blows.tolist()))
+
+        assert game.get_column_feedback() == expected()
+        rng = random.Random(2)
+        for _ in range(30):
+            if game.history and rng.random() < 0.3:
+                game.unmake_move()
+            elif not game.game_over:
+                game.make_move(rng.choice(COLORS), rng.randrange(5))
+            assert game.get_column_feedback() == expected()
@@ -0,0 +1,88 @@
+import random
+import pytest
+from color_link.game.color_link import ColorLinkGame
+from color_link.game.game_log import (
+    GameLogError, GameLogWriter, read_games, record_from_game, replay, summarize
+)
+from color_link.agents.rule_based_agent import RuleBasedAgent
+from color_link.agents.rl_agent import RLAgent
+from color_link.training import train_agent
+
+
+def _played_game(seed, sequence_length=3):
+    rng = random.Random(seed)
+    agent = RuleBasedAgent(rng=rng)
+    game = ColorLinkGame(rng=rng)
+    game.new_game(sequence_length)
+    while not game.game_over:
+        action = agent.decide_next_move(game.get_state())
+        game.make_move(action['color'], action['column'])
+    return game
+
+
+class TestGameLog:
+    def test_roundtrip_and_replay(self, tmp_path):
+        """書き込んだゲームを同じ順で読み込め、リプレイで同じ結果になるかテストする"""
+        path = str(tmp_path / 'games.clgl')
+        games = [_played_game(seed, 3 + seed % 3) for seed in range(5)]
+        with GameLogWriter(path) as log:
+            for game in games:
+                log.append(game, 'rule')
+
+        records = list(read_games(path))
+        assert records == [record_from_game(game, 'rule') for game in games]
+        for game, record in zip(games, records):
+            assert record.won == game.winner
+            replayed = replay(record)
+            assert replayed.history == game.history
+            assert replayed.board == game.board
+
+        summary = summarize(path)
+        assert summary['games'] == 5
+        # 1ゲームあたり固定部分20バイト以内 + 1手2バイト
+        assert summary['bytes'] <= 5 + sum(20 + 2 * len(game.history) for game in games)
+
+    def test_append_and_truncated_tail(self, tmp_path):
+        """既存のファイルに追記でき、末尾の書きかけのレコードは読み飛ばすかテストする"""
+        path = tmp_path / 'games.clgl'
+        with GameLogWriter(str(path)) as log:
+            log.append(_played_game(1))
+        with GameLogWriter(str(path)) as log:
+            log.append(_played_game(2), None)
+        assert [r.agent for r in read_games(str(path))] == [None, None]
+
+        path.write_bytes(path.read_bytes()[:-3])
+        assert len(list(read_games(str(path)))) == 1
+
+    def test_corrupted_record(self, tmp_path):
+        """途中のレコードや先頭のヘッダが壊れていればエラーになるかテストする"""
+        path = tmp_path / 'games.clgl'
+        with GameLogWriter(str(path)) as log:
+            log.append(_played_game(1))
+            log.append(_played_game(2))
+        data = bytearray(path.read_bytes())
+        data[10] ^= 0xFF
+        path.write_bytes(bytes(data))
+        with pytest.raises(GameLogError):
+            list(read_games(str(path)))
+
+        other = tmp_path / 'other.bin'
+        other.write_bytes(b'not a game log')
+        with pytest.raises(GameLogError):
+            list(read_games(str(other)))
+        with pytest.raises(GameLogError):
+            GameLogWriter(str(other))
+
+    def test_training_records_games(self, tmp_path):
+        """トレーニングでプレイしたゲームが記録されるかテストする"""
+        path = str(tmp_path / 'games.clgl')
+        agent = RLAgent(rng=3)
+        agent.learning_mode = True
+        with GameLogWriter(path) as log:
+            stats = train_agent(agent, 3, save_path=str(tmp_path / 'q_table.json'), game_log=log)
+
+        records = list(read_games(path))
+        assert len(records) == 3
+        assert {r.agent for r in records} == {'rl'}
+        assert sum(r.won for r in records) == stats['games_won']
+        assert sum(r.turns for r in records) == stats['total_turns']
@@ -0,0 +1,76 @@
+import time
+import pytest
+from color_link.jobs import JobManager
+
+class TestJobManager:
+    def test_training_job_saves_artifacts(self, tmp_path):
+        """トレーニングジョブがサブプロセスで完了し、成果物が保存されるかテストする"""
+        manager = JobManager(str(tmp_path), max_concurrent=1, nice=0)
+        job = manager.submit('training', {'agentType': 'rl', 'numGames': 2, 'seed': 1})
+
+        assert manager.wait(job.job_id, timeout=60)
+        assert job.status == 'completed', job.error
+        assert job.result['games_played'] == 2
+        assert {'q_table.json', 'stats.json'} <= set(job.artifacts())
+
+    def test_queue_respects_concurrency_and_cancel(self, tmp_path):
+        """同時実行数を超えたジョブは待機し、実行中・待機中のどちらも中止できるかテストする"""
+        manager = JobManager(str(tmp_path), max_concurrent=1, nice=0)
+        long_job = manager.submit('training', {'numGames': 100000})
+        queued_job = manager.submit('evaluation', {'agentType': 'rule', 'games': 1})
+
+        assert long_job.status == 'running'
+        assert queued_job.status == 'queued'
+
+        # 待機中のジョブはプロセスを起動せずに中止される
+        assert manager.cancel(queued_job.job_id)
+        assert queued_job.status == 'cancelled'
+
+        # 実行中のジョブはサブプロセスを終了させて中止される
+        start = time.monotonic()
+        assert manager.cancel(long_job.job_id)
+        assert manager.wait(long_job.job_id, timeout=10)
+        assert long_job.status == 'cancelled'
+        assert time.monotonic() - start < 10
+
+        # 終了したジョブは再度中止できない
+        assert not manager.cancel(long_job.job_id)
+
+    def test_evaluation_job(self, tmp_path):
+        """評価ジョブが集計結果を返すかテストする"""
+        manager = JobManager(str(tmp_path), max_concurrent=2, nice=0)
+        job = manager.submit('evaluation', {'agentType': 'rule', 'games': 3, 'seed': 5})
+
+        assert manager.wait(job.job_id, timeout=60)
+        assert job.status == 'completed', job.error
+        assert job.result['games'] == 3
+
+    def test_evaluation_job_uses_training_artifact(self, tmp_path):
+        """評価ジョブのQ値テーブルはトレーニングジョブのIDでだけ指定でき、任意のパスは拒否されるかテストする"""
+        manager = JobManager(str(tmp_path), max_concurrent=1, nice=0)
+        for params in ({'qTablePath': '/etc/passwd'}, {'qTableFromJob': '../outside'}, {'qTableFromJob': 'missing'}):
+            with pytest.raises(ValueError):
+                manager.submit('evaluation', dict(params, agentType='rl', games=1))
+
+        training = manager.submit('training', {'agentType': 'rl', 'numGames': 2, 'seed': 1})
+        assert manager.wait(training.job_id, timeout=60)
+        job = manager.submit('evaluation', {'agentType': 'rl', 'games': 2, 'seed': 3, 'qTableFromJob': training.job_id})
+        assert manager.wait(job.job_id, timeout=60)
+        assert job.status == 'completed', job.error
+        assert job.result['games'] == 2
+
+    def test_evaluation_job_bounds(self, tmp_path):
+        """評価ジョブのゲーム数・シーケンス長が範囲外なら、サブプロセスを起動せずに拒否されるかテストする"""
+        from color_link.evaluation import MAX_EVALUATION_GAMES
+        manager = JobManager(str(tmp_path), max_concurrent=1, nice=0)
+        for params in ({'games': 0}, {'games': MAX_EVALUATION_GAMES + 1}, {'games': 'many'},
+                       {'games': 1, 'sequenceLength': 0}, {'games': 1, 'sequenceLength': 6}):
+            with pytest.raises(ValueError):
+                manager.submit('evaluation', dict(params, agentType='rule'))
+        assert manager.list() == []
+
+    def test_unknown_kind(self, tmp_path):
+        """未知のジョブ種別はエラーになるかテストする"""
+        manager = JobManager(str(tmp_path))
+        with pytest.raises(ValueError):
+            manager.submit('unknown')
@@ -0,0 +1,50 @@
+import threading
+import pytest
+from color_link.metrics import Registry
+
+class TestMetrics:
+    def test_histogram_buckets_are_cumulative(self):
+        """ヒストグラムのバケットが累積件数で出力されるかテストする"""
+        registry = Registry()
+        histogram = registry.histogram('latency_seconds', '処理時間', ('route',), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 2.0):
+            histogram.labels('/a').observe(value)
+
+        text = registry.render()
+        assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{route="/a",le="1.0"} 3' in text
+        assert 'latency_seconds_bucket{route="/a",le="+Inf"} 4' in text
+        assert 'latency_seconds_sum{route="/a"} 3.05' in text
+        assert 'latency_seconds_count{route="/a"} 4' in text
+
+    def test_counter_is_thread_safe(self):
+        """複数スレッドから加算しても件数が失われないかテストする"""
+        registry = Registry()
+        counter = registry.counter('events_total', 'イベント数')
+
+        def work():
+            for _ in range(1000):
+                counter.inc()
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert 'events_total 4000.0' in registry.render()
+
+    def test_gauge_function_and_label_escaping(self):
+        """取得時に計算するゲージとラベル値のエスケープをテストする"""
+        registry = Registry()
+        gauge = registry.gauge('states', '状態数', ('name',))
+        values = [3]
+        gauge.labels('a"b').set_function(lambda: values[0])
+        values[0] = 5
+        assert 'states{name="a\\"b"} 5.0' in registry.render()
+
+    def test_duplicate_name(self):
+        """同じ名前のメトリクスは登録できないかテストする"""
+        registry = Registry()
+        registry.counter('events_total', 'イベント数')
+        with pytest.raises(ValueError):
+            registry.counter('events_total', 'イベント数')
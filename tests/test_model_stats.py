@@ -0,0 +1,51 @@
+from color_link.agents.rl_agent import RLAgent
+from color_link.model_stats import GrowthTracker, q_table_stats, main
+
+class TestModelStats:
+    def test_q_table_stats(self):
+        """状態数・初期値のままの割合・学習回数の分布を集計できるかテストする"""
+        q_table = {
+            'a': {'red:0': 0.105, 'red:1': 2.5},
+            'b': {'red:0': 0.1},
+            'c': {'red:0': -1.0}
+        }
+        stats = q_table_stats(q_table, {'a': 3, 'b': 1})
+
+        assert stats['states'] == 3
+        assert stats['entries'] == 4
+        assert stats['initialEntries'] == 2
+        assert stats['initialFraction'] == 0.5
+        assert stats['visits']['histogram']['0'] == 1
+        assert stats['visits']['histogram']['1'] == 1
+        assert stats['visits']['histogram']['2-4'] == 1
+        assert stats['visits']['neverRevisitedStates'] == 2
+        assert stats['bytes']['total'] == stats['bytes']['table'] + stats['bytes']['keys'] + stats['bytes']['values']
+        assert stats['qValues']['min'] == -1.0
+
+    def test_visit_counts_are_saved_with_q_table(self, tmp_path):
+        """学習回数がQ値テーブルと一緒に保存・読み込みされるかテストする"""
+        path = str(tmp_path / 'q_table.json')
+        agent = RLAgent()
+        agent.visit_counts['state'] = 4
+        agent.save_q_table(path)
+
+        loaded = RLAgent()
+        loaded.load_q_table(path)
+        assert loaded.visit_counts == {'state': 4}
+
+    def test_growth_tracker_thins_samples(self):
+        """記録数が上限を超えたら間引いて増加率を計算できるかテストする"""
+        tracker = GrowthTracker(max_samples=10)
+        for games in range(1, 101):
+            tracker.record(games, games * 3)
+
+        summary = tracker.summary()
+        assert len(summary['samples']) <= 10
+        assert summary['statesPerGame'] == 3
+
+    def test_cli(self, tmp_path, capsys):
+        """コマンドラインから保存済みのテーブルを集計できるかテストする"""
+        path = str(tmp_path / 'q_table.json')
+        RLAgent().save_q_table(path)
+        main([path])
+        assert '状態数: 1' in capsys.readouterr().out
@@ -0,0 +1,60 @@
+import json
+import pytest
+import numpy as np
+from color_link.agents.rl_agent import RLAgent
+from color_link.game.game_log import GameLogWriter
+from color_link.offline_training import (
+    TransitionDataset, fit_q_values, main, record_transitions, simulate_rule_games, train_offline
+)
+
+
+class TestOfflineTraining:
+    def test_transitions_follow_recorded_game(self):
+        """記録の手ごとに遷移ができ、状態キーがつながって最後の遷移だけが終了になるかテストする"""
+        record = next(simulate_rule_games(1, 3, 5))
+        transitions = list(record_transitions(record, RLAgent(rng=0)))
+
+        assert len(transitions) == record.turns
+        assert [t[4] for t in transitions] == [False] * (record.turns - 1) + [True]
+        for (_, _, _, next_key, _), (state_key, _, _, _, _) in zip(transitions, transitions[1:]):
+            assert next_key == state_key
+        # 同じエージェントで2回目に取り出しても同じ（ゲームごとに候補をリセットしている）
+        assert list(record_transitions(record, RLAgent(rng=0))) == transitions
+
+    def test_fit_reaches_bellman_values(self):
+        """2手で終わるデータで、Q値がベルマン方程式の解に収束するかテストする"""
+        dataset = TransitionDataset()
+        dataset.add('s0', 0, 1.0, 's1', False)
+        dataset.add('s1', 3, 2.0, 's2', True)
+        q = np.zeros((3, 25))
+        known = np.zeros((3, 25), dtype=bool)
+
+        epochs, max_delta = fit_q_values(dataset, q, known, epochs=10, discount_factor=0.5)
+
+        assert q[1, 3] == pytest.approx(2.0)
+        assert q[0, 0] == pytest.approx(1.0 + 0.5 * 2.0)
+        assert epochs < 10 and max_delta == 0.0
+
+    def test_train_from_log_in_q_table_format(self, tmp_path):
+        """ゲーム記録から学習したQ値テーブルが既存の形式で保存・読み込みでき、シミュレーションと同じ結果になるかテストする"""
+        records = list(simulate_rule_games(20, 3, 1))
+        log_path = str(tmp_path / 'games.clgl')
+        with GameLogWriter(log_path) as log:
+            for record in records:
+                log.write(record)
+
+        table_path = str(tmp_path / 'q_table.json')
+        assert main([log_path, '--epochs', '30', '--output', table_path]) == 0
+        agent = RLAgent(rng=0)
+        agent.load_q_table(table_path)
+
+        expected = RLAgent(rng=0)
+        stats = train_offline(simulate_rule_games(20, 3, 1), expected, epochs=30)
+        assert stats['games'] == 20
+        assert stats['transitions'] == sum(record.turns for record in records)
+        assert sum(agent.visit_counts.values()) == stats['transitions']
+        # 初期化時のQ値（乱数を含む）以外の、学習した状態が一致する
+        learned = {key: expected.q_table[key] for key in expected.visit_counts}
+        assert {key: agent.q_table[key] for key in agent.visit_counts} == json.loads(json.dumps(learned))
+        for actions in agent.q_table.values():
+            assert all(key.split(':')[0] in agent.colors for key in actions)
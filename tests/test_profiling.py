@@ -0,0 +1,93 @@
+import json
+import pstats
+import pytest
+import numpy as np
+from color_link.game.color_link import ColorLinkGame
+from color_link.agents.rule_based_agent import RuleBasedAgent
+from color_link.agents.rl_agent import RLAgent
+from color_link.decision_cache import DecisionCache
+from color_link.profiling import PROFILER
+
+@pytest.fixture
+def profiler():
+    """テスト中だけプロファイラを有効にする"""
+    PROFILER.clear()
+    PROFILER.configure(enabled=True, use_cprofile=True)
+    yield PROFILER
+    PROFILER.configure(enabled=False, use_cprofile=False)
+    PROFILER.clear()
+
+class TestDecisionProfiler:
+    def test_trace_records_phases(self, profiler):
+        """行動決定ごとに候補数・評価した行動数・選んだ行動・処理時間が記録されるかテストする"""
+        game = ColorLinkGame()
+        game.new_game(3)
+        agent = RuleBasedAgent()
+        for _ in range(2):
+            action = agent.decide_next_move(game.get_state())
+            game.make_move(action['color'], action['column'])
+
+        traces = [json.loads(line) for line in profiler.export_jsonl().splitlines()]
+        assert len(traces) == 2
+        second = traces[1]
+        assert second['agent'] == 'RuleBasedAgent'
+        assert second['turn'] == 1
+        assert second['candidatesBefore'] == 125
+        assert second['candidatesAfter'] < 125
+        assert second['phases']['_filter_sequences']['calls'] == 1
+        assert second['actionsScored'] == second['phases']['_evaluate_action']['calls'] > 0
+        assert second['action'] == action
+
+    def test_cached_misses_count_scored_actions(self, profiler):
+        """キャッシュを使う場合も、キャッシュになく評価した行動（選べる列の分だけ）の数が記録されるかテストする"""
+        cache = DecisionCache()
+        game = ColorLinkGame(rng=1)
+        game.new_game(3)
+        game.make_move('red', 0)
+        state = game.get_state()
+        for last_column in (2, 3, 3):
+            agent = RuleBasedAgent(decision_cache=cache)
+            agent.possible_sequences = agent._generate_all_sequences(3)
+            agent.last_column = last_column
+            agent.decide_next_move(state)
+
+        # 前回と同じ列は評価せず、次に選べるようになったときにその列の分だけ評価して書き足す
+        assert [trace['actionsScored'] for trace in profiler.traces] == [20, 5, 0]
+        assert np.isfinite(cache.get(next(iter(cache._memory)))).all()
+
+    def test_pstats_export(self, profiler, tmp_path):
+        """cProfileの集計をpstatsで読める形式で出力できるかテストする"""
+        game = ColorLinkGame()
+        game.new_game(3)
+        agent = RLAgent()
+        agent.learning_mode = True
+        state = game.get_state()
+        action = agent.decide_next_move(state)
+        game.make_move(action['color'], action['column'])
+        agent.learn(state, action, 1.0, game.get_state())
+
+        assert [trace['kind'] for trace in profiler.traces] == ['decide_next_move', 'learn']
+        path = tmp_path / 'decisions.pstats'
+        path.write_bytes(profiler.export_pstats())
+        assert pstats.Stats(str(path)).total_calls > 0
+
+    def test_ring_buffer_is_bounded(self, profiler):
+        """上限を超えたトレースは古いものから捨てられるかテストする"""
+        profiler.configure(use_cprofile=False, capacity=3)
+        game = ColorLinkGame()
+        game.new_game(3)
+        agent = RuleBasedAgent()
+        try:
+            for _ in range(5):
+                agent.decide_next_move(game.get_state())
+            assert [trace['seq'] for trace in profiler.traces] == [3, 4, 5]
+        finally:
+            profiler.configure(capacity=1000)
+
+    def test_disabled_records_nothing(self):
+        """無効時はトレースを記録しないかテストする"""
+        PROFILER.clear()
+        game = ColorLinkGame()
+        game.new_game(3)
+        RuleBasedAgent().decide_next_move(game.get_state())
+        assert len(PROFILER.traces) == 0
@@ -0,0 +1,71 @@
+import random
+import numpy as np
+import pytest
+from color_link.rng import derive_seed, get_rng_state, resolve_rng, set_rng_state
+from color_link.game.color_link import ColorLinkGame
+from color_link.agents.rule_based_agent import RuleBasedAgent
+from color_link.agents.rl_agent import RLAgent
+from color_link.agents.hybrid_agent import HybridAgent
+
+
+def _play(agent, game, sequence_length=3, seed=None):
+    """ゲームを最後までプレイし、盤面・目標・行動の列を返す"""
+    game.new_game(sequence_length, seed=seed)
+    start = (game.initial_board, list(game.target_sequence))
+    actions = []
+    while not game.game_over:
+        action = agent.decide_next_move(game.get_state())
+        game.make_move(action['color'], action['column'])
+        actions.append((action['color'], action['column']))
+    return start, actions
+
+
+class TestRng:
+    def test_resolve_rng(self):
+        """シード・Random・numpyのGenerator・省略時の変換をテストする"""
+        assert resolve_rng(None) is random
+        rng = random.Random(1)
+        assert resolve_rng(rng) is rng
+        assert resolve_rng(5).random() == random.Random(5).random()
+        assert resolve_rng(np.random.default_rng(3)).random() == resolve_rng(np.random.default_rng(3)).random()
+        with pytest.raises(TypeError):
+            resolve_rng('seed')
+
+    def test_derive_seed(self):
+        """子のシードが決定的で、インデックスごとに異なるかテストする"""
+        assert derive_seed(1, 0) == derive_seed(1, 0)
+        assert len({derive_seed(1, i) for i in range(100)}) == 100
+        assert derive_seed(1, 0, 1) != derive_seed(1, 1, 0)
+        assert 0 <= derive_seed(2 ** 40, 3) < 2 ** 63
+
+    def test_state_roundtrip(self):
+        """乱数生成器の状態を保存・復元できるかテストする"""
+        rng = random.Random(3)
+        state = get_rng_state(rng)
+        expected = [rng.random() for _ in range(3)]
+        set_rng_state(rng, state)
+        assert [rng.random() for _ in range(3)] == expected
+        assert get_rng_state(random) is None
+
+    def test_new_game_seed(self):
+        """new_gameのseedで盤面と目標が固定され、グローバルな乱数に影響しないかテストする"""
+        game = ColorLinkGame()
+        random.seed(0)
+        game.new_game(4, seed=11)
+        first = (game.initial_board, list(game.target_sequence))
+        after = random.random()
+
+        random.seed(0)
+        game.new_game(4, seed=11)
+        assert (game.initial_board, game.target_sequence) == first
+        assert random.random() == after
+
+    @pytest.mark.parametrize('agent_class', [RuleBasedAgent, RLAgent, HybridAgent])
+    def test_agent_games_are_reproducible(self, agent_class):
+        """同じシードの乱数生成器なら、グローバルな乱数の状態によらず同じゲームになるかテストする"""
+        results = []
+        for global_seed in (1, 2):
+            random.seed(global_seed)
+            rng = random.Random(42)
+            results.append(_play(agent_class(rng=rng), ColorLinkGame(rng=rng)))
+        assert results[0] == results[1]
@@ -1,4 +1,5 @@
 import pytest
+import numpy as np
 from color_link.agents.rule_based_agent import RuleBasedAgent
 
 class TestRuleBasedAgent:
@@ -156,4 +157,60 @@ class TestRuleBasedAgent:
         assert len(agent.possible_sequences) < original_count
         
         # 前回の列を記憶しているか確認
-        assert agent.last_column == action['column'] 
\ No newline at end of file
+        assert agent.last_column == action['column']
+        
+    def test_score_actions(self):
+        """全25行動のスコアベクトルが正しく計算されるかテストする"""
+        agent = RuleBasedAgent()
+        game_state = {
+            'board': [[{'color': color} for color in agent.colors] for _ in range(5)],
+            'history': [],
+            'sequenceLength': 3
+        }
+        agent.possible_sequences = agent._generate_all_sequences(3)
+        agent.last_column = 2
+        
+        scores = agent.score_actions(game_state)
+        
+        assert scores.shape == (25,)
+        # 前回と同じ列は選択対象外
+        assert all(np.isneginf(scores[i * 5 + 2]) for i in range(5))
+        assert np.isfinite(np.delete(scores, [i * 5 + 2 for i in range(5)])).all()
+        
+        # 最良の行動はスコアベクトルの最大値から選ばれる
+        action = agent._choose_best_action(game_state, agent.possible_sequences)
+        assert action['column'] != 2
+
+    def test_choose_best_action_breaks_ties_by_column(self, monkeypatch):
+        """同点の行動からは列→色の順で最初の行動が選ばれるかテストする"""
+        agent = RuleBasedAgent()
+        scores = np.full(25, -np.inf)
+        scores[[0 * 5 + 3, 1 * 5 + 1, 4 * 5 + 1]] = 0.5  # red:3, blue:1, purple:1
+        monkeypatch.setattr(agent, 'score_actions', lambda *args: scores)
+        
+        action = agent._choose_best_action({'board': [], 'history': []}, [])
+        assert action == {'color': 'blue', 'column': 1}
+
+    def test_score_actions_with_expired_deadline(self):
+        """期限切れの場合は評価を打ち切り、その時点の最良行動を返すかテストする"""
+        agent = RuleBasedAgent()
+        game_state = {
+            'board': [[{'color': color} for color in agent.colors] for _ in range(5)],
+            'history': [],
+            'sequenceLength': 3
+        }
+        agent.possible_sequences = agent._generate_all_sequences(3)
+        
+        # 既に過ぎた期限を指定すると1行動だけ評価される
+        scores = agent.score_actions(game_state, deadline=0)
+        assert np.isfinite(scores).sum() == 1
+        assert agent.last_search_complete is False
+        
+        action = agent._choose_best_action(game_state, agent.possible_sequences, deadline=0)
+        assert action['color'] in agent.colors
+        
+        # 期限なしでは全行動を評価する
+        agent.last_column = -1
+        scores = agent.score_actions(game_state)
+        assert np.isfinite(scores).sum() == 25
+        assert agent.last_search_complete is True
@@ -0,0 +1,53 @@
+import pytest
+from color_link.sessions import SessionManager
+from color_link.agents.rule_based_agent import RuleBasedAgent
+
+def _factory(ai_type):
+    return RuleBasedAgent()
+
+class TestSessionManager:
+    def test_sessions_are_isolated(self):
+        """セッションごとに独立したゲームとエージェントを持つかテストする"""
+        manager = SessionManager(_factory)
+        first = manager.get('a')
+        second = manager.get('b')
+        
+        assert first is not second
+        assert first.game is not second.game
+        assert first.select_agent('rule') is not second.select_agent('rule')
+        
+        # 同じIDなら同じセッション
+        assert manager.get('a') is first
+        assert first.current_agent is first.get_agent('rule')
+        
+        # 未知のタイプではAIなし
+        assert first.select_agent(None) is None
+        assert first.current_agent is None
+
+    def test_ttl_eviction(self, monkeypatch):
+        """一定時間アクセスのないセッションが破棄されるかテストする"""
+        now = [1000.0]
+        monkeypatch.setattr('color_link.sessions.time.monotonic', lambda: now[0])
+        
+        manager = SessionManager(_factory, ttl_seconds=60)
+        manager.get('old')
+        now[0] += 30
+        manager.get('recent')
+        now[0] += 40
+        
+        # 'old'は70秒アクセスがないため破棄される
+        manager.get('recent')
+        assert 'old' not in manager
+        assert 'recent' in manager
+
+    def test_lru_eviction(self):
+        """上限を超えた場合に最も古いセッションから破棄されるかテストする"""
+        manager = SessionManager(_factory, max_sessions=2)
+        manager.get('a')
+        manager.get('b')
+        manager.get('a')  # 'a'を最近使用にする
+        manager.get('c')
+        
+        assert len(manager) == 2
+        assert 'b' not in manager
+        assert 'a' in manager and 'c' in manager
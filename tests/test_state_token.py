@@ -0,0 +1,67 @@
+import pytest
+from color_link.game.color_link import ColorLinkGame
+from color_link.game.state_token import StateTokenCodec, StateTokenError
+from color_link.agents.rule_based_agent import RuleBasedAgent
+
+def _play(game, moves):
+    for color, column in moves:
+        game.make_move(color, column)
+
+class TestStateToken:
+    @pytest.mark.parametrize('encrypt', [True, False])
+    def test_round_trip(self, encrypt):
+        """トークンからゲームの状態が完全に復元されるかテストする"""
+        codec = StateTokenCodec(b'secret', encrypt=encrypt)
+        game = ColorLinkGame()
+        game.new_game(sequence_length=4)
+        _play(game, [('red', 0), ('blue', 3), ('purple', 3), ('green', 1)])
+        
+        token = codec.encode(game, 'rule')
+        restored, agent_type = codec.decode(token)
+        
+        assert agent_type == 'rule'
+        assert restored.board == game.board
+        assert restored.target_sequence == game.target_sequence
+        assert restored.history == game.history
+        assert restored.sequence_length == game.sequence_length
+        assert restored.game_over == game.game_over
+        # 本体は1手1バイト
+        assert len(token) < 80
+
+    def test_target_is_hidden_when_encrypted(self):
+        """暗号化した場合は同じ状態でも毎回異なるトークンになるかテストする"""
+        codec = StateTokenCodec(b'secret')
+        game = ColorLinkGame()
+        game.new_game()
+        assert codec.encode(game) != codec.encode(game)
+
+    def test_tampered_token_is_rejected(self):
+        """改ざんされたトークンや別の鍵のトークンが拒否されるかテストする"""
+        codec = StateTokenCodec(b'secret')
+        game = ColorLinkGame()
+        game.new_game()
+        token = codec.encode(game)
+        
+        tampered = token[:-2] + ('A' if token[-2] != 'A' else 'B') + token[-1]
+        with pytest.raises(StateTokenError):
+            codec.decode(tampered)
+        with pytest.raises(StateTokenError):
+            StateTokenCodec(b'other').decode(token)
+        with pytest.raises(StateTokenError):
+            codec.decode('')
+
+    def test_observers_rebuild_agent_candidates(self):
+        """リプレイ時にエージェントのシーケンス候補が再構築されるかテストする"""
+        codec = StateTokenCodec(b'secret')
+        game = ColorLinkGame()
+        game.new_game()
+        
+        agent = RuleBasedAgent()
+        agent.observe(game.get_state())
+        for color, column in [('red', 0), ('yellow', 2)]:
+            game.make_move(color, column)
+            agent.observe(game.get_state())
+        
+        restored_agent = RuleBasedAgent()
+        codec.decode(codec.encode(game, 'rule'), observers=[restored_agent])
+        assert restored_agent.possible_sequences == agent.possible_sequences
@@ -0,0 +1,122 @@
+import json
+import random
+import numpy as np
+import pytest
+from color_link.agents.rl_agent import RLAgent
+from color_link.agents.hybrid_agent import HybridAgent
+from color_link.training import train_agent, save_checkpoint, load_checkpoint, restore_checkpoint
+
+
+def _seeded_agent(agent_class, seed):
+    """乱数を初期化してから学習モードのエージェントを作成"""
+    random.seed(seed)
+    np.random.seed(seed)
+    agent = agent_class()
+    agent.learning_mode = True
+    return agent
+
+
+class TestTrainingCheckpoint:
+    @pytest.mark.parametrize('agent_class', [RLAgent, HybridAgent])
+    def test_resume_matches_uninterrupted_run(self, tmp_path, agent_class):
+        """チェックポイントから再開した結果が、中断しなかった場合と一致するかテストする"""
+        save_path = str(tmp_path / 'q_table.json')
+        checkpoint_path = str(tmp_path / 'checkpoint.json')
+
+        # 中断せずに6ゲーム
+        agent = _seeded_agent(agent_class, 7)
+        expected = train_agent(agent, 6, save_path=save_path)
+        expected_table = json.dumps(agent.get_checkpoint_state(), sort_keys=True)
+
+        # 3ゲームで停止し、再起動したつもりで新しいエージェントに復元して残りを実行
+        agent = _seeded_agent(agent_class, 7)
+        train_agent(agent, 3, save_path=save_path, checkpoint_path=checkpoint_path)
+
+        resumed_agent = _seeded_agent(agent_class, 999)
+        stats = restore_checkpoint(load_checkpoint(checkpoint_path), resumed_agent)
+        assert stats['games_played'] == 3
+        resumed = train_agent(resumed_agent, 6, stats=stats, save_path=save_path)
+
+        assert resumed == expected
+        assert json.dumps(resumed_agent.get_checkpoint_state(), sort_keys=True) == expected_table
+
+    def test_resume_with_agent_rng(self, tmp_path):
+        """エージェント固有の乱数生成器の状態もチェックポイントから復元されるかテストする"""
+        save_path = str(tmp_path / 'q_table.json')
+        checkpoint_path = str(tmp_path / 'checkpoint.json')
+
+        agent = RLAgent(rng=random.Random(7))
+        agent.learning_mode = True
+        expected = train_agent(agent, 6, save_path=save_path)
+
+        agent = RLAgent(rng=random.Random(7))
+        agent.learning_mode = True
+        train_agent(agent, 3, save_path=save_path, checkpoint_path=checkpoint_path)
+
+        resumed_agent = RLAgent(rng=random.Random(999))
+        resumed_agent.learning_mode = True
+        stats = restore_checkpoint(load_checkpoint(checkpoint_path), resumed_agent)
+        assert train_agent(resumed_agent, 6, stats=stats, save_path=save_path) == expected
+
+    def test_stop_mid_game_resumes_from_game_boundary(self, tmp_path):
+        """ゲームの途中で停止しても途中のゲームは統計に含まれず、再開結果が中断しなかった場合と一致するかテストする"""
+        save_path = str(tmp_path / 'q_table.json')
+        checkpoint_path = str(tmp_path / 'checkpoint.json')
+
+        agent = RLAgent(rng=random.Random(7))
+        agent.learning_mode = True
+        expected = train_agent(agent, 6, save_path=save_path)
+        expected_table = json.dumps(agent.get_checkpoint_state(), sort_keys=True)
+
+        # 4ゲーム目の3手目の前で停止する
+        agent = RLAgent(rng=random.Random(7))
+        agent.learning_mode = True
+        stats = {'games_played': 0, 'games_won': 0, 'win_rate': 0, 'avg_turns': 0, 'total_turns': 0}
+        checks = []
+        def should_stop():
+            checks.append(stats['games_played'])
+            return checks.count(3) > 3
+        train_agent(agent, 6, stats=stats, should_stop=should_stop, save_path=save_path,
+                    checkpoint_path=checkpoint_path, checkpoint_interval=1)
+        # 統計は3ゲームで止めた場合と同じ（途中のゲームの手数は含まれない）
+        first_games = RLAgent(rng=random.Random(7))
+        first_games.learning_mode = True
+        assert stats == train_agent(first_games, 3, save_path=save_path)
+
+        resumed_agent = RLAgent(rng=random.Random(999))
+        resumed_agent.learning_mode = True
+        resumed_stats = restore_checkpoint(load_checkpoint(checkpoint_path), resumed_agent)
+        assert resumed_stats == stats
+        assert train_agent(resumed_agent, 6, stats=resumed_stats, save_path=save_path) == expected
+        assert json.dumps(resumed_agent.get_checkpoint_state(), sort_keys=True) == expected_table
+
+    def test_state_keys_match_offline_transitions(self, tmp_path):
+        """オンライン学習で更新される状態が、同じゲームの記録から取り出した遷移の状態と一致するかテストする"""
+        from color_link.game.game_log import GameLogWriter, read_games
+        from color_link.offline_training import record_transitions
+
+        log_path = str(tmp_path / 'games.clgl')
+        agent = RLAgent(rng=random.Random(3))
+        agent.learning_mode = True
+        with GameLogWriter(log_path) as log:
+            train_agent(agent, 3, save_path=str(tmp_path / 'q_table.json'), game_log=log)
+
+        expected = {}
+        for record in read_games(log_path):
+            for state_key, *_ in record_transitions(record, RLAgent(rng=0)):
+                expected[state_key] = expected.get(state_key, 0) + 1
+        assert agent.visit_counts == expected
+
+    def test_missing_checkpoint(self, tmp_path):
+        """チェックポイントがなければNoneを返すかテストする"""
+        assert load_checkpoint(str(tmp_path / 'missing.json')) is None
+
+    def test_checkpoint_is_written_atomically(self, tmp_path):
+        """チェックポイントの保存後に一時ファイルが残らないかテストする"""
+        agent = RLAgent()
+        path = tmp_path / 'checkpoint.json'
+        save_checkpoint(str(path), agent, {'games_played': 0}, {'numGames': 10})
+
+        assert path.exists()
+        assert not (tmp_path / 'checkpoint.json.tmp').exists()
+        assert load_checkpoint(str(path))['params'] == {'numGames': 10}
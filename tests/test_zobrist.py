@@ -0,0 +1,65 @@
+import random
+import itertools
+from color_link.game.color_link import ColorLinkGame
+from color_link.game.feedback import COLORS
+from color_link.agents.rule_based_agent import RuleBasedAgent
+from color_link.game.zobrist import board_hash, candidates_hash, combine, position_key
+
+
+class TestZobrist:
+    def test_incremental_hash_matches_full(self):
+        """手を打つ・取り消すたびに更新したハッシュが盤面全体から求めた値と一致するかテストする"""
+        game = ColorLinkGame(rng=5)
+        game.new_game(4)
+        game.max_turns = 1000
+        start = game.zobrist_hash
+        snapshot = game.snapshot()
+
+        rng = random.Random(6)
+        for _ in range(40):
+            if game.history and rng.random() < 0.3:
+                game.unmake_move()
+            elif not game.game_over:
+                game.make_move(rng.choice(COLORS), rng.randrange(5))
+            assert game.zobrist_hash == board_hash(game.board, 4)
+
+        game.restore(snapshot)
+        assert game.zobrist_hash == start
+
+    def test_hash_is_stable(self):
+        """ハッシュの乱数が固定で、シーケンス長ごとに異なるかテストする（保存したキーを使い続けられること）"""
+        board = [[{'color': 'red'} for _ in range(5)] for _ in range(5)]
+        assert board_hash(board, 3) == 0x1c7b96c01b05500d
+        assert board_hash(board, 3) != board_hash(board, 4)
+
+    def test_candidates_hash(self):
+        """候補集合のハッシュが順序によらず、内容が違えば異なるかテストする"""
+        sequences = [['red', 'blue', 'green'], ['blue', 'red', 'green'], ['green', 'green', 'purple']]
+        assert candidates_hash(sequences) == candidates_hash(list(reversed(sequences)))
+        assert candidates_hash(sequences) != candidates_hash(sequences[:2])
+        assert candidates_hash([]) == 0
+
+        # 全シーケンスは長さごとに計算済みの値を使う（1つずつXORした値と同じ）
+        full = [list(s) for s in itertools.product(COLORS, repeat=2)]
+        expected = 0
+        for sequence in full:
+            expected ^= candidates_hash([sequence])
+        assert candidates_hash(full) == expected
+
+        game = ColorLinkGame(rng=1)
+        game.new_game(3)
+        state = game.get_state()
+        assert position_key(state, sequences) == combine(game.zobrist_hash, candidates_hash(sequences))
+        assert position_key(state, sequences) != position_key(state, sequences[:2])
+
+    def test_candidates_hash_distinguishes_same_color_counts(self):
+        """位置・色ごとの出現数の偶奇が同じでも、別の候補集合なら異なるハッシュになるかテストする"""
+        assert candidates_hash([['red', 'blue'], ['blue', 'red']]) != candidates_hash([['red', 'red'], ['blue', 'blue']])
+
+        # 同じ列への異なる判定で絞り込んだ集合
+        agent = RuleBasedAgent(rng=0)
+        full = agent._generate_all_sequences(3)
+        column = ['red', 'red', 'red']
+        one_hit = agent._filter_sequences(full, column, 1, 0)
+        no_hit = agent._filter_sequences(full, column, 0, 0)
+        assert candidates_hash(one_hit) != candidates_hash(no_hit)